@@ -3,24 +3,33 @@
 # Core Application Setup
 # ----------------------------------------------------
 import os
+import zipfile
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, send_file, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
-from instrument_options import (
-    VOCAL_STYLES, MALE_VOICE_NAMES, FEMALE_VOICE_NAMES
-)
-from lyrics_generator import generate_lyrics_with_markov, LYRICS_LANGUAGES
-from shared import (
-    reduce_noise_return,
-    get_lang_abbr,
-    analyze_vocal_and_enrich_prompt,
-    generate_full_music_with_musicgen,
-    generate_vocals_with_tts,
-    refine_and_mix_vocal,
-    convert_audio_format
+from instrument_options import VOCAL_STYLES
+from jobs import JOB_MANAGER
+from encoder import EncodingError, normalize_format
+from lyrics_generator import LYRICS_LANGUAGES
+from media import MEDIA_STORE, MIMETYPES, MediaNotFound
+from model_registry import MODEL_REGISTRY
+from pipelines import (
+    PipelineError,
+    run_generate_lyrics,
+    run_noise_reduction,
+    run_noise_reduction_batch,
+    run_generate_vocals,
+    VOCAL_STAGES,
+    NOISE_REDUCTION_STAGES,
+    NOISE_REDUCTION_BATCH_STAGES,
+    LYRICS_STAGES
 )
+from shared import normalize_noise_mode, save_temp_file
+from vocal_features import normalize_quality
+from voice_catalog import VOICE_CATALOG
+from warmup import READINESS
 # ----------------------------------------------------
 # Modular Component Imports
 # ----------------------------------------------------
@@ -39,11 +48,22 @@ OUTPUT_DIR = os.path.normpath(os.path.join(FRONTEND_STATIC, 'outputs'))
 os.makedirs(TMP_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Batch noise reduction upload limits
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.opus', '.m4a', '.aac', '.webm')
+MAX_BATCH_FILES = int(os.getenv('SONOSPHERE_MAX_BATCH_FILES', 50))
+MAX_ARCHIVE_BYTES = int(os.getenv('SONOSPHERE_MAX_ARCHIVE_MB', 1024)) * 1024 * 1024
+# Browser cache lifetime of /media responses (masters never change once written)
+MEDIA_MAX_AGE = int(os.getenv('SONOSPHERE_MEDIA_MAX_AGE', 86400))
+
 # -------------------------
 # App Setup
 # -------------------------
 app = Flask(__name__, template_folder=FRONTEND_STATIC, static_folder=FRONTEND_STATIC)
 CORS(app)
+# Let a fronting nginx/Apache stream /media files (X-Sendfile) instead of the app
+app.config['USE_X_SENDFILE'] = os.getenv('SONOSPHERE_X_SENDFILE', '0') in ('1', 'true', 'yes')
+# Background warm-up of the SONOSPHERE_WARMUP targets (no-op when unset)
+READINESS.start()
 
 
 # ----------------------------------------------------
@@ -67,66 +87,78 @@ def get_form_data():
         "lang_map": LANGUAGE_CODE_MAP,
         "lyrics_languages": LYRICS_LANGUAGES,
         "vocal_styles": VOCAL_STYLES,
-        "male_voice_names": MALE_VOICE_NAMES,
-        "female_voice_names": FEMALE_VOICE_NAMES,
+        "male_voice_names": VOICE_CATALOG.names("male"),
+        "female_voice_names": VOICE_CATALOG.names("female"),
+        "voices": VOICE_CATALOG.to_list(),
         "tts_engines": TTS_ENGINES,
     })
 
 
+@app.route('/api/voices/reload', methods=['POST'])
+def reload_voices():
+    """Re-scan frontend/static/voices after voice files were added or removed."""
+    count = VOICE_CATALOG.reload()
+    return jsonify({"status": "success", "voice_count": count})
+
+
+# ----------------------------------------------------
+# Model Registry Stats
+# ----------------------------------------------------
+@app.route('/api/model_stats')
+def get_model_stats():
+    """Report load times, hits and eviction counts of the shared models."""
+    return jsonify({"status": "success", "model_stats": MODEL_REGISTRY.stats()})
+
+
+# ----------------------------------------------------
+# Health & Readiness
+# ----------------------------------------------------
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process serves requests; reports which subsystems are warm."""
+    return jsonify({
+        "status": "ok",
+        "uptime_s": READINESS.uptime(),
+        "subsystems": READINESS.subsystem_status(),
+        "model_status_from": READINESS.model_status_source(),
+        "warmup": READINESS.warmup_status(),
+    })
+
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: 200 once every configured warm-up target is ready, 503 before that."""
+    if READINESS.ready:
+        status = "ready"
+    else:
+        status = "failed" if READINESS.failed else "warming"
+    return jsonify({"status": status, "warmup": READINESS.warmup_status()}), 200 if status == "ready" else 503
+
+
 # ----------------------------------------------------
 # Lyrics Generation
 # ----------------------------------------------------
+def _lyrics_params():
+    lyrics_language_raw = request.form.get('lyrics_language', 'English')
+    return {
+        "lyrics_language": lyrics_language_raw.strip().title() if lyrics_language_raw else 'English',
+        "theme": request.form.get('theme', 'Pop'),
+        "lyric_length_label": request.form.get('lyric_length', 'Medium (8-16 lines)'),
+        "bias": request.form.get('bias', None),
+    }
+
+
 @app.route('/generate_lyrics', methods=['POST'])
 def generate_lyrics_route():
     """
     Generate lyrics using Markov chain based on language, theme, and length.
     """
     try:
-        lyrics_language_raw = request.form.get('lyrics_language', 'English')
-        lyrics_language = lyrics_language_raw.strip().title() if lyrics_language_raw else 'English'
-
-        theme = request.form.get('theme', 'Pop')
-        lyric_length_label = request.form.get('lyric_length', 'Medium (8-16 lines)')
-        bias = request.form.get('bias', None)
-
-        # Determine line count based on provided label
-        label_lower = lyric_length_label.lower()
-        short_keywords = ['short', 'قصير', '短', 'court', 'kurz', 'corto', 'короткий', 'corto']
-        long_keywords = ['long', 'طويل', '长', 'long', 'lang', 'lungo', 'длинный', 'largo']
-
-        if any(k in label_lower for k in short_keywords):
-            min_lines, max_lines = 4, 6
-        elif any(k in label_lower for k in long_keywords):
-            min_lines, max_lines = 16, 20
-        else:
-            min_lines, max_lines = 8, 12
-
-        lyrics_text = generate_lyrics_with_markov(
-            language=lyrics_language,
-            genre=theme,
-            min_lines=min_lines,
-            max_lines=max_lines,
-            bias=bias
-        )
-
-        if not lyrics_text:
-            return jsonify({
-                "status": "error",
-                "message": f"Could not generate lyrics for {lyrics_language}/{theme}. Corpus may be empty."
-            }), 500
-
-        return jsonify({
-            "status": "success",
-            "generation_result": {
-                "lyrics_text": lyrics_text,
-                "language": lyrics_language,
-                "theme": theme,
-                "line_count": len(lyrics_text.splitlines()),
-                "min_lines": min_lines,
-                "max_lines": max_lines
-            }
-        })
+        result = run_generate_lyrics(**_lyrics_params())
+        return jsonify({"status": "success", "generation_result": result})
 
+    except PipelineError as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
     except Exception as e:
         print(f"[ERROR] /generate_lyrics: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -135,6 +167,22 @@ def generate_lyrics_route():
 # ----------------------------------------------------
 # Noise Reduction (Primary)
 # ----------------------------------------------------
+def _noise_mode_param():
+    """`noise_mode` form field: 'auto' (default), 'stationary' or 'non_stationary'."""
+    try:
+        return normalize_noise_mode(request.form.get('noise_mode'))
+    except ValueError as e:
+        raise PipelineError(str(e), 400)
+
+
+def _save_noise_upload(noise_file):
+    """Save the uploaded recording into the outputs folder and return its path."""
+    original_filename = secure_filename(f"{os.urandom(8).hex()}_{noise_file.filename}")
+    original_path = os.path.join(OUTPUT_DIR, original_filename)
+    noise_file.save(original_path)
+    return original_path
+
+
 @app.route("/noise_reduction", methods=["POST"])
 def noise_reduction():
     file_type = request.form.get('type', 'wav')
@@ -143,37 +191,152 @@ def noise_reduction():
     noise_file = request.files.get("audio_file")  # matches <input name="audio_file">
     if not noise_file:
         return jsonify({"status": "error", "message": "No file uploaded."}), 400
+    try:
+        noise_mode = _noise_mode_param()
+    except PipelineError as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
 
     # Save uploaded file temporarily
-    # uploaded_file.save(input_path)
-    original_filename = secure_filename(f"{os.urandom(8).hex()}_{noise_file.filename}")
-    original_path = os.path.join(OUTPUT_DIR, original_filename)
-    noise_file.save(original_path)
+    original_path = _save_noise_upload(noise_file)
 
     # Call noise reduction
-    # should return full path to reduced file
     try:
-        original_path, reduced_path = reduce_noise_return(original_path)
-        reduced_path = convert_audio_format(reduced_path, file_type)
-        # Build response
-        response_result = {
-            "status": "Noise reduction complete!",
-            "original_file": os.path.basename(original_path),
-            "original_audio_url": f"/static/outputs/{os.path.basename(original_path)}",
-            "noise_reduce_file": os.path.basename(reduced_path),
-            "noise_reduced_url": f"/static/outputs/{os.path.basename(reduced_path)}"
-        }
-
+        response_result = run_noise_reduction(original_path, file_type, noise_mode)
         return jsonify({"status": "success", "generation_result": response_result})
 
     except Exception as e:
         print(f"[noise_reduction] error: {e}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return jsonify({"status": "error", "message": str(e)}), getattr(e, 'status_code', 500)
+
+
+def _archive_audio_entries(archive):
+    """The audio entries of an uploaded zip, checked against the extracted-size limit."""
+    entries = [e for e in archive.infolist()
+               if not e.is_dir() and e.filename.lower().endswith(AUDIO_EXTENSIONS)
+               and not os.path.basename(e.filename).startswith('.')]
+    if sum(e.file_size for e in entries) > MAX_ARCHIVE_BYTES:
+        raise ValueError("Archive is too large once extracted.")
+    return entries
+
+
+def _extract_archive_entry(archive, entry):
+    """Extract one zip entry into the outputs folder and return its path."""
+    filename = secure_filename(f"{os.urandom(8).hex()}_{os.path.basename(entry.filename)}")
+    path = os.path.join(OUTPUT_DIR, filename)
+    with archive.open(entry) as src, open(path, 'wb') as dst:
+        dst.write(src.read())
+    return path
+
+
+def _save_batch_uploads():
+    """
+    Save every file of a batch request (audio_files[] and/or a zip archive).
+    The file count is checked before anything is written, and files already
+    written are removed if saving fails part-way.
+    """
+    uploads = [f for f in request.files.getlist("audio_files") if f and f.filename]
+    archive_file = request.files.get("archive")
+    archive = zipfile.ZipFile(archive_file) if archive_file and archive_file.filename else None
+    try:
+        entries = _archive_audio_entries(archive) if archive else []
+        if len(uploads) + len(entries) > MAX_BATCH_FILES:
+            raise ValueError(f"At most {MAX_BATCH_FILES} files can be processed per batch "
+                             f"(got {len(uploads) + len(entries)}).")
+        paths = []
+        try:
+            for upload in uploads:
+                paths.append(_save_noise_upload(upload))
+            for entry in entries:
+                paths.append(_extract_archive_entry(archive, entry))
+        except Exception:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            raise
+        return paths
+    finally:
+        if archive:
+            archive.close()
+
+
+def _batch_params():
+    return {
+        "file_type": request.form.get('type', 'wav'),
+        "stage1_mode": _noise_mode_param(),
+        "make_archive": request.form.get('zip', 'false').lower() in ('1', 'true', 'yes'),
+        "output_dir": OUTPUT_DIR,
+    }
+
+
+@app.route("/noise_reduction/batch", methods=["POST"])
+def noise_reduction_batch():
+    """Denoise many uploaded takes (multiple files or one zip) in a single call."""
+    try:
+        params = _batch_params()
+        paths = _save_batch_uploads()
+    except PipelineError as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
+    except (ValueError, zipfile.BadZipFile) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        result = run_noise_reduction_batch(paths, **params)
+        return jsonify({"status": "success", "generation_result": result})
+
+    except Exception as e:
+        print(f"[noise_reduction_batch] error: {e}")
+        return jsonify({"status": "error", "message": str(e)}), getattr(e, 'status_code', 500)
 
 
 # ----------------------------------------------------
 # Generate Vocals + Music + Mixing
 # ----------------------------------------------------
+def _seed_param():
+    """Optional integer `seed` form field for reproducible generation."""
+    seed = request.form.get('seed', '').strip()
+    if not seed:
+        return None
+    try:
+        return int(seed)
+    except ValueError:
+        raise PipelineError("'seed' must be an integer.", 400)
+
+
+def _analysis_params():
+    """Vocal-analysis form fields: `analysis_quality` tier plus `analyze_tempo` / `analyze_key` flags."""
+    try:
+        quality = normalize_quality(request.form.get('analysis_quality', '').strip() or None)
+    except ValueError as e:
+        raise PipelineError(str(e), 400)
+    return {
+        "analysis_quality": quality,
+        "analyze_tempo": request.form.get('analyze_tempo', '').lower() in ('1', 'true', 'on', 'yes'),
+        "analyze_key": request.form.get('analyze_key', '').lower() in ('1', 'true', 'on', 'yes'),
+    }
+
+
+def _vocal_params():
+    mode = request.form.get('mode')
+    print(f"mode: {mode}")
+    file_type = request.form.get('type', 'wav')
+    print(f"file_type: {file_type}")
+    return {
+        "instrument": request.form.get('instrument', 'full_music'),
+        "genre": request.form.get('genre', 'Pop'),
+        "language": request.form.get('language', 'English'),
+        "lyrics": request.form.get('lyrics', ''),
+        "vocal_style": request.form.get('vocal_style', 'Random'),
+        "selected_voice_name": request.form.get('selected_voice_name', ''),
+        "tts_engine": request.form.get('tts_engine', 'Bark AI'),
+        "mode": mode,
+        "file_type": file_type,
+        "seed": _seed_param(),
+        **_analysis_params(),
+    }
+
+
 @app.route('/generate_vocals', methods=['POST'])
 def generate_vocals_route():
     """
@@ -182,109 +345,136 @@ def generate_vocals_route():
     """
 
     try:
-        instrument = request.form.get('instrument', 'full_music')
-        genre = request.form.get('genre', 'Pop')
-        language = request.form.get('language', 'English')
-        lyrics = request.form.get('lyrics', '')
-        vocal_style = request.form.get('vocal_style', 'Random')
-        selected_voice_name = request.form.get('selected_voice_name', '')
-        tts_engine = request.form.get('tts_engine', 'Bark AI')
-        voice_upload = request.files.get('voice_upload')
-        mode = request.form.get('mode')
-        mode = mode.lower()
-        print(f"mode: {mode}")
-        file_type = request.form.get('type', 'wav')
-        print(f"file_type: {file_type}")
-
-        vocal_path = final_path = None
-        music_path = None
-
-        # Controls if MusicGen + mixing should be skipped
-        skip_musicgen_and_mix = False
-
-        # Handle vocals if lyrics provided
-        if lyrics:
-            lang_abbr = get_lang_abbr(language)
-
-            vocal_path = generate_vocals_with_tts(
-                lyrics, tts_engine, vocal_style, lang_abbr, genre,
-                selected_voice_name, instrument, voice_upload, mode
-            )
-
-            if not (vocal_path and os.path.exists(vocal_path) and os.path.getsize(vocal_path) > 0):
-                return jsonify({"status": "error", "message": f"{tts_engine} generation failed."}), 500
-
-            # Skip mixing when Bark AI creates full_music with Random voice
-            if (
-                    tts_engine == 'Bark AI'
-                    and vocal_style.lower() == "random"
-                    and instrument.lower() == "full_music"
-                    and not voice_upload
-                    and mode == 'full_music'
-            ):
-                skip_musicgen_and_mix = True
-                final_path = vocal_path
-            elif (
-                    tts_engine in ['Bark AI', 'Coqui XTTS']
-                    and vocal_style.lower() in ["random", "male", "female"]
-                    and mode != 'full_music'
-                    and not voice_upload
-            ):
-                skip_musicgen_and_mix = True
-                final_path = vocal_path
-            elif (
-                    tts_engine in ['Bark AI', 'Coqui XTTS']
-                    and mode != 'full_music'
-                    and voice_upload
-            ):
-                skip_musicgen_and_mix = True
-                final_path = vocal_path
-        # Music + mixing (if not skipped)
-        if vocal_path and final_path is None and not skip_musicgen_and_mix:
-            music_prompt = analyze_vocal_and_enrich_prompt(vocal_path, genre, instrument, lyrics)
-            music_path = generate_full_music_with_musicgen(prompt=music_prompt)
-
-            if not music_path:
-                return jsonify({"status": "error", "message": "Music generation failed."}), 500
-
-            final_path = refine_and_mix_vocal(vocal_path, music_path)
-
-        if not final_path:
-            return jsonify({
-                "status": "error",
-                "message": "Could not finalize track. Check vocal file and instrument selection."
-            }), 500
-
-        # Build response
-        print(f"full music file_type to be converted to: {file_type}")
-        final_path = convert_audio_format(final_path, file_type)
-        result = {
-            "status": "Song created!",
-            "file": os.path.basename(final_path),
-            "final_audio_url": f"/static/outputs/{os.path.basename(final_path)}",
-            "source": "vocal_only" if skip_musicgen_and_mix else "mixed"
-        }
-
-        # Add raw music and raw vocal if available
-        if music_path and os.path.exists(music_path):
-            print(f"music file_type to be converted to: {file_type}")
-            music_path = convert_audio_format(music_path, file_type)
-            result["music_file"] = os.path.basename(music_path)
-            result["music_audio_url"] = f"/static/outputs/{os.path.basename(music_path)}"
-
-        if vocal_path and os.path.exists(vocal_path):
-            print(f"music file_type to be converted to: {file_type}")
-            vocal_path = convert_audio_format(vocal_path, file_type)
-            result["vocal_file"] = os.path.basename(vocal_path)
-            result["vocal_audio_url"] = f"/static/outputs/{os.path.basename(vocal_path)}"
-
+        result = run_generate_vocals(voice_upload=request.files.get('voice_upload'), **_vocal_params())
         return jsonify({"status": "success", "generation_result": result})
 
+    except PipelineError as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
     except Exception as e:
         print(f"[ERROR] /generate_vocals: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+# ----------------------------------------------------
+# Background Jobs (submit / status / progress events)
+# ----------------------------------------------------
+def _job_accepted(job):
+    return jsonify({
+        "status": "accepted",
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }), 202
+
+
+@app.route('/jobs/generate_lyrics', methods=['POST'])
+def submit_generate_lyrics_job():
+    job = JOB_MANAGER.submit("generate_lyrics", LYRICS_STAGES, run_generate_lyrics, **_lyrics_params())
+    return _job_accepted(job)
+
+
+@app.route('/jobs/noise_reduction', methods=['POST'])
+def submit_noise_reduction_job():
+    noise_file = request.files.get("audio_file")
+    if not noise_file:
+        return jsonify({"status": "error", "message": "No file uploaded."}), 400
+    try:
+        noise_mode = _noise_mode_param()
+    except PipelineError as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
+
+    original_path = _save_noise_upload(noise_file)
+    job = JOB_MANAGER.submit("noise_reduction", NOISE_REDUCTION_STAGES, run_noise_reduction,
+                             original_path, request.form.get('type', 'wav'), noise_mode)
+    return _job_accepted(job)
+
+
+@app.route('/jobs/noise_reduction/batch', methods=['POST'])
+def submit_noise_reduction_batch_job():
+    try:
+        params = _batch_params()
+        paths = _save_batch_uploads()
+    except PipelineError as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
+    except (ValueError, zipfile.BadZipFile) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    job = JOB_MANAGER.submit("noise_reduction_batch", NOISE_REDUCTION_BATCH_STAGES,
+                             run_noise_reduction_batch, paths, **params)
+    return _job_accepted(job)
+
+
+@app.route('/jobs/generate_vocals', methods=['POST'])
+def submit_generate_vocals_job():
+    try:
+        params = _vocal_params()
+    except PipelineError as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
+    if not params["mode"]:
+        return jsonify({"status": "error", "message": "Missing 'mode'."}), 400
+
+    # Request files are closed once the request ends, so persist the upload now
+    voice_upload = request.files.get('voice_upload')
+    params["voice_upload"] = save_temp_file(voice_upload) if voice_upload else None
+
+    job = JOB_MANAGER.submit("generate_vocals", VOCAL_STAGES, run_generate_vocals, **params)
+    return _job_accepted(job)
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job."}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """Server-sent events stream of per-stage progress until the job finishes."""
+    if JOB_MANAGER.get(job_id) is None:
+        return jsonify({"status": "error", "message": "Unknown job."}), 404
+    return Response(
+        stream_with_context(JOB_MANAGER.stream_events(job_id)),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ----------------------------------------------------
+# Media (masters + on-demand renditions)
+# ----------------------------------------------------
+@app.route('/media/<artifact>', methods=['GET'])
+def media_route(artifact):
+    """
+    Serve an artifact in `?format=` (wav, mp3, flac, opus, ogg; default wav).
+    WAV is the master itself; other formats are encoded from it on first
+    request and cached;
+    responses support Range requests and ETag / If-None-Match revalidation.
+    `?download=1` serves it as an attachment.
+    """
+    try:
+        desired_format = normalize_format(request.args.get('format', 'wav'))
+        path, etag = MEDIA_STORE.rendition(artifact, desired_format)
+    except MediaNotFound as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except EncodingError as e:
+        print(f"[ERROR] /media/{artifact}: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    return send_file(
+        path,
+        mimetype=MIMETYPES[desired_format],
+        as_attachment=request.args.get('download', '').lower() in ('1', 'true', 'yes'),
+        download_name=f"{artifact}.{desired_format}",
+        conditional=True,
+        etag=etag,
+        max_age=MEDIA_MAX_AGE,
+    )
+
+
 # ----------------------------------------------------
 # Main Entrypoint
 # ----------------------------------------------------
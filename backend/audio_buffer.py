@@ -0,0 +1,128 @@
+# ===== audio_buffer.py =====
+import hashlib
+import io
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+# ====================================================
+# In-memory Audio Buffer
+# ====================================================
+CHANNEL_LAYOUTS = {1: "mono", 2: "stereo"}
+
+
+class AudioBuffer:
+    """
+    Decoded audio passed between pipeline stages instead of intermediate files.
+
+    `samples` is a float32 array shaped (channels, frames); `layout` names the
+    channel arrangement ("mono", "stereo" or "<n>ch").
+    """
+
+    def __init__(self, samples, sample_rate, layout=None):
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim == 1:
+            samples = samples[np.newaxis, :]
+        self.samples = samples
+        self.sample_rate = int(sample_rate)
+        self.layout = layout or CHANNEL_LAYOUTS.get(self.channels, f"{self.channels}ch")
+
+    def __repr__(self):
+        return f"AudioBuffer({self.layout}, {self.sample_rate} Hz, {self.duration:.2f}s)"
+
+    # ---------------------------
+    # Properties
+    # ---------------------------
+    @property
+    def channels(self):
+        return self.samples.shape[0]
+
+    @property
+    def frames(self):
+        return self.samples.shape[1]
+
+    @property
+    def duration(self):
+        return self.frames / float(self.sample_rate) if self.sample_rate else 0.0
+
+    @property
+    def is_empty(self):
+        return self.frames == 0
+
+    # ---------------------------
+    # Construction / Export
+    # ---------------------------
+    @classmethod
+    def from_file(cls, path, sample_rate=None, mono=True):
+        """Decode an audio file (any format librosa/ffmpeg can read)."""
+        y, sr = librosa.load(path, sr=sample_rate, mono=mono)
+        return cls(y, sr)
+
+    def to_file(self, path, subtype=None):
+        """Write the buffer to disk; only used for final deliverables."""
+        sf.write(path, self.samples.T, self.sample_rate, subtype=subtype)
+        return path
+
+    def to_wav_bytes(self):
+        """Lossless float32 WAV encoding of the buffer (for on-disk caches)."""
+        data = io.BytesIO()
+        sf.write(data, self.samples.T, self.sample_rate, format='WAV', subtype='FLOAT')
+        return data.getvalue()
+
+    @classmethod
+    def from_wav_bytes(cls, data):
+        samples, sr = sf.read(io.BytesIO(data), dtype='float32', always_2d=True)
+        return cls(samples.T, sr)
+
+    def copy_with(self, samples, sample_rate=None):
+        """New buffer with processed samples, keeping rate and layout unless changed."""
+        samples = np.asarray(samples, dtype=np.float32)
+        channels = 1 if samples.ndim == 1 else samples.shape[0]
+        layout = self.layout if channels == self.channels else None
+        return AudioBuffer(samples, sample_rate or self.sample_rate, layout)
+
+    def content_hash(self):
+        """SHA-256 of the decoded samples, rate and layout (for result caches)."""
+        digest = hashlib.sha256()
+        digest.update(f"{self.sample_rate}:{self.channels}:{self.samples.dtype}".encode())
+        digest.update(np.ascontiguousarray(self.samples).tobytes())
+        return digest.hexdigest()
+
+    # ---------------------------
+    # Conversions
+    # ---------------------------
+    def mono(self):
+        """1-D mono samples (channel average)."""
+        if self.channels == 1:
+            return self.samples[0]
+        return self.samples.mean(axis=0)
+
+    def to_mono(self):
+        return AudioBuffer(self.mono(), self.sample_rate)
+
+    def with_channels(self, channels):
+        """Down-mix to mono or duplicate a mono signal across `channels`."""
+        if channels == self.channels:
+            return self
+        if channels == 1:
+            return self.to_mono()
+        if self.channels == 1:
+            return AudioBuffer(np.repeat(self.samples, channels, axis=0), self.sample_rate)
+        raise ValueError(f"Cannot convert {self.layout} audio to {channels} channels")
+
+    def resample(self, sample_rate):
+        if sample_rate == self.sample_rate or self.is_empty:
+            return AudioBuffer(self.samples, sample_rate, self.layout) if self.is_empty else self
+        resampled = librosa.resample(self.samples, orig_sr=self.sample_rate, target_sr=sample_rate)
+        return AudioBuffer(resampled, sample_rate, self.layout)
+
+    def to_pcm_bytes(self):
+        """Interleaved little-endian float32 PCM, e.g. for ffmpeg `-f f32le` pipes."""
+        return np.ascontiguousarray(self.samples.T).astype('<f4').tobytes()
+
+    @classmethod
+    def from_pcm_bytes(cls, data, sample_rate, channels):
+        interleaved = np.frombuffer(data, dtype='<f4')
+        usable = len(interleaved) - len(interleaved) % channels
+        return cls(interleaved[:usable].reshape(-1, channels).T, sample_rate)
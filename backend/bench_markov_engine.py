@@ -0,0 +1,103 @@
+# ===== bench_markov_engine.py =====
+# ----------------------------------------------------
+# Compares markovify with the compiled chain (markov_engine.py) on the real
+# corpus: build time, memory held by the model, and sampling throughput.
+#
+#   python bench_markov_engine.py [--language English] [--genre Pop]
+#                                 [--state-size 2] [--lines 2000] [--db PATH]
+# ----------------------------------------------------
+import argparse
+import gc
+import time
+import tracemalloc
+
+import markovify
+import numpy as np
+
+import lyrics_generator
+from markov_engine import CompiledChain
+
+
+def _measure_build(build):
+    """(model, seconds, MB still allocated after the build)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return model, elapsed, retained / 1024 / 1024
+
+
+def _lines_per_second(make_line, n_lines):
+    start = time.perf_counter()
+    made = 0
+    while made < n_lines:
+        made += make_line()
+    return made / (time.perf_counter() - start)
+
+
+def load_corpus(language, genre):
+    """Cleaned corpus text, from `clean_lyrics` when available, else the raw corpus."""
+    corpus = lyrics_generator.load_clean_corpus_from_db(language, genre)
+    if corpus is None:
+        raw = lyrics_generator.load_corpus_from_db(language, genre)
+        corpus = lyrics_generator.prepare_corpus_for_markov(raw, lyrics_generator.LANGUAGE_CODE_MAP.get(
+            language.lower(), 'en')) if raw else ""
+    return corpus
+
+
+def run(language, genre, state_size, n_lines):
+    corpus = load_corpus(language, genre)
+    if not corpus:
+        print(f"[ERROR] No corpus for {language}/{genre}")
+        return False
+    print(f"[INFO] Corpus: {len(corpus)} chars, {corpus.count(chr(10)) + 1} lines, state_size={state_size}")
+
+    markov, markov_build, markov_mb = _measure_build(lambda: markovify.NewlineText(corpus, state_size=state_size))
+    compiled, compiled_build, compiled_mb = _measure_build(lambda: CompiledChain.from_text(corpus, state_size))
+    rng = np.random.default_rng(0)
+
+    results = {
+        "markovify": {
+            "build_s": markov_build,
+            "memory_mb": markov_mb,
+            "raw_lines_per_s": _lines_per_second(lambda: bool(markov.make_sentence(test_output=False)), n_lines),
+            "tested_lines_per_s": _lines_per_second(
+                lambda: bool(markov.make_sentence(tries=50, max_overlap_ratio=0.7)), n_lines),
+        },
+        "compiled": {
+            "build_s": compiled_build,
+            "memory_mb": compiled_mb,
+            "raw_lines_per_s": _lines_per_second(
+                lambda: len(compiled.make_sentences(256, rng, test_output=False)), n_lines),
+            "tested_lines_per_s": _lines_per_second(
+                lambda: len(compiled.make_sentences(256, rng, max_overlap_ratio=0.7)), n_lines),
+        },
+    }
+
+    print(f"{'':12}{'build s':>10}{'memory MB':>12}{'lines/s':>12}{'tested lines/s':>16}")
+    for name, r in results.items():
+        print(f"{name:12}{r['build_s']:>10.2f}{r['memory_mb']:>12.1f}"
+              f"{r['raw_lines_per_s']:>12.0f}{r['tested_lines_per_s']:>16.0f}")
+    print(f"[INFO] Compiled chain: {len(compiled.states)} states, {len(compiled.tokens)} transitions, "
+          f"{compiled.nbytes / 1024 / 1024:.1f} MB of arrays and text")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark markovify against the compiled Markov chain.")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--genre", default="Pop")
+    parser.add_argument("--state-size", type=int, default=2)
+    parser.add_argument("--lines", type=int, default=2000, help="Lines to sample per measurement")
+    parser.add_argument("--db", default=lyrics_generator.DB_FILE_PATH, help="Path to lyrics_corpus.db")
+    args = parser.parse_args()
+    lyrics_generator.DB_FILE_PATH = args.db
+    raise SystemExit(0 if run(args.language, args.genre, args.state_size, args.lines) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# ===== bench_vocal_analysis.py =====
+# ----------------------------------------------------
+# Times vocal analysis before and after vocal_features.py: the legacy path
+# (time-domain RMS + pyin for the prompt, pyin again for refinement) against
+# the shared-STFT extraction at each quality tier, and checks that the
+# MusicGen prompt tags agree.
+#
+#   python bench_vocal_analysis.py [--input vocal.wav ...] [--repeat 3]
+#                                  [--tempo] [--key]
+# Without --input a synthetic sung phrase is analyzed.
+# ----------------------------------------------------
+import argparse
+import time
+
+import librosa
+import numpy as np
+
+from audio_buffer import AudioBuffer
+from shared import vocal_prompt_tags
+from vocal_features import ANALYSIS_TIERS, VocalFeatures, extract_features
+
+
+def synthetic_vocal(seconds=20.0, sr=44100):
+    """Vibrato-laden notes with harmonics and short gaps, roughly like a sung line."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    notes = librosa.midi_to_hz(rng.choice([57, 60, 62, 64, 67, 69], size=int(seconds * 2)))
+    f0 = np.repeat(notes, int(np.ceil(len(t) / len(notes))))[:len(t)] * (1 + 0.01 * np.sin(2 * np.pi * 5 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    y = sum(np.sin(k * phase) / k for k in range(1, 5))
+    gate = (np.sin(2 * np.pi * 0.5 * t) > -0.8).astype(np.float64)
+    y = 0.3 * y * gate + 0.003 * rng.standard_normal(len(t))
+    return AudioBuffer(y.astype(np.float32)[np.newaxis, :], sr)
+
+
+def legacy_analysis(y, sr):
+    """What prompt analysis and refinement computed before the feature cache (pyin twice)."""
+    rms = librosa.feature.rms(y=y)[0]
+    fmin, fmax = librosa.note_to_hz('C2'), librosa.note_to_hz('C7')
+    f0, voiced_flag, voiced_prob = librosa.pyin(y, fmin=fmin, fmax=fmax, sr=sr)
+    librosa.pyin(y, fmin=fmin, fmax=fmax, sr=sr)
+    return VocalFeatures(sr, f0, voiced_flag, voiced_prob, rms, 512, "legacy")
+
+
+def _best_time(run, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def bench(audio, name, repeat, tempo, key):
+    y, sr = audio.mono(), audio.sample_rate
+    print(f"\n[INFO] {name}: {len(y) / sr:.1f}s at {sr} Hz")
+    legacy, legacy_s = _best_time(lambda: legacy_analysis(y, sr), repeat)
+    rows = [("legacy", legacy, legacy_s)]
+    for quality in ANALYSIS_TIERS:
+        features, seconds = _best_time(lambda: extract_features(y, sr, quality, tempo, key), repeat)
+        rows.append((quality, features, seconds))
+
+    reference_tags = vocal_prompt_tags(legacy)
+    print(f"{'':10}{'seconds':>9}{'speedup':>9}{'pitch Hz':>10}{'RMS dB':>8}  tags  extras")
+    for label, features, seconds in rows:
+        tags = vocal_prompt_tags(features)
+        pitch = features.mean_pitch_hz
+        extras = ", ".join(str(x) for x in (
+            f"{features.tempo_bpm:.0f} BPM" if features.tempo_bpm else None, features.key) if x)
+        print(f"{label:10}{seconds:>9.2f}{legacy_s / seconds:>8.1f}x"
+              f"{(pitch or 0):>10.1f}{features.avg_rms_db:>8.1f}  {'same' if tags == reference_tags else 'DIFF'}"
+              f"  {extras}")
+    return all(vocal_prompt_tags(features) == reference_tags for _, features, _ in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vocal analysis tiers against the legacy pyin path.")
+    parser.add_argument("--input", nargs="*", default=[], help="Vocal files (default: synthetic phrase)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--tempo", action="store_true", help="Include tempo estimation")
+    parser.add_argument("--key", action="store_true", help="Include key estimation")
+    args = parser.parse_args()
+
+    inputs = [(path, AudioBuffer.from_file(path)) for path in args.input] or [("synthetic", synthetic_vocal())]
+    same = [bench(audio, name, args.repeat, args.tempo, args.key) for name, audio in inputs]
+    if not all(same):
+        print("[WARN] Some tiers produced different prompt tags than the legacy analysis.")
+    raise SystemExit(0 if all(same) else 1)
+
+
+if __name__ == "__main__":
+    main()
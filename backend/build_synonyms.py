@@ -0,0 +1,73 @@
+# ===== build_synonyms.py =====
+# ----------------------------------------------------
+# Builds the offline synonym table used to expand lyric bias keywords.
+# WordNet is only needed here (downloaded on first run); the app itself
+# reads the generated SQLite file and never touches NLTK or the network.
+#
+#   python build_synonyms.py [--output PATH]
+# ----------------------------------------------------
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from lyrics_generator import SYNONYMS_DB_PATH
+
+
+def collect_synonyms():
+    """word → set of WordNet lemma names sharing a synset with it (lower-cased, spaces for '_')."""
+    import nltk
+    nltk.download('wordnet', quiet=True)
+    nltk.download('omw-1.4', quiet=True)
+    from nltk.corpus import wordnet
+
+    synonyms = {}
+    for synset in wordnet.all_synsets():
+        names = {lemma.name().replace('_', ' ').lower() for lemma in synset.lemmas()}
+        for name in names:
+            # Bias keywords are single \w+ tokens, so only single words need an entry
+            if ' ' in name:
+                continue
+            synonyms.setdefault(name, set()).update(names)
+    return synonyms
+
+
+def build_synonyms(output_path=SYNONYMS_DB_PATH):
+    started = time.time()
+    synonyms = collect_synonyms()
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE synonyms (word TEXT PRIMARY KEY, synonyms TEXT NOT NULL) WITHOUT ROWID")
+        conn.executemany(
+            "INSERT INTO synonyms (word, synonyms) VALUES (?, ?)",
+            ((word, "\n".join(sorted(names))) for word, names in sorted(synonyms.items()))
+        )
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, output_path)
+
+    print(f"[SUCCESS] Wrote {len(synonyms)} words to {output_path} in {time.time() - started:.1f}s.")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline WordNet synonym table for bias expansion.")
+    parser.add_argument("--output", default=SYNONYMS_DB_PATH, help="SQLite file to write")
+    args = parser.parse_args()
+    try:
+        build_synonyms(args.output)
+    except (ImportError, LookupError) as e:
+        print(f"[ERROR] WordNet is not available: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# ===== encoder.py =====
+# ----------------------------------------------------
+# Encoding of deliverables (WAV, MP3, FLAC, OPUS, OGG).
+#
+# Audio is handed to ffmpeg as raw float32 PCM on stdin, so nothing is
+# re-read or re-decoded from disk, and a single ffmpeg process writes every
+# compressed output of one buffer (several formats and/or files in one
+# pass). WAV is written in process. Independent buffers (final mix, music
+# and vocal stems) are encoded concurrently on a small bounded thread pool.
+# Failures raise EncodingError with ffmpeg's message.
+# ----------------------------------------------------
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_buffer import AudioBuffer
+
+# ====================================================
+# Encoder Configuration
+# ====================================================
+# ffmpeg output arguments by format; WAV never reaches ffmpeg
+CODEC_ARGS = {
+    "mp3": ["-acodec", "libmp3lame"],
+    "flac": ["-acodec", "flac"],
+    "opus": ["-acodec", "libopus"],
+    "ogg": ["-acodec", "libvorbis"],
+}
+SUPPORTED_FORMATS = ["wav"] + list(CODEC_ARGS)
+WAV_SUBTYPE = 'PCM_16'
+
+# Concurrent encodes (each may run one ffmpeg process)
+ENCODE_WORKERS = int(os.getenv('SONOSPHERE_ENCODE_WORKERS', 3))
+ENCODE_POOL = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="sonosphere-encode")
+
+
+class EncodingError(Exception):
+    """An output could not be written; carries ffmpeg's stderr when it was the cause."""
+
+    def __init__(self, message, stderr=""):
+        super().__init__(f"{message}: {stderr.strip()}" if stderr.strip() else message)
+        self.stderr = stderr
+
+
+def normalize_format(desired_format):
+    desired_format = (desired_format or "").lower().lstrip(".")
+    if desired_format not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported output format: {desired_format}")
+    return desired_format
+
+
+def output_path_for(directory, base, desired_format):
+    """Unique `<base>_<random>_converted.<format>` path in `directory`."""
+    return os.path.join(directory, f"{base}_{os.urandom(6).hex()}_converted.{desired_format}")
+
+
+# ====================================================
+# Encoding
+# ====================================================
+def encode_buffer(audio, outputs):
+    """
+    Write one AudioBuffer to every `(output_path, format)` in `outputs` and
+    return the paths. All compressed outputs come from one ffmpeg invocation.
+    """
+    outputs = [(path, normalize_format(fmt)) for path, fmt in outputs]
+    if audio.is_empty:
+        raise EncodingError("Cannot encode empty audio")
+
+    for path, fmt in outputs:
+        if fmt == "wav":
+            try:
+                audio.to_file(path, subtype=WAV_SUBTYPE)
+            except (RuntimeError, OSError) as e:
+                raise EncodingError(f"Could not write {path}", str(e))
+
+    ffmpeg_outputs = [(path, fmt) for path, fmt in outputs if fmt != "wav"]
+    if ffmpeg_outputs:
+        command = ["ffmpeg", "-y", "-v", "error", "-f", "f32le", "-ar", str(audio.sample_rate),
+                   "-ac", str(audio.channels), "-i", "pipe:0"]
+        for path, fmt in ffmpeg_outputs:
+            command += CODEC_ARGS[fmt] + [path]
+        try:
+            result = subprocess.run(command, input=audio.to_pcm_bytes(), capture_output=True)
+        except OSError as e:
+            raise EncodingError("Could not start ffmpeg", str(e))
+        if result.returncode != 0:
+            formats = ", ".join(fmt for _, fmt in ffmpeg_outputs)
+            raise EncodingError(f"ffmpeg failed to encode {formats}", result.stderr.decode(errors='ignore'))
+
+    for path, fmt in outputs:
+        print(f"[INFO] Encoded → {fmt}: {path}")
+    return [path for path, _ in outputs]
+
+
+def encode_file(input_path, outputs):
+    """Decode a file at its native rate and layout, then `encode_buffer` it."""
+    try:
+        audio = AudioBuffer.from_file(input_path, mono=False)
+    except Exception as e:
+        raise EncodingError(f"Could not decode {input_path}", str(e))
+    return encode_buffer(audio, outputs)
+
+
+def encode_many(jobs):
+    """
+    Run `(source, outputs)` jobs concurrently on ENCODE_POOL; `source` is an
+    AudioBuffer or a file path. Returns each job's paths in order, or its
+    EncodingError instance, so one failed stem does not hide the others.
+    """
+    futures = [ENCODE_POOL.submit(encode_buffer if isinstance(source, AudioBuffer) else encode_file,
+                                  source, outputs)
+               for source, outputs in jobs]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except EncodingError as e:
+            print(f"[ERROR] {e}")
+            results.append(e)
+    return results
+
+
+def encode_stems(stems, desired_format, output_dir):
+    """
+    Encode named sources (`{name: (source, base_name)}`) to one format.
+    Sources shared by several names (e.g. the vocal doubling as the final
+    track) are encoded once, writing all their files from the same pass.
+    Returns `{name: path}`; raises EncodingError if any encode failed.
+    """
+    desired_format = normalize_format(desired_format)
+    grouped = {}
+    for name, (source, base) in stems.items():
+        key = id(source) if isinstance(source, AudioBuffer) else source
+        group = grouped.setdefault(key, (source, []))
+        group[1].append((name, output_path_for(output_dir, base, desired_format)))
+
+    groups = list(grouped.values())
+    results = encode_many([(source, [(path, desired_format) for _, path in targets]) for source, targets in groups])
+    errors = [r for r in results if isinstance(r, EncodingError)]
+    if errors:
+        raise errors[0]
+    return {name: path for (_, targets) in groups for name, path in targets}
@@ -0,0 +1,177 @@
+# ===== jobs.py =====
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# ====================================================
+# Job Configuration
+# ====================================================
+JOB_WORKERS = int(os.getenv('SONOSPHERE_JOB_WORKERS', 2))
+# Finished jobs are forgotten after this many seconds
+JOB_TTL_SECONDS = int(os.getenv('SONOSPHERE_JOB_TTL', 3600))
+# Interval between SSE keep-alive comments
+SSE_HEARTBEAT_SECONDS = 15
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+# ====================================================
+# Job Model
+# ====================================================
+class Job:
+    """State of a single background pipeline run, including its progress events."""
+
+    def __init__(self, kind, stages):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.stages = list(stages)
+        self.status = JOB_QUEUED
+        self.stage = None
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.status_code = None
+        self.events = []
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": self.stages,
+            "progress": round(self.progress, 3),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# ====================================================
+# Job Manager
+# ====================================================
+class JobManager:
+    """
+    Runs pipeline functions in the background and tracks their progress.
+
+    The executor only needs a `submit(fn, *args)` method, so the default
+    in-process thread pool can be replaced with an adapter for an external queue.
+    Pipeline functions receive a `progress(stage, message=None)` callback as a
+    keyword argument and return a JSON-serializable result.
+    """
+
+    def __init__(self, executor=None):
+        self._executor = executor or ThreadPoolExecutor(max_workers=JOB_WORKERS,
+                                                        thread_name_prefix="sonosphere-job")
+        self._jobs = {}
+        self._cond = threading.Condition()
+
+    def submit(self, kind, stages, fn, *args, **kwargs):
+        """Queue `fn(*args, progress=..., **kwargs)` and return the new Job."""
+        job = Job(kind, stages)
+        with self._cond:
+            self._prune()
+            self._jobs[job.id] = job
+            self._record(job, "queued", None)
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        with self._cond:
+            job.status = JOB_RUNNING
+            self._record(job, "running", None)
+
+        def progress(stage, message=None):
+            with self._cond:
+                job.stage = stage
+                if stage in job.stages:
+                    job.progress = job.stages.index(stage) / len(job.stages)
+                self._record(job, "stage", message)
+
+        try:
+            result = fn(*args, progress=progress, **kwargs)
+            with self._cond:
+                job.result = result
+                job.status = JOB_SUCCEEDED
+                job.progress = 1.0
+                self._finish(job)
+        except Exception as e:
+            print(f"[ERROR] Job {job.id} ({job.kind}) failed: {e}")
+            traceback.print_exc()
+            with self._cond:
+                job.error = str(e)
+                job.status_code = getattr(e, 'status_code', 500)
+                job.status = JOB_FAILED
+                self._finish(job)
+
+    def _finish(self, job):
+        job.finished_at = time.time()
+        self._record(job, job.status, job.error)
+
+    def _record(self, job, event_type, message):
+        """Append a progress event and wake up SSE listeners (caller holds the lock)."""
+        job.updated_at = time.time()
+        job.events.append({
+            "event": event_type,
+            "status": job.status,
+            "stage": job.stage,
+            "progress": round(job.progress, 3),
+            "message": message,
+            "time": job.updated_at,
+        })
+        self._cond.notify_all()
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        expired = [jid for jid, j in self._jobs.items() if j.done and j.finished_at < cutoff]
+        for jid in expired:
+            del self._jobs[jid]
+
+    def stream_events(self, job_id):
+        """
+        Yield server-sent-event frames for a job until it finishes.
+        Replays past events first so late subscribers see the full history.
+        """
+        sent = 0
+        while True:
+            with self._cond:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                if sent >= len(job.events) and not job.done:
+                    self._cond.wait(timeout=SSE_HEARTBEAT_SECONDS)
+                pending = job.events[sent:]
+                sent += len(pending)
+                finished = job.done and sent >= len(job.events)
+                snapshot = job.to_dict() if finished else None
+
+            if not pending and not finished:
+                yield ": keep-alive\n\n"
+            for event in pending:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            if finished:
+                yield f"event: done\ndata: {json.dumps(snapshot)}\n\n"
+                return
+
+
+JOB_MANAGER = JobManager()
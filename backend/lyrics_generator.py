@@ -3,24 +3,23 @@
 # ----------------------------
 # Imports
 # ----------------------------
+import functools
 import os
 import random
 import re
 import sqlite3
 import sys
+import threading
 import traceback
+from collections import OrderedDict
 
 import markovify
-# ===== NEW IMPORTS =====
-import nltk
-from nltk.corpus import wordnet
 
+from markov_engine import CompiledChain, MixtureChain
+from profanity_filter import get_matcher
+from result_cache import DiskCache, cache_key
 from utilities import LANGUAGE_CODE_MAP, genre_bias_text
 
-# Ensure WordNet is downloaded
-nltk.download('wordnet', quiet=True)
-nltk.download('omw-1.4', quiet=True)
-
 LYRICS_LANGUAGES = ['English', 'Chinese', 'French', 'German', 'Italian', 'Russian', 'Spanish', 'Arabic']
 
 # ----------------------------
@@ -30,23 +29,45 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FRONTEND_STATIC = os.path.normpath(os.path.join(BASE_DIR, "../frontend/static"))
 DB_FILE_PATH = os.path.join(FRONTEND_STATIC, "lyrics_corpora", "lyrics_corpus.db")
 DB_TABLE_NAME = "all_lyrics"
-
-# ----------------------------
-# Profanity Setup
-# ----------------------------
-try:
-    from better_profanity import profanity
-except ImportError:
-    class MockProfanity:
-        @staticmethod
-        def contains_profanity(word):
-            return False
-
-
-    profanity = MockProfanity()
-
-profanity.load_censor_words()  # default list
-
+# Offline WordNet synonym table written by `build_synonyms.py`
+SYNONYMS_DB_PATH = os.getenv('SONOSPHERE_SYNONYMS_DB',
+                             os.path.join(FRONTEND_STATIC, "lyrics_corpora", "synonyms.db"))
+# FTS5 indexes created by `setup_database.py` (see migrate_database)
+DB_FTS_TABLE = "all_lyrics_fts"
+DB_CJK_FTS_TABLE = "all_lyrics_fts_cjk"
+# Pre-cleaned corpus lines created by `preprocess_corpus.py`
+DB_CLEAN_TABLE = "clean_lyrics"
+DB_CLEAN_META_TABLE = "clean_lyrics_meta"
+# The trigram tokenizer only matches terms of at least three characters
+TRIGRAM_MIN_CHARS = 3
+
+# Bump when corpus cleaning or model building changes the model for the same corpus
+CORPUS_CLEANING_VERSION = 2
+# Bump when the raw-corpus fallback changes cached models without touching `clean_lyrics`
+MARKOV_MODEL_VERSION = 2
+# Built Markov models kept in memory (LRU) and persisted as markovify JSON
+MARKOV_MEMORY_CACHE_SIZE = int(os.getenv('SONOSPHERE_MARKOV_CACHE_SIZE', 8))
+MARKOV_DISK_CACHE = DiskCache("markov", int(os.getenv('SONOSPHERE_MARKOV_CACHE_MB', 1024)) * 1024 * 1024)
+# Chain implementation: "compiled" (array-backed, see markov_engine.py) or "markovify"
+MARKOV_ENGINE = os.getenv('SONOSPHERE_MARKOV_ENGINE', 'compiled').strip().lower()
+# Candidate lines sampled per batch by the compiled engine
+SENTENCE_BATCH = 64
+# Share of the generated transitions that come from the bias model
+BIAS_SHARE = float(os.getenv('SONOSPHERE_BIAS_SHARE', 0.75))
+
+# Corpus retrieval budget per lookup: characters / rows sampled (0 = unlimited)
+CORPUS_CHAR_BUDGET = int(os.getenv('SONOSPHERE_CORPUS_CHAR_BUDGET', 2000000))
+CORPUS_ROW_BUDGET = int(os.getenv('SONOSPHERE_CORPUS_ROW_BUDGET', 0))
+# Seed of the row sampling (unset = a different sample per build)
+_corpus_seed = os.getenv('SONOSPHERE_CORPUS_SEED')
+CORPUS_SAMPLE_SEED = int(_corpus_seed) if _corpus_seed else None
+# Genres pooled in the second sampling tier, after the exact genre
+RELATED_GENRES = ('rap', 'hip-hop')
+# Rows in the first page read from a sampled tier (later pages double, up to the cap)
+SAMPLE_FETCH_BATCH = 500
+SAMPLE_FETCH_MAX = 32000
+# Prime modulus of the sample order; ids below it get distinct sort keys
+SAMPLE_ORDER_MODULUS = 2147483647
 
 # ============================================================
 # == CORE HELPERS ==
@@ -80,48 +101,13 @@ def clean_corpus_text(text, language_code):
     return "\n".join([line for line in lines if len(line.split()) >= 2])
 
 
-def emphasize_bias_in_corpus(corpus_text, bias, min_corpus_size=10000, multiplier=3):
-    if not bias or len(bias.strip()) < 3:
-        return corpus_text
-    bias_lower = bias.strip().lower()
-    lines = [line for line in corpus_text.split('\n') if line.strip()]
-    emphasized_lines = []
-    for line in lines:
-        emphasized_lines.append(line)
-        if bias_lower in line.lower():
-            for _ in range(multiplier):
-                emphasized_lines.append(line)
-    new_corpus = "\n".join(emphasized_lines)
-    while len(new_corpus) < min_corpus_size:
-        new_corpus += "\n" + "\n".join(emphasized_lines[:5])
-    return new_corpus
-
-
-def soft_censor_text(text):
-    def censor_word(match):
-        word = match.group()
-        norm = re.sub(r'[^a-zA-Z]', '', word).lower()
-        if profanity.contains_profanity(norm):
-            return word[0] + '*' * (len(word) - 1)
-        return word
-
-    return re.sub(r'\b[\w\'!@#\$%\^&*\-]+\b', censor_word, text, flags=re.UNICODE)
-
-
-def is_profane_sentence(text):
-    """
-    Checks if a sentence contains any profanity without censoring it.
-    (NEW HELPER FUNCTION FOR PROFANITY FILTERING)
-    """
-    # Find all words/tokens in the text
-    words = re.findall(r'\b[\w\'!@#\$%\^&*\-]+\b', text, flags=re.UNICODE)
-    for word in words:
-        # Normalize the word for the profanity check
-        norm = re.sub(r'[^a-zA-Z]', '', word).lower()
-        # If profanity is found, return True immediately
-        if profanity.contains_profanity(norm):
-            return True
-    return False
+def soft_censor_text(text, lang_code=None):
+    return get_matcher(lang_code).censor(text)
+
+
+def is_profane_sentence(text, lang_code=None):
+    """Checks if a sentence contains any profanity without censoring it."""
+    return get_matcher(lang_code).contains(text)
 
 
 def log_data_snippet(data_string, max_length=500):
@@ -179,103 +165,310 @@ STOP_WORDS = {
 # == BIAS SYNONYMS & FILTER ==
 # ============================================================
 
+def _base_forms(word):
+    """The word plus naive inflection stems ("loved" → "love"), as WordNet's morphy would find."""
+    forms = [word]
+    for suffix, replacements in (("ies", ("y",)), ("es", ("", "e")), ("s", ("",)),
+                                 ("ing", ("", "e")), ("ed", ("", "e")), ("ly", ("",))):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            forms.extend(word[:-len(suffix)] + r for r in replacements)
+    return forms
+
+
+@functools.lru_cache(maxsize=None)
+def _warn_missing_synonyms():
+    print(f"[WARN] Synonym table not found at {SYNONYMS_DB_PATH}; bias uses the given words only "
+          "(run build_synonyms.py).")
+
+
+def lookup_synonyms(word):
+    """
+    Synonyms of one word from the offline table (empty if unknown or the table
+    is missing). Only lookups against an existing table are cached, so a table
+    built while the server runs is picked up.
+    """
+    if not os.path.exists(SYNONYMS_DB_PATH):
+        _warn_missing_synonyms()
+        return frozenset()
+    return _lookup_synonyms(word)
+
+
+@functools.lru_cache(maxsize=4096)
+def _lookup_synonyms(word):
+    conn = sqlite3.connect(f"file:{SYNONYMS_DB_PATH}?mode=ro", uri=True)
+    try:
+        for form in _base_forms(word):
+            row = conn.execute("SELECT synonyms FROM synonyms WHERE word = ?", (form,)).fetchone()
+            if row:
+                return frozenset(row[0].split("\n"))
+    except sqlite3.Error as e:
+        print(f"[ERROR] Synonym lookup failed: {e}", file=sys.stderr)
+    finally:
+        conn.close()
+    return frozenset()
+
+
 def expand_bias_with_synonyms(bias):
     """Return a set of bias keywords including synonyms (English only)."""
+    return _expand_bias_with_synonyms(bias, os.path.exists(SYNONYMS_DB_PATH))
+
+
+@functools.lru_cache(maxsize=1024)
+def _expand_bias_with_synonyms(bias, synonyms_available):
+    # `synonyms_available` keys the cache, so expansions made without the table expire once it exists
     if not bias or len(bias.strip()) < 3:
-        return set()
+        return frozenset()
     words = [w.lower() for w in re.findall(r'\b\w+\b', bias) if w.lower() not in STOP_WORDS]
     expanded = set(words)
     for w in words:
-        for syn in wordnet.synsets(w):
-            for lemma in syn.lemmas():
-                lemma_name = lemma.name().replace('_', ' ').lower()
-                if lemma_name not in STOP_WORDS:
-                    expanded.add(lemma_name)
-    return expanded
+        expanded.update(s for s in lookup_synonyms(w) if s not in STOP_WORDS)
+    return frozenset(expanded)
+
+
+def _fts_phrase(term):
+    """Quote a keyword as an FTS5 string (embedded quotes are doubled)."""
+    return '"' + term.replace('"', '""') + '"'
 
 
-def build_bias_filter(bias):
-    """Construct SQL LIKE clauses from bias keywords including synonyms."""
+def build_bias_filter(bias, lang_code=None, fts_tables=(), rowid_column="rowid", text_column="Lyrics"):
+    """
+    Build a parameterized WHERE clause selecting lyrics that mention the bias
+    keywords (including synonyms). Returns (clause, params, method): method
+    is "fts", "trigram" or "like" for the path taken, and clause is "" (method
+    None) if there is no usable bias.
+
+    Uses the FTS5 index when the DB carries one: word-prefix MATCH for spaced
+    languages, trigram substring MATCH for Chinese. Falls back to LIKE.
+    `rowid_column` / `text_column` name the song id and text of the queried table.
+    """
     if not bias or len(bias.strip()) < 3:
-        return ""
-    bias_keywords = expand_bias_with_synonyms(bias)
+        return "", [], None
+    bias_keywords = sorted(expand_bias_with_synonyms(bias))
     if not bias_keywords:
-        return ""
-    single = [f"Lyrics LIKE '%{w}%'" for w in bias_keywords]
-    words_list = list(bias_keywords)
-    phrases = []
-    for i in range(len(words_list) - 1):
-        phrases.append(f"Lyrics LIKE '%{words_list[i]} {words_list[i + 1]}%'")
-    all_clauses = single + phrases
-    return "(" + " OR ".join(all_clauses) + ")"
+        return "", [], None
+
+    if lang_code == 'zh':
+        if DB_CJK_FTS_TABLE in fts_tables and all(len(w) >= TRIGRAM_MIN_CHARS for w in bias_keywords):
+            match = " OR ".join(_fts_phrase(w) for w in bias_keywords)
+            return (f"{rowid_column} IN (SELECT rowid FROM {DB_CJK_FTS_TABLE} "
+                    f"WHERE {DB_CJK_FTS_TABLE} MATCH ?)", [match], "trigram")
+    elif DB_FTS_TABLE in fts_tables:
+        # Prefix match keeps the old substring behaviour for inflections ("love" → "loved")
+        match = " OR ".join(f"{_fts_phrase(w)}*" for w in bias_keywords)
+        return (f"{rowid_column} IN (SELECT rowid FROM {DB_FTS_TABLE} WHERE {DB_FTS_TABLE} MATCH ?)",
+                [match], "fts")
+
+    clauses = " OR ".join([f"{text_column} LIKE ?"] * len(bias_keywords))
+    return f"({clauses})", [f"%{w}%" for w in bias_keywords], "like"
+
+
+def available_fts_tables(cursor):
+    """Names of the FTS5 lyric indexes and derived tables present in the open DB."""
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name IN (?, ?, ?)",
+        (DB_FTS_TABLE, DB_CJK_FTS_TABLE, DB_CLEAN_TABLE)
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+@functools.lru_cache(maxsize=256)
+def bias_line_pattern(bias_keywords):
+    """Regex matching whole lines that contain any of the (frozenset of) keywords."""
+    alternatives = "|".join(re.escape(k) for k in sorted(bias_keywords, key=len, reverse=True))
+    return re.compile(rf"^.*(?:{alternatives}).*$", flags=re.MULTILINE | re.IGNORECASE)
 
 
 def filter_corpus_by_bias(corpus_text, bias_keywords):
     """Keep only lines containing at least one of the bias keywords."""
     if not bias_keywords:
         return corpus_text
-    filtered_lines = []
-    for line in corpus_text.split('\n'):
-        line_lower = line.lower()
-        if any(k in line_lower for k in bias_keywords):
-            filtered_lines.append(line)
-    return "\n".join(filtered_lines)
+    return "\n".join(bias_line_pattern(frozenset(bias_keywords)).findall(corpus_text))
 
 
 # ============================================================
 # == DATABASE ACCESS ==
 # ============================================================
 
-def load_corpus_from_db(language, genre, bias=None):
+def make_corpus_rng():
+    """Row-sampling generator: seeded by SONOSPHERE_CORPUS_SEED, else random."""
+    return random.Random(CORPUS_SAMPLE_SEED)
+
+
+def corpus_tiers(lang_code, genre, language_column, genre_column):
+    """
+    Sampling tiers as (name, WHERE clause, params): the exact genre, then the
+    related genres, then the rest of the language. Tiers don't overlap.
+    """
+    related = [g for g in RELATED_GENRES if g != genre]
+    excluded = [genre] + related
+    tiers = [("genre", f"{language_column}=? AND {genre_column}=?", [lang_code, genre])]
+    if related:
+        tiers.append(("related", f"{language_column}=? AND {genre_column} IN ({', '.join('?' * len(related))})",
+                      [lang_code] + related))
+    tiers.append(("language", f"{language_column}=? AND ({genre_column} IS NULL OR "
+                              f"{genre_column} NOT IN ({', '.join('?' * len(excluded))}))",
+                  [lang_code] + excluded))
+    return tiers
+
+
+def sample_corpus_rows(conn, table, id_column, text_column, tiers, rng=None, min_chars=10000,
+                       max_chars=None, max_rows=None, report=None):
+    """
+    Stream texts from `table`, tier by tier, in a random order until the
+    character/row budget is spent. The order is drawn from `rng` and computed
+    inside SQLite: rows sort by `(id * a + b) % SAMPLE_ORDER_MODULUS` with
+    per-tier salts a, b, and are read in growing keyset pages, so nothing but
+    the current page reaches Python. Later tiers are used only while fewer
+    than `min_chars` characters were collected.
+    `report` (a dict) receives per-tier row/character counts.
+    """
+    rng = rng or random
+    max_chars = CORPUS_CHAR_BUDGET if max_chars is None else max_chars
+    max_rows = CORPUS_ROW_BUDGET if max_rows is None else max_rows
+    report = report if report is not None else {}
+    report.update(rows=0, chars=0, truncated=False, tiers=[])
+    chars = rows = 0
+
+    for name, where, params in tiers:
+        if chars >= min_chars:
+            break
+        candidates = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+        tier = {"tier": name, "candidates": candidates, "rows": 0, "chars": 0}
+        report["tiers"].append(tier)
+
+        a, b = rng.randrange(1, SAMPLE_ORDER_MODULUS), rng.randrange(SAMPLE_ORDER_MODULUS)
+        order = f"(({id_column} * {a} + {b}) % {SAMPLE_ORDER_MODULUS})"
+        query = (f"SELECT {order} AS sample_key, {text_column} FROM {table} "
+                 f"WHERE ({where}) AND {order} > ? ORDER BY sample_key LIMIT ?")
+        last_key, page = -1, SAMPLE_FETCH_BATCH
+        while True:
+            batch = conn.execute(query, list(params) + [last_key, page]).fetchall()
+            for _, text in batch:
+                if not text or not text.strip():
+                    continue
+                yield text
+                rows += 1
+                chars += len(text) + 1
+                tier["rows"] += 1
+                tier["chars"] += len(text) + 1
+                if (max_chars and chars >= max_chars) or (max_rows and rows >= max_rows):
+                    report.update(rows=rows, chars=chars, truncated=True)
+                    return
+            if len(batch) < page:
+                break
+            last_key, page = batch[-1][0], min(page * 2, SAMPLE_FETCH_MAX)
+    report.update(rows=rows, chars=chars)
+
+
+def _log_corpus_report(label, report):
+    used = ", ".join(f"{t['tier']} {t['rows']}/{t['candidates']}" for t in report.get("tiers", []))
+    budget = " (budget reached)" if report.get("truncated") else ""
+    print(f"[INFO] {label}: {report.get('rows', 0)} rows, {report.get('chars', 0)} chars [{used}]{budget}")
+
+
+def load_corpus_from_db(language, genre, bias=None, rng=None, min_chars=10000):
+    """
+    Sample raw lyrics for a language/genre (see `sample_corpus_rows`) and join
+    them into one corpus string, or None if nothing matches.
+    """
     if not os.path.exists(DB_FILE_PATH):
         print(f"[WARN] DB file missing: {DB_FILE_PATH}")
         return None
     language_input = language.strip().lower() if language else ''
     genre = genre.strip().lower() if genre else ''
     lang_code = LANGUAGE_CODE_MAP.get(language_input, 'en')
+    rng = rng or make_corpus_rng()
+    report = {}
     print(f"[DEBUG] DB Lookup: Language='{lang_code}', Genre='{genre}', Bias='{bias}'")
-    base_query = f"SELECT Lyrics FROM {DB_TABLE_NAME}"
-    bias_filter = build_bias_filter(bias)
-    queries = [
-        f"{base_query} WHERE LOWER(Language)='{lang_code}' AND LOWER(Genre)='{genre}'" + (
-            f" AND {bias_filter}" if bias_filter else ""),
-        f"{base_query} WHERE LOWER(Language)='{lang_code}' AND LOWER(Genre) IN ('{genre}', 'rap', 'hip-hop')" + (
-            f" AND {bias_filter}" if bias_filter else ""),
-        f"{base_query} WHERE LOWER(Language)='{lang_code}'" + (f" AND {bias_filter}" if bias_filter else "")
-    ]
-    results = []
     conn = None
     try:
         conn = sqlite3.connect(DB_FILE_PATH)
-        cursor = conn.cursor()
-        for q in queries:
-            cursor.execute(q)
-            new = [row[0] for row in cursor.fetchall() if row[0] and row[0].strip()]
-            if new:
-                print(f"[INFO] Query succeeded: {q.split('WHERE')[1][:80]}...")
-                results.extend(new)
-            if len("\n".join(results)) >= 10000:
-                break
+        bias_filter, bias_params, bias_method = build_bias_filter(bias, lang_code,
+                                                                  available_fts_tables(conn.cursor()))
+        if bias_method == "like":
+            print("[WARN] Bias lookup without full-text index (run `python setup_database.py --migrate-only`).")
+        tiers = corpus_tiers(lang_code, genre, "LOWER(Language)", "LOWER(Genre)")
+        if bias_filter:
+            tiers = [(name, f"{where} AND {bias_filter}", params + bias_params) for name, where, params in tiers]
+        results = list(sample_corpus_rows(conn, DB_TABLE_NAME, "rowid", "Lyrics", tiers, rng, min_chars,
+                                          report=report))
         if not results and bias_filter:
             print("[WARN] Bias queries failed — retrying without bias...")
-            cursor.execute(f"{base_query} WHERE LOWER(Language)='{lang_code}'")
-            results = [row[0] for row in cursor.fetchall() if row[0] and row[0].strip()]
-            if results:
-                print("[INFO] Fallback succeeded.")
+            tiers = [("language", "LOWER(Language)=?", [lang_code])]
+            results = list(sample_corpus_rows(conn, DB_TABLE_NAME, "rowid", "Lyrics", tiers, rng, min_chars,
+                                              report=report))
     except sqlite3.Error as e:
         print(f"[ERROR] SQLite Error: {e}", file=sys.stderr)
         return None
     finally:
         if conn:
             conn.close()
+    _log_corpus_report("Raw corpus sample", report)
     corpus = "\n".join(results)
     if not corpus.strip():
         print(f"[WARN] No DB results for {language}/{genre}", file=sys.stderr)
         return None
-    print(f"[DEBUG] Final corpus size: {len(corpus)} chars")
     return corpus
 
 
+def clean_corpus_version(cursor):
+    """Cleaning version the `clean_lyrics` table was built with, or None."""
+    try:
+        cursor.execute(f"SELECT value FROM {DB_CLEAN_META_TABLE} WHERE key='cleaning_version'")
+        row = cursor.fetchone()
+    except sqlite3.Error:
+        return None
+    return int(row[0]) if row else None
+
+
+def load_clean_corpus_from_db(language, genre, bias=None, rng=None, min_chars=10000):
+    """
+    Sample already-cleaned, non-profane corpus lines from the `clean_lyrics` table.
+    Returns None when the table is missing or stale (the caller then cleans the
+    raw corpus), or "" when it has no lines for this lookup.
+    """
+    if not os.path.exists(DB_FILE_PATH):
+        return None
+    language_input = language.strip().lower() if language else ''
+    genre = genre.strip().lower() if genre else ''
+    lang_code = LANGUAGE_CODE_MAP.get(language_input, 'en')
+    rng = rng or make_corpus_rng()
+    report = {}
+    conn = None
+    try:
+        conn = sqlite3.connect(DB_FILE_PATH)
+        cursor = conn.cursor()
+        tables = available_fts_tables(cursor)
+        if DB_CLEAN_TABLE not in tables or clean_corpus_version(cursor) != CORPUS_CLEANING_VERSION:
+            print("[WARN] No up-to-date cleaned corpus; run `python preprocess_corpus.py`.")
+            return None
+
+        print(f"[DEBUG] Clean corpus lookup: Language='{lang_code}', Genre='{genre}', Bias='{bias}'")
+        bias_filter, bias_params, _ = build_bias_filter(bias, lang_code, tables, rowid_column="SongId",
+                                                        text_column="Line")
+        bias_sql = f" AND {bias_filter}" if bias_filter else ""
+        tiers = [(name, f"{where} AND IsProfane=0{bias_sql}", params + bias_params)
+                 for name, where, params in corpus_tiers(lang_code, genre, "Language", "Genre")]
+        results = list(sample_corpus_rows(conn, DB_CLEAN_TABLE, "Id", "Line", tiers, rng, min_chars,
+                                          report=report))
+        if not results and bias_filter:
+            print("[WARN] Bias queries failed — retrying without bias...")
+            tiers = [("language", "Language=? AND IsProfane=0", [lang_code])]
+            results = list(sample_corpus_rows(conn, DB_CLEAN_TABLE, "Id", "Line", tiers, rng, min_chars,
+                                              report=report))
+    except sqlite3.Error as e:
+        print(f"[ERROR] SQLite Error: {e}", file=sys.stderr)
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+    if lang_code in DEDUPLICATED_LANGUAGES:
+        results = list(dict.fromkeys(results))
+    _log_corpus_report("Clean corpus sample", report)
+    return "\n".join(results)
+
+
 # ============================================================
 # == MARKOV MODEL ==
 # ============================================================
@@ -286,10 +479,19 @@ except ImportError:
     MarkovifyError = Exception
 
 
-def build_markov_model_from_text(text, state_size=3):
-    if len(text.strip()) < 1000:
+def build_markov_model_from_text(text, state_size=3, min_chars=1000):
+    if len(text.strip()) < max(min_chars, 1):
         print(f"[ERROR] Corpus too short ({len(text.strip())} chars)", file=sys.stderr)
         return None
+    if MARKOV_ENGINE == "compiled":
+        print(f"[INFO] Compiling Markov chain (state_size={state_size})")
+        model = CompiledChain.from_text(text, state_size=state_size)
+        if model is None:
+            print("[ERROR] No usable lines for the Markov chain", file=sys.stderr)
+            return None
+        print(f"[INFO] Chain compiled: {len(model.states)} states, {len(model.tokens)} transitions, "
+              f"{model.nbytes / 1024 / 1024:.1f} MB")
+        return model
     try:
         print(f"[INFO] Building Markov model (state_size={state_size})")
         model = markovify.NewlineText(text, state_size=state_size)
@@ -312,10 +514,184 @@ def build_markov_model_from_text(text, state_size=3):
         return None
 
 
+# ============================================================
+# == MARKOV MODEL CACHE ==
+# ============================================================
+
+_markov_models = OrderedDict()
+_markov_lock = threading.Lock()
+
+
+def corpus_signature(db_path=None):
+    """(size, mtime) of the corpus DB; changes whenever the DB is replaced or edited."""
+    try:
+        st = os.stat(db_path or DB_FILE_PATH)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def markov_cache_key(lang_code, genre):
+    return cache_key("markov", MARKOV_ENGINE, lang_code, genre.strip().lower(), CORPUS_CLEANING_VERSION,
+                     MARKOV_MODEL_VERSION, corpus_signature(), CORPUS_CHAR_BUDGET, CORPUS_ROW_BUDGET,
+                     CORPUS_SAMPLE_SEED)
+
+
+def _serialize_markov_model(model):
+    if isinstance(model, CompiledChain):
+        return '.npz', model.to_bytes()
+    return '.json', model.to_json().encode('utf-8')
+
+
+def get_cached_markov_model(key):
+    """Model for `key` from memory, else from disk (promoted to memory), else None."""
+    with _markov_lock:
+        model = _markov_models.get(key)
+        if model is not None:
+            _markov_models.move_to_end(key)
+            return model
+
+    compiled = MARKOV_ENGINE == "compiled"
+    data = MARKOV_DISK_CACHE.get_bytes(key, '.npz' if compiled else '.json')
+    if data is None:
+        return None
+    try:
+        if compiled:
+            model = CompiledChain.from_bytes(data)
+        else:
+            model = markovify.NewlineText.from_json(data.decode('utf-8'))
+    except (ValueError, KeyError, OSError) as e:
+        print(f"[WARN] Discarding unreadable cached Markov model: {e}", file=sys.stderr)
+        return None
+    print("[INFO] Loaded Markov model from disk cache")
+    _remember_markov_model(key, model)
+    return model
+
+
+def _remember_markov_model(key, model):
+    with _markov_lock:
+        _markov_models[key] = model
+        _markov_models.move_to_end(key)
+        while len(_markov_models) > MARKOV_MEMORY_CACHE_SIZE:
+            _markov_models.popitem(last=False)
+
+
+def store_markov_model(key, model):
+    _remember_markov_model(key, model)
+    try:
+        MARKOV_DISK_CACHE.put_bytes(key, *_serialize_markov_model(model))
+    except OSError as e:
+        print(f"[WARN] Could not persist Markov model: {e}", file=sys.stderr)
+
+
 # ============================================================
 # == LYRICS GENERATION ==
 # ============================================================
 
+def build_base_model(language, genre, min_corpus_size=10000):
+    """
+    Sample and clean the (language, genre) corpus, then build its Markov model.
+    The sample (logged per tier) is reproducible with SONOSPHERE_CORPUS_SEED.
+    """
+    lang_code = LANGUAGE_CODE_MAP.get(language.strip().lower(), 'en')
+    rng = make_corpus_rng()
+    corpus_raw = None
+    corpus_clean = load_clean_corpus_from_db(language, genre, None, rng, min_corpus_size)
+    if corpus_clean is None:
+        corpus_raw = load_corpus_from_db(language, genre, None, rng, min_corpus_size)
+        if not corpus_raw:
+            print(f"[WARN] No corpus for {language}/{genre}")
+            return None
+        corpus_clean = prepare_corpus_for_markov(corpus_raw, lang_code)
+    corpus_clean += genre_bias_text(genre, lang_code)
+
+    if len(corpus_clean.strip()) < 1000:
+        print("[WARN] Cleaned corpus too short; using raw corpus", file=sys.stderr)
+        corpus_clean = corpus_raw or load_corpus_from_db(language, genre, None, rng, min_corpus_size) or corpus_clean
+
+    log_data_snippet(corpus_clean)
+    model = build_markov_model_from_text(corpus_clean, state_size=2)
+    if not model:
+        print("[ERROR] Could not build Markov model")
+        return None
+    return model
+
+
+def base_lyrics_model(language, genre, min_corpus_size=10000):
+    """The unbiased (language, genre) model: from the memory/disk cache, else built and cached."""
+    lang_code = LANGUAGE_CODE_MAP.get(language.strip().lower(), 'en')
+    key = markov_cache_key(lang_code, genre)
+    model = get_cached_markov_model(key)
+    if model is None:
+        model = build_base_model(language, genre, min_corpus_size)
+        if model is not None:
+            store_markov_model(key, model)
+    return model
+
+
+def build_bias_model(language, genre, bias, state_size=2):
+    """Small model over the corpus lines that mention the bias keywords (and the bias text itself)."""
+    lang_code = LANGUAGE_CODE_MAP.get(language.strip().lower(), 'en')
+    bias_keywords = expand_bias_with_synonyms(bias)
+    corpus = ""
+    if bias_keywords:
+        corpus = load_clean_corpus_from_db(language, genre, bias)
+        if corpus is None:
+            corpus_raw = load_corpus_from_db(language, genre, bias)
+            corpus = prepare_corpus_for_markov(corpus_raw, lang_code) if corpus_raw else ""
+        corpus = filter_corpus_by_bias(corpus, bias_keywords)
+    corpus += f"\n{bias.strip()}\n"
+    print(f"[INFO] Bias corpus: {corpus.count(chr(10)) - 1} lines for keywords {sorted(bias_keywords)[:10]}")
+    return build_markov_model_from_text(corpus, state_size=state_size, min_chars=0)
+
+
+def combine_with_bias(base, bias_model, share=BIAS_SHARE):
+    """
+    Bias the base model towards the bias model so that about `share` of the
+    generated transitions come from it. Compiled chains are mixed at sampling
+    time (the cached base is left untouched); markovify models are combined
+    with the bias weighted by relative corpus size.
+    """
+    share = min(max(share, 0.0), 0.99)
+    if isinstance(base, CompiledChain) and isinstance(bias_model, CompiledChain):
+        print(f"[INFO] Mixing base and bias chains (bias share {share:.2f})")
+        return MixtureChain(base, bias_model, share)
+    base_size = max(len(base.rejoined_text), 1)
+    bias_size = max(len(bias_model.rejoined_text), 1)
+    weight = share / (1 - share) * base_size / bias_size
+    print(f"[INFO] Combining base and bias models (bias weight {weight:.2f})")
+    return markovify.combine([base, bias_model], [1, weight])
+
+
+def build_lyrics_model(language, genre, bias=None, min_corpus_size=10000):
+    """
+    Model for a request: the cached base model, combined with a small model of
+    bias-matching lines when `bias` is given, so a biased request only builds
+    the small model.
+    """
+    base = base_lyrics_model(language, genre, min_corpus_size)
+    if base is None or not (bias and bias.strip()):
+        return base
+    try:
+        bias_model = build_bias_model(language, genre, bias, state_size=base.state_size)
+        if bias_model is None:
+            return base
+        return combine_with_bias(base, bias_model)
+    except Exception as e:
+        print(f"[WARN] Bias model failed, using the base model: {e}", file=sys.stderr)
+        return base
+
+
+def candidate_sentences(model):
+    """One round of candidate lines: a vectorized batch from a compiled chain, a single line from markovify."""
+    if isinstance(model, (CompiledChain, MixtureChain)):
+        return model.make_sentences(SENTENCE_BATCH, max_overlap_ratio=0.7)
+    sentence = model.make_sentence(tries=50, max_overlap_ratio=0.7)
+    if not sentence:
+        sentence = model.make_short_sentence(120)
+    return [sentence] if sentence else []
+
+
 def generate_lyrics_with_markov(
         language='English',
         genre='Pop',
@@ -327,71 +703,20 @@ def generate_lyrics_with_markov(
         min_corpus_size=10000
 ):
     lang_code = LANGUAGE_CODE_MAP.get(language.strip().lower(), 'en')
-    corpus_raw = load_corpus_from_db(language, genre, bias)
-    if not corpus_raw:
-        print(f"[WARN] No corpus for {language}/{genre}")
+    model = build_lyrics_model(language, genre, bias, min_corpus_size)
+    if model is None:
         return None
 
-    bias_keywords = expand_bias_with_synonyms(bias) if bias else None
-
-    def prepare_corpus_for_markov(corpus_text, lang_code):
-        lines = corpus_text.split('\n')
-        cleaned = []
-        for line in lines:
-            line = line.strip()
-            if not line or len(line.split()) < 3:
-                continue
-            line_cleaned = re.sub(r"[^\w\s\u0400-\u04FF\u0600-\u06FF\u4e00-\u9fff'!?.,-]", "", line, flags=re.UNICODE)
-            if lang_code in ['ru', 'ar', 'zh']:
-                letters = re.findall(r'\w', line_cleaned, flags=re.UNICODE)
-                latin_count = sum(1 for c in letters if 'a' <= c.lower() <= 'z')
-                if latin_count / max(len(letters), 1) > 0.4:
-                    continue
-            cleaned.append(line_cleaned)
-        return "\n".join(cleaned)
-
-    if lang_code == 'ru':
-        corpus_clean = prepare_corpus_for_markov_ru(corpus_raw)
-        state_size = 2
-    elif lang_code == 'zh':
-        corpus_clean = prepare_corpus_for_markov_zh(corpus_raw)
-        state_size = 2
-    else:
-        corpus_clean = prepare_corpus_for_markov(corpus_raw, lang_code)
-        state_size = 2
-
-    if bias_keywords:
-        corpus_clean = filter_corpus_by_bias(corpus_clean, bias_keywords)
-        corpus_clean = emphasize_bias_in_corpus(corpus_clean, bias, min_corpus_size)
-    else:
-        corpus_clean += genre_bias_text(genre, lang_code)
-        if bias:
-            corpus_clean += f"\n{bias.strip()}\n"
-
-    if len(corpus_clean.strip()) < 1000:
-        print("[WARN] Cleaned corpus too short; using raw corpus", file=sys.stderr)
-        corpus_clean = corpus_raw
-
-    log_data_snippet(corpus_clean)
-    model = build_markov_model_from_text(corpus_clean, state_size=state_size)
-    if not model:
-        model = build_markov_model_from_text(corpus_clean, state_size=2)
-        if not model:
-            print("[ERROR] Could not build Markov model")
-            return None
-
     target_lines = random.randint(min_lines, max_lines)
     lines = []
     tries = 0
     max_total = target_lines * attempts_per_line
     while len(lines) < target_lines and tries < max_total:
         tries += 1
-        sentence = model.make_sentence(tries=50, max_overlap_ratio=0.7)
-        if not sentence:
-            sentence = model.make_short_sentence(120)
-        if sentence:
-            cleaned = re.sub(r"[^\w\s\u0400-\u04FF\u0600-\u06FF\u4e00-\u9fff'!?.,-]", "", sentence,
-                             flags=re.UNICODE).strip()
+        for sentence in candidate_sentences(model):
+            if len(lines) >= target_lines:
+                break
+            cleaned = MARKOV_LINE_PATTERN.sub("", sentence).strip()
             words = cleaned.split()
             if len(words) > max_words_per_line:
                 words = words[:max_words_per_line]
@@ -401,7 +726,7 @@ def generate_lyrics_with_markov(
             for l in candidate:
                 if len(l.split()) >= 3 and l not in lines and len(lines) < target_lines:
                     # 💡 MODIFIED LOGIC: Check for profanity and discard line if found
-                    if is_profane_sentence(l):
+                    if is_profane_sentence(l, lang_code):
                         # Skip this line completely and let the while loop attempt a new sentence
                         continue
                     lines.append(l)  # Append the clean line
@@ -412,37 +737,61 @@ def generate_lyrics_with_markov(
 
 
 # ============================================================
-# == RUSSIAN & CHINESE CLEANING FUNCTIONS ==
+# == CORPUS LINE CLEANING ==
 # ============================================================
+# Shared by the request path (raw corpus fallback) and preprocess_corpus.py,
+# which stores the cleaned lines in the `clean_lyrics` table.
 
-def prepare_corpus_for_markov_ru(corpus_text):
-    lines = corpus_text.split('\n')
-    cleaned = []
-    seen = set()
-    for line in lines:
-        line = line.strip()
+MARKOV_LINE_PATTERN = re.compile(r"[^\w\s\u0400-\u04FF\u0600-\u06FF\u4e00-\u9fff'!?.,-]", flags=re.UNICODE)
+RU_EXCLUDED_KEYWORDS = ["дмитрий", "денис", "рашид", "и сл"]
+# Languages whose corpora are de-duplicated line by line
+DEDUPLICATED_LANGUAGES = ('ru', 'zh')
+
+
+def latin_ratio(line):
+    """Share of word characters in `line` that are Latin letters."""
+    letters = re.findall(r'\w', line, flags=re.UNICODE)
+    latin_count = sum(1 for c in letters if 'a' <= c.lower() <= 'z')
+    return latin_count / max(len(letters), 1)
+
+
+def clean_lyric_line(line, lang_code):
+    """Cleaned version of one corpus line for `lang_code`, or None if it is rejected."""
+    line = line.strip()
+    if lang_code == 'ru':
         if not line or len(line.split()) < 2:
-            continue
-        if any(keyword in line.lower() for keyword in ["дмитрий", "денис", "рашид", "и сл"]):
-            continue
-        if line not in seen:
-            cleaned.append(line)
-            seen.add(line)
-    return "\n".join(cleaned)
+            return None
+        if any(keyword in line.lower() for keyword in RU_EXCLUDED_KEYWORDS):
+            return None
+        return line
+
+    if lang_code == 'zh':
+        if not line or len(line.split()) < 2:
+            return None
+        if re.search(r'[A-Za-z]', line):
+            return None
+        return re.sub(r'\s+', ' ', line).strip()
+
+    if not line or len(line.split()) < 3:
+        return None
+    line_cleaned = MARKOV_LINE_PATTERN.sub("", line)
+    if lang_code == 'ar' and latin_ratio(line_cleaned) > 0.4:
+        return None
+    return line_cleaned
 
 
-def prepare_corpus_for_markov_zh(corpus_text):
-    lines = corpus_text.split('\n')
+def prepare_corpus_for_markov(corpus_text, lang_code):
+    """
+    Strip markup, clean every line of a raw corpus and drop profane lines, so
+    the fallback corpus matches `clean_lyrics` rows with IsProfane=0.
+    """
     cleaned = []
-    seen = set()
-    for line in lines:
-        raw = line.strip()
-        if not raw or len(raw.split()) < 2:
-            continue
-        if re.search(r'[A-Za-z]', raw):
-            continue
-        normalized = re.sub(r'\s+', ' ', raw).strip()
-        if normalized not in seen:
-            cleaned.append(normalized)
-            seen.add(normalized)
+    for line in clean_corpus_text(corpus_text, lang_code).split('\n'):
+        line = clean_lyric_line(line, lang_code)
+        if line is not None:
+            cleaned.append(line)
+    flags = get_matcher(lang_code).flag_lines(cleaned)
+    cleaned = [line for line, profane in zip(cleaned, flags) if not profane]
+    if lang_code in DEDUPLICATED_LANGUAGES:
+        cleaned = list(dict.fromkeys(cleaned))
     return "\n".join(cleaned)
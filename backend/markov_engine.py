@@ -0,0 +1,378 @@
+# ===== markov_engine.py =====
+# ----------------------------------------------------
+# Array-backed Markov chain for lyric generation.
+#
+# markovify keeps the chain as {state tuple: {word: count}} and samples one
+# word at a time in Python. CompiledChain interns words as integer ids and
+# stores the transitions CSR-style:
+#   states[s]                 state s as a row of token ids
+#   indptr[s]:indptr[s + 1]   its outgoing edges
+#   tokens[e], next_state[e]  edge target word and the state it leads to
+#   cumulative[e]             running total of edge weights (one global array)
+# so many lines are sampled at once with a single `searchsorted` per step.
+# Sentences are parsed and checked for overlap exactly like
+# markovify.NewlineText, so both engines produce the same kind of output.
+# Chains are never merged: MixtureChain biases a base chain towards a small
+# bias chain by picking which one to follow at each step, so a biased
+# request leaves the (cached) base untouched.
+# ----------------------------------------------------
+import io
+import re
+
+import numpy as np
+from markovify.text import Text as MarkovifyText
+from unidecode import unidecode
+
+BEGIN_ID = 0
+END_ID = 1
+RESERVED_TOKENS = ["___BEGIN__", "___END__"]
+# Lines still running after this many words are discarded
+MAX_SENTENCE_WORDS = 64
+# markovify's defaults for rejecting lines copied from the corpus
+DEFAULT_MAX_OVERLAP_RATIO = 0.7
+DEFAULT_MAX_OVERLAP_TOTAL = 15
+# Remembered overlap lookups per chain (each one scans the whole corpus text)
+OVERLAP_CACHE_SIZE = 100000
+
+_SENTENCE_SPLIT = re.compile(r"\s*\n\s*")
+
+
+def parse_sentences(text):
+    """Word lists of the lines markovify.NewlineText would train on."""
+    sentences = []
+    for line in _SENTENCE_SPLIT.split(text):
+        if not line.strip() or MarkovifyText.reject_pat.search(unidecode(line)):
+            continue
+        sentences.append(line.split())
+    return sentences
+
+
+class _SentenceSampler:
+    """Overlap test and markovify-style sentence helpers on top of `sample` / `_in_corpus`."""
+
+    def test_sentence_output(self, words, max_overlap_ratio=DEFAULT_MAX_OVERLAP_RATIO,
+                             max_overlap_total=DEFAULT_MAX_OVERLAP_TOTAL):
+        """Reject lines sharing a long word run with the corpus (same rule as markovify)."""
+        overlap_max = min(max_overlap_total, round(max_overlap_ratio * len(words)))
+        gram_count = max(len(words) - overlap_max, 1)
+        for i in range(gram_count):
+            if self._in_corpus(" ".join(words[i:i + overlap_max + 1])):
+                return False
+        return True
+
+    def make_sentences(self, n, rng=None, max_overlap_ratio=DEFAULT_MAX_OVERLAP_RATIO,
+                       max_overlap_total=DEFAULT_MAX_OVERLAP_TOTAL, test_output=True):
+        """Sample `n` candidate lines and return those that pass the overlap test."""
+        sentences = []
+        for words in self.sample(n, rng):
+            if words and (not test_output or self.test_sentence_output(words, max_overlap_ratio, max_overlap_total)):
+                sentences.append(" ".join(words))
+        return sentences
+
+    def make_sentence(self, tries=10, rng=None, **kwargs):
+        """markovify-compatible: one line, or None if `tries` candidates all fail."""
+        sentences = self.make_sentences(tries, rng, **kwargs)
+        return sentences[0] if sentences else None
+
+    def make_short_sentence(self, max_chars, min_chars=0, tries=10, rng=None, **kwargs):
+        for sentence in self.make_sentences(tries, rng, **kwargs):
+            if min_chars <= len(sentence) <= max_chars:
+                return sentence
+        return None
+
+
+class CompiledChain(_SentenceSampler):
+    """Immutable Markov chain over interned token ids (see module header)."""
+
+    def __init__(self, vocab, state_size, states, indptr, tokens, cumulative, next_state, rejoined_text):
+        self.vocab = vocab
+        self.state_size = state_size
+        self.states = states
+        self.indptr = indptr
+        self.tokens = tokens
+        self.cumulative = cumulative
+        self.next_state = next_state
+        self.rejoined_text = rejoined_text
+        self._words = np.array(vocab, dtype=object)
+        self._overlaps = {}
+        self._token_ids = None
+        self._state_keys = None
+        self.begin_state = self._find_state([BEGIN_ID] * state_size)
+
+    # ---------------------------
+    # Building
+    # ---------------------------
+    @classmethod
+    def from_text(cls, text, state_size=2):
+        """Build from newline-separated lines; returns None if no line is usable."""
+        sentences = parse_sentences(text)
+        if not sentences:
+            return None
+
+        vocab = list(RESERVED_TOKENS)
+        ids = {token: i for i, token in enumerate(vocab)}
+        sequences = []
+        for words in sentences:
+            seq = [BEGIN_ID] * state_size
+            for word in words:
+                token_id = ids.get(word)
+                if token_id is None:
+                    token_id = ids[word] = len(vocab)
+                    vocab.append(word)
+                seq.append(token_id)
+            seq.append(END_ID)
+            sequences.append(seq)
+
+        # Every window of state_size + 1 ids inside a padded sentence is one transition
+        lengths = np.array([len(seq) for seq in sequences])
+        flat = np.fromiter((t for seq in sequences for t in seq), dtype=np.int32, count=int(lengths.sum()))
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        n_windows = lengths - state_size
+        starts = np.repeat(offsets, n_windows) + _ranges(n_windows)
+        windows = np.lib.stride_tricks.sliding_window_view(flat, state_size + 1)[starts]
+
+        # Joined like markovify, so word runs spanning two lines count as overlaps too
+        rejoined_text = " ".join(" ".join(words) for words in sentences)
+        return cls._compile(vocab, state_size, windows, np.ones(len(windows)), rejoined_text)
+
+    @classmethod
+    def _compile(cls, vocab, state_size, edges, weights, rejoined_text):
+        """Build the CSR arrays from (state..., token) rows, summing duplicate rows."""
+        unique_edges, inverse = np.unique(edges, axis=0, return_inverse=True)
+        weights = np.bincount(inverse.ravel(), weights=weights, minlength=len(unique_edges))
+
+        # np.unique sorts rows, so edges are already grouped by state
+        edge_states = unique_edges[:, :state_size]
+        tokens = np.ascontiguousarray(unique_edges[:, state_size], dtype=np.int32)
+        changed = np.any(edge_states[1:] != edge_states[:-1], axis=1)
+        starts = np.flatnonzero(np.concatenate([[True], changed]))
+        states = np.ascontiguousarray(edge_states[starts], dtype=np.int32)
+        indptr = np.append(starts, len(tokens)).astype(np.int64)
+
+        # Target state of each edge: drop the first token, append the edge token
+        targets = np.column_stack([edge_states[:, 1:], tokens])
+        _, ranks = np.unique(np.vstack([states, targets]), axis=0, return_inverse=True)
+        ranks = ranks.ravel()
+        rank_to_state = np.full(ranks.max() + 1, -1, dtype=np.int32)
+        rank_to_state[ranks[:len(states)]] = np.arange(len(states), dtype=np.int32)
+        next_state = rank_to_state[ranks[len(states):]]
+        next_state[tokens == END_ID] = -1
+
+        return cls(vocab, state_size, states, indptr, tokens, np.cumsum(weights), next_state, rejoined_text)
+
+    # ---------------------------
+    # Sampling
+    # ---------------------------
+    def _find_state(self, row):
+        """Index of the state given as a row of token ids, or -1."""
+        lo, hi = 0, len(self.states)
+        row = list(row)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self.states[mid].tolist()
+            if current == row:
+                return mid
+            if current < row:
+                lo = mid + 1
+            else:
+                hi = mid
+        return -1
+
+    @property
+    def token_ids(self):
+        """{token: id} over the vocabulary, built on first use."""
+        if self._token_ids is None:
+            self._token_ids = {token: i for i, token in enumerate(self.vocab)}
+        return self._token_ids
+
+    def find_states(self, rows):
+        """Indices of many states (rows of token ids, ids past the vocabulary allowed) at once, -1 where absent."""
+        rows = np.asarray(rows, dtype=np.int64).reshape(-1, self.state_size)
+        radix = len(self.vocab)
+        if radix ** self.state_size >= 2 ** 63:
+            return np.array([self._find_state(row) for row in rows], dtype=np.int64)
+        # States are sorted rows of ids below `radix`, so their base-`radix` numbers are sorted too
+        powers = radix ** np.arange(self.state_size - 1, -1, -1, dtype=np.int64)
+        if self._state_keys is None:
+            self._state_keys = self.states.astype(np.int64) @ powers
+        in_vocab = np.all(rows < radix, axis=1)
+        keys = np.where(in_vocab, np.minimum(rows, radix - 1) @ powers, -1)
+        found = np.minimum(np.searchsorted(self._state_keys, keys), len(self.states) - 1)
+        return np.where(in_vocab & (self._state_keys[found] == keys), found, -1)
+
+    def _draw(self, s, rng):
+        """One weighted random edge out of each state in `s`."""
+        lo, hi = self.indptr[s], self.indptr[s + 1]
+        before = np.where(lo > 0, self.cumulative[np.maximum(lo - 1, 0)], 0.0)
+        total = self.cumulative[hi - 1] - before
+        edges = np.searchsorted(self.cumulative, before + rng.random(len(s)) * total, side='right')
+        return np.clip(edges, lo, hi - 1)
+
+    def sample(self, n, rng=None, max_words=MAX_SENTENCE_WORDS):
+        """Walk `n` lines in parallel; returns the word lists of lines that ended within `max_words`."""
+        rng = rng if rng is not None else np.random.default_rng()
+        state = np.full(n, self.begin_state, dtype=np.int64)
+        out = np.zeros((n, max_words), dtype=np.int32)
+        lengths = np.zeros(n, dtype=np.int64)
+        active = np.arange(n)
+        finished = []
+
+        for step in range(max_words + 1):
+            if not active.size:
+                break
+            edges = self._draw(state[active], rng)
+            tokens = self.tokens[edges]
+
+            ended = tokens == END_ID
+            finished.extend(active[ended].tolist())
+            keep = ~ended
+            if step == max_words:
+                break
+            active, edges, tokens = active[keep], edges[keep], tokens[keep]
+            out[active, step] = tokens
+            lengths[active] += 1
+            state[active] = self.next_state[edges]
+
+        return [self._words[out[i, :lengths[i]]].tolist() for i in finished]
+
+    def _in_corpus(self, gram):
+        """True if `gram` occurs in the corpus text (memoized: each lookup scans the whole text)."""
+        found = self._overlaps.get(gram)
+        if found is None:
+            found = gram in self.rejoined_text
+            if len(self._overlaps) >= OVERLAP_CACHE_SIZE:
+                self._overlaps.clear()
+            self._overlaps[gram] = found
+        return found
+
+    # ---------------------------
+    # Persistence & Size
+    # ---------------------------
+    @property
+    def nbytes(self):
+        """Approximate memory footprint of the chain, including vocabulary and corpus text."""
+        arrays = (self.states, self.indptr, self.tokens, self.cumulative, self.next_state)
+        text_bytes = len(self.rejoined_text.encode('utf-8')) + sum(len(t.encode('utf-8')) for t in self.vocab)
+        return sum(a.nbytes for a in arrays) + text_bytes
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            state_size=np.array(self.state_size),
+            states=self.states,
+            indptr=self.indptr,
+            tokens=self.tokens,
+            cumulative=self.cumulative,
+            next_state=self.next_state,
+            vocab=np.frombuffer("\n".join(self.vocab).encode('utf-8'), dtype=np.uint8),
+            rejoined_text=np.frombuffer(self.rejoined_text.encode('utf-8'), dtype=np.uint8),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            return cls(
+                vocab=arrays["vocab"].tobytes().decode('utf-8').split("\n"),
+                state_size=int(arrays["state_size"]),
+                states=arrays["states"],
+                indptr=arrays["indptr"],
+                tokens=arrays["tokens"],
+                cumulative=arrays["cumulative"],
+                next_state=arrays["next_state"],
+                rejoined_text=arrays["rejoined_text"].tobytes().decode('utf-8'),
+            )
+
+
+class MixtureChain(_SentenceSampler):
+    """
+    A base chain biased towards a second chain without merging them: each
+    step follows the bias chain with probability `share` when it knows the
+    current state, the base chain otherwise. Building one only interns the
+    bias chain's vocabulary and looks its states up in the base, so the cost
+    scales with the bias chain, not the (cached) base.
+    """
+
+    def __init__(self, base, bias, share):
+        if base.state_size != bias.state_size:
+            raise ValueError("Cannot mix chains with different state sizes")
+        self.base = base
+        self.bias = bias
+        self.share = float(share)
+        self.state_size = base.state_size
+
+        # Bias ids → ids in the base vocabulary, extended by words the base lacks
+        ids = base.token_ids
+        extra = {}
+        remap = np.empty(len(bias.vocab), dtype=np.int32)
+        for i, token in enumerate(bias.vocab):
+            token_id = ids.get(token)
+            if token_id is None:
+                token_id = extra.setdefault(token, len(base.vocab) + len(extra))
+            remap[i] = token_id
+        self._bias_tokens = remap[bias.tokens]
+        self._words = np.concatenate([base._words, np.array(list(extra), dtype=object)])
+
+        # Where each bias state sits in the base chain, and the reverse for the states both share
+        self._bias_to_base = base.find_states(remap[bias.states])
+        self._base_to_bias = np.full(len(base.states), -1, dtype=np.int64)
+        shared = np.flatnonzero(self._bias_to_base >= 0)
+        self._base_to_bias[self._bias_to_base[shared]] = shared
+
+    def sample(self, n, rng=None, max_words=MAX_SENTENCE_WORDS):
+        """Walk `n` lines in parallel like CompiledChain.sample, choosing the chain at every step."""
+        rng = rng if rng is not None else np.random.default_rng()
+        # Each line's current state in both chains (-1 where a chain lacks it)
+        base_state = np.full(n, self.base.begin_state, dtype=np.int64)
+        bias_state = np.full(n, self.bias.begin_state, dtype=np.int64)
+        out = np.zeros((n, max_words), dtype=np.int32)
+        lengths = np.zeros(n, dtype=np.int64)
+        active = np.arange(n)
+        finished = []
+
+        for step in range(max_words + 1):
+            if not active.size:
+                break
+            in_base, in_bias = base_state[active], bias_state[active]
+            use_bias = (in_bias >= 0) & ((in_base < 0) | (rng.random(active.size) < self.share))
+            tokens = np.empty(active.size, dtype=np.int32)
+            next_base = np.empty(active.size, dtype=np.int64)
+            next_bias = np.empty(active.size, dtype=np.int64)
+
+            if use_bias.any():
+                edges = self.bias._draw(in_bias[use_bias], rng)
+                tokens[use_bias] = self._bias_tokens[edges]
+                following = self.bias.next_state[edges]
+                next_bias[use_bias] = following
+                next_base[use_bias] = np.where(following >= 0, self._bias_to_base[following], -1)
+            use_base = ~use_bias
+            if use_base.any():
+                edges = self.base._draw(in_base[use_base], rng)
+                tokens[use_base] = self.base.tokens[edges]
+                following = self.base.next_state[edges]
+                next_base[use_base] = following
+                next_bias[use_base] = np.where(following >= 0, self._base_to_bias[following], -1)
+
+            ended = tokens == END_ID
+            finished.extend(active[ended].tolist())
+            keep = ~ended
+            if step == max_words:
+                break
+            active, tokens = active[keep], tokens[keep]
+            out[active, step] = tokens
+            lengths[active] += 1
+            base_state[active] = next_base[keep]
+            bias_state[active] = next_bias[keep]
+
+        return [self._words[out[i, :lengths[i]]].tolist() for i in finished]
+
+    def _in_corpus(self, gram):
+        return self.base._in_corpus(gram) or self.bias._in_corpus(gram)
+
+
+def _ranges(counts):
+    """Concatenated aranges: [2, 3] → [0, 1, 0, 1, 2]."""
+    counts = np.asarray(counts)
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1]) - np.repeat(ends - counts, counts)
@@ -0,0 +1,129 @@
+# ===== media.py =====
+# ----------------------------------------------------
+# Canonical masters and cached renditions behind the /media endpoint.
+#
+# Every deliverable is kept once as a WAV master in the outputs folder
+# (`<artifact>.wav`, written by save_output_buffer or the noise reducer).
+# WAV requests are served from the master itself (ETag = its digest).
+# Other formats are renditions: encoded from the master on first request,
+# stored in a size-bounded DiskCache keyed by the master's content and the
+# format, and served from there with Range/ETag support. Renditions the
+# pipelines already encoded are registered (hard-linked) so they are not
+# encoded twice.
+# ----------------------------------------------------
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from encoder import encode_file, normalize_format
+from result_cache import DiskCache, cache_key, file_digest
+from shared import OUTPUT_DIR
+
+# ====================================================
+# Media Configuration
+# ====================================================
+MASTER_FORMAT = "wav"
+MASTER_EXTENSION = f".{MASTER_FORMAT}"
+RENDITION_CACHE_MB = int(os.getenv('SONOSPHERE_RENDITION_CACHE_MB', 2048))
+RENDITION_CACHE = DiskCache("renditions", RENDITION_CACHE_MB * 1024 * 1024)
+
+MIMETYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "flac": "audio/flac",
+    "opus": "audio/ogg",
+    "ogg": "audio/ogg",
+}
+
+_ARTIFACT_ID = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+
+class MediaNotFound(Exception):
+    """The artifact id is malformed or has no master on disk."""
+
+
+def artifact_id(master_path):
+    """Artifact id of a master file: its basename without the extension."""
+    return os.path.splitext(os.path.basename(master_path))[0]
+
+
+def media_url(master_path, desired_format=None):
+    url = f"/media/{artifact_id(master_path)}"
+    return f"{url}?format={desired_format}" if desired_format else url
+
+
+class MediaStore:
+    """Masters in `output_dir`, renditions in RENDITION_CACHE."""
+
+    def __init__(self, output_dir, cache=RENDITION_CACHE):
+        self.output_dir = output_dir
+        self.cache = cache
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def master_path(self, artifact):
+        if not _ARTIFACT_ID.match(artifact or ""):
+            raise MediaNotFound(f"Invalid media id '{artifact}'")
+        path = os.path.join(self.output_dir, artifact + MASTER_EXTENSION)
+        if not os.path.isfile(path):
+            raise MediaNotFound(f"No media named '{artifact}'")
+        return path
+
+    def rendition_key(self, master_path, desired_format):
+        return cache_key("rendition", file_digest(master_path), desired_format)
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def rendition(self, artifact, desired_format):
+        """
+        (path, etag) of `artifact` in `desired_format`: the master itself for
+        WAV, otherwise a rendition encoded from the master on a cache miss.
+        Concurrent first requests encode only once.
+        Raises MediaNotFound, ValueError (format) or EncodingError.
+        """
+        desired_format = normalize_format(desired_format)
+        master = self.master_path(artifact)
+        if desired_format == MASTER_FORMAT:
+            return master, file_digest(master)
+        key = self.rendition_key(master, desired_format)
+        suffix = f".{desired_format}"
+
+        path = self.cache.get(key, suffix)
+        if path is not None:
+            return path, key
+        with self._lock_for(key):
+            path = self.cache.get(key, suffix)
+            if path is None:
+                path = self._encode(master, key, desired_format)
+        with self._locks_guard:
+            self._locks.pop(key, None)
+        return path, key
+
+    def _encode(self, master, key, desired_format):
+        fd, tmp_path = tempfile.mkstemp(suffix=f".{desired_format}")
+        os.close(fd)
+        try:
+            encode_file(master, [(tmp_path, desired_format)])
+            print(f"[INFO] Cached {desired_format} rendition of {artifact_id(master)}")
+            return self.cache.put_file(key, f".{desired_format}", tmp_path)
+        finally:
+            os.remove(tmp_path)
+
+    def register(self, master_path, desired_format, encoded_path):
+        """Adopt an already-encoded file as the rendition of `master_path` (WAV needs none)."""
+        desired_format = normalize_format(desired_format)
+        if desired_format == MASTER_FORMAT:
+            return master_path
+        key = self.rendition_key(master_path, desired_format)
+        try:
+            return self.cache.link_file(key, f".{desired_format}", encoded_path)
+        except (OSError, shutil.Error) as e:
+            print(f"[WARN] Could not register rendition {encoded_path}: {e}")
+            return None
+
+
+MEDIA_STORE = MediaStore(OUTPUT_DIR)
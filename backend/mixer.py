@@ -0,0 +1,219 @@
+# ===== mixer.py =====
+# ----------------------------------------------------
+# In-process loudness normalization and stem mixing on AudioBuffers.
+#
+#   • loudness: ITU-R BS.1770 / EBU R128 integrated loudness (K-weighting,
+#     400 ms blocks with 75% overlap, -70 LUFS absolute and -10 LU relative
+#     gates), computed with cumulative sums instead of a per-block loop
+#   • mix: stems brought to a common rate and channel layout, each
+#     loudness-matched to STEM_REFERENCE_LUFS and then offset by its own gain,
+#     the music ducked under the vocal, summed, normalized to the master
+#     target and run through a look-ahead peak limiter
+#
+# Everything works on arrays; nothing is spawned or written to disk.
+# ----------------------------------------------------
+import os
+
+import numpy as np
+from scipy.ndimage import maximum_filter1d, minimum_filter1d, uniform_filter1d
+from scipy.signal import sosfilt
+
+from audio_buffer import AudioBuffer
+
+# ====================================================
+# Loudness Configuration
+# ====================================================
+BLOCK_SECONDS = 0.4
+BLOCK_STEP_SECONDS = 0.1
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+# Stems are matched to the EBU R128 reference before their gains are applied
+STEM_REFERENCE_LUFS = -23.0
+# ffmpeg loudnorm's default target, used for the standalone vocal
+VOCAL_TARGET_LUFS = float(os.getenv('SONOSPHERE_VOCAL_TARGET_LUFS', -24.0))
+# Never boost near-silent material by more than this
+MAX_NORMALIZE_GAIN_DB = 30.0
+
+DEFAULT_MIX_PARAMS = {
+    'vocal_gain_db': 0.0,
+    # ≈ the old fixed 0.6 music volume
+    'music_gain_db': -4.4,
+    # Music attenuation while the vocal is active (0 disables ducking)
+    'duck_db': float(os.getenv('SONOSPHERE_MIX_DUCK_DB', 3.0)),
+    'duck_attack_ms': 80.0,
+    'duck_release_ms': 400.0,
+    # Vocal frames within this range of the vocal's loudest frame count as active
+    'duck_threshold_db': 30.0,
+    # Master loudness (None leaves the summed level alone)
+    'target_lufs': float(os.getenv('SONOSPHERE_MIX_TARGET_LUFS', -14.0)),
+    # Sample-peak ceiling of the limiter, dBFS
+    'ceiling_db': -1.0,
+    'limiter_lookahead_ms': 5.0,
+}
+
+
+def db_to_gain(db):
+    return 10.0 ** (db / 20.0)
+
+
+# ====================================================
+# Loudness Measurement (BS.1770)
+# ====================================================
+def k_weighting_filters(sample_rate):
+    """
+    The two BS.1770 pre-filter biquads (high shelf, then RLB high pass) as
+    second-order sections, re-derived for any sample rate; at 48 kHz they
+    equal the published coefficients.
+    """
+    # High shelf: about +4 dB above ~1.7 kHz (head acoustics)
+    gain_db, q, fc = 3.999843853973347, 0.7071752369554196, 1681.974450955533
+    k = np.tan(np.pi * fc / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]
+    shelf_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    # High pass at ~38 Hz
+    q, fc = 0.5003270373238773, 38.13547087602444
+    k = np.tan(np.pi * fc / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass_b = [1.0, -2.0, 1.0]
+    highpass_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.array([shelf_b + shelf_a, highpass_b + highpass_a])
+
+
+def integrated_loudness(audio):
+    """Gated integrated loudness of an AudioBuffer in LUFS (-inf for silence)."""
+    if audio.is_empty:
+        return float("-inf")
+    weighted = sosfilt(k_weighting_filters(audio.sample_rate).astype(np.float32), audio.samples, axis=1)
+
+    # Mean square of every gating block via one cumulative sum (channel weights are 1.0 for L/R/C)
+    block = int(round(BLOCK_SECONDS * audio.sample_rate))
+    step = int(round(BLOCK_STEP_SECONDS * audio.sample_rate))
+    energy = np.concatenate([[0.0], np.cumsum((weighted ** 2).sum(axis=0), dtype=np.float64)])
+    if audio.frames < block:
+        block_energy = np.array([energy[-1] / audio.frames])
+    else:
+        starts = np.arange(0, audio.frames - block + 1, step)
+        block_energy = (energy[starts + block] - energy[starts]) / block
+
+    with np.errstate(divide='ignore'):
+        block_lufs = -0.691 + 10 * np.log10(block_energy)
+    gated = block_energy[block_lufs > ABSOLUTE_GATE_LUFS]
+    if not gated.size:
+        return float("-inf")
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = block_energy[(block_lufs > ABSOLUTE_GATE_LUFS) & (block_lufs > relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def normalize_loudness(audio, target_lufs, report=None):
+    """
+    Scale a buffer to `target_lufs` integrated loudness (gain capped at
+    MAX_NORMALIZE_GAIN_DB; silence is returned unchanged).
+    """
+    measured = integrated_loudness(audio)
+    if not np.isfinite(measured):
+        gain_db = 0.0
+    else:
+        gain_db = min(target_lufs - measured, MAX_NORMALIZE_GAIN_DB)
+    if report is not None:
+        report["measured_lufs"] = round(measured, 2) if np.isfinite(measured) else None
+        report["gain_db"] = round(gain_db, 2)
+    if gain_db == 0.0:
+        return audio
+    return audio.copy_with(audio.samples * db_to_gain(gain_db))
+
+
+# ====================================================
+# Dynamics
+# ====================================================
+def duck_envelope(sidechain, length, sample_rate, depth_db, attack_ms, release_ms, threshold_db):
+    """
+    Per-sample gain that lowers another stem by `depth_db` while `sidechain`
+    (1-D) is active: 10 ms frame RMS → activity gate → held for `release_ms`
+    → smoothed over `attack_ms` (centred, so the dip starts slightly early).
+    """
+    hop = max(1, int(sample_rate * 0.01))
+    n_frames = int(np.ceil(length / hop))
+    padded = np.zeros(n_frames * hop, dtype=np.float64)
+    usable = min(len(sidechain), len(padded))
+    padded[:usable] = sidechain[:usable]
+    rms = np.sqrt((padded.reshape(n_frames, hop) ** 2).mean(axis=1))
+    if not np.any(rms):
+        return np.ones(length, dtype=np.float32)
+
+    rms_db = 20 * np.log10(rms + 1e-10)
+    active = (rms_db > rms_db.max() - threshold_db).astype(np.float64)
+    release = max(1, int(round(release_ms / 10)))
+    # Hold only forwards in time: the window ends at the current frame
+    held = maximum_filter1d(active, size=release, mode='constant', origin=(release - 1) // 2)
+    smoothed = uniform_filter1d(held, size=max(1, int(round(attack_ms / 10))))
+
+    frame_gain = db_to_gain(-depth_db * smoothed)
+    centres = np.arange(n_frames) * hop + hop / 2
+    return np.interp(np.arange(length), centres, frame_gain).astype(np.float32)
+
+
+def limit_peaks(samples, sample_rate, ceiling_db=-1.0, lookahead_ms=5.0):
+    """
+    Look-ahead peak limiter on a (channels, frames) array: the gain each
+    sample needs is spread over a window either side of every peak
+    (running minimum, then moving average), so no sample exceeds the ceiling
+    and the gain changes without clicks.
+    """
+    ceiling = db_to_gain(ceiling_db)
+    peak = np.abs(samples).max(axis=0)
+    if not peak.size or peak.max() <= ceiling:
+        return samples
+    needed = np.minimum(1.0, ceiling / np.maximum(peak, 1e-12))
+    window = max(1, int(sample_rate * lookahead_ms / 1000))
+    gain = minimum_filter1d(needed, size=2 * window - 1)
+    gain = uniform_filter1d(gain, size=window)
+    # Averaging can leave a rounding hair above the ceiling
+    return np.clip(samples * gain.astype(np.float32), -ceiling, ceiling)
+
+
+# ====================================================
+# Mixing
+# ====================================================
+def mix_stems(vocal, music, mix_params=None, report=None):
+    """
+    Mix a vocal and an instrumental AudioBuffer. `mix_params` overrides
+    DEFAULT_MIX_PARAMS; `report` (a dict) receives the measured loudness and
+    applied gains. The result runs as long as the longer stem.
+    """
+    params = dict(DEFAULT_MIX_PARAMS, **(mix_params or {}))
+    report = report if report is not None else {}
+    sample_rate = max(vocal.sample_rate, music.sample_rate)
+    channels = max(vocal.channels, music.channels)
+
+    stems = {}
+    for name, stem in (("vocal", vocal), ("music", music)):
+        stem = stem.resample(sample_rate).with_channels(channels)
+        stem_report = report.setdefault(name, {})
+        stem = normalize_loudness(stem, STEM_REFERENCE_LUFS, stem_report)
+        stem_report["stem_gain_db"] = params[f"{name}_gain_db"]
+        stems[name] = stem.samples * db_to_gain(params[f"{name}_gain_db"])
+
+    length = max(stem.shape[1] for stem in stems.values())
+    mixed = np.zeros((channels, length), dtype=np.float32)
+    mixed[:, :stems["vocal"].shape[1]] += stems["vocal"]
+    music_samples = stems["music"]
+    if params['duck_db'] > 0:
+        music_samples = music_samples * duck_envelope(
+            stems["vocal"].mean(axis=0), music_samples.shape[1], sample_rate, params['duck_db'],
+            params['duck_attack_ms'], params['duck_release_ms'], params['duck_threshold_db'])
+    mixed[:, :music_samples.shape[1]] += music_samples
+
+    master = AudioBuffer(mixed, sample_rate)
+    if params['target_lufs'] is not None:
+        master = normalize_loudness(master, params['target_lufs'], report.setdefault("master", {}))
+    peak_before = float(np.abs(master.samples).max()) if length else 0.0
+    limited = limit_peaks(master.samples, sample_rate, params['ceiling_db'], params['limiter_lookahead_ms'])
+    peak_after = float(np.abs(limited).max()) if length else 0.0
+    report["limiter_reduction_db"] = round(float(20 * np.log10(peak_before / peak_after)), 2) if peak_after > 0 else 0.0
+    print(f"[INFO] Mixed stems at {sample_rate} Hz: {report}")
+    return master.copy_with(limited)
@@ -0,0 +1,242 @@
+# ===== model_registry.py =====
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# ====================================================
+# Registry Configuration
+# ====================================================
+def _env_int(name, default):
+    """Read an integer setting from the environment, falling back to default."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# Maximum number of distinct models kept warm (0 = unlimited)
+MAX_LOADED_MODELS = _env_int('SONOSPHERE_MAX_MODELS', 0)
+# Approximate memory budget for loaded models in MB (0 = unlimited)
+MAX_MODEL_MEMORY_MB = _env_int('SONOSPHERE_MODEL_MEMORY_MB', 0)
+# Default number of replicas per model for concurrent requests
+DEFAULT_REPLICAS = max(1, _env_int('SONOSPHERE_MODEL_REPLICAS', 1))
+
+
+def estimate_size_mb(model):
+    """
+    Best-effort memory estimate of a loaded model in MB.
+    Walks torch parameters/buffers when available; returns 0 otherwise.
+    """
+    objects = model if isinstance(model, (tuple, list)) else [model]
+    total = 0
+    for obj in objects:
+        # Coqui TTS wraps the torch module inside a synthesizer
+        synthesizer = getattr(obj, 'synthesizer', None)
+        if synthesizer is not None and getattr(synthesizer, 'tts_model', None) is not None:
+            obj = synthesizer.tts_model
+        if not hasattr(obj, 'parameters'):
+            continue
+        try:
+            for tensor in list(obj.parameters()) + list(obj.buffers()):
+                total += tensor.numel() * tensor.element_size()
+        except Exception:
+            continue
+    return total / (1024 * 1024)
+
+
+# ====================================================
+# Model Registry
+# ====================================================
+class _ModelEntry:
+    """Bookkeeping for a single registered model and its warm replicas."""
+
+    def __init__(self, name, loader, size_mb, replicas):
+        self.name = name
+        self.loader = loader
+        self.declared_size_mb = size_mb
+        self.max_replicas = max(1, replicas)
+        self.idle = []
+        self.in_use = 0
+        self.loading = 0
+        self.size_mb = 0.0
+        self.last_used = 0.0
+        self.stats = {
+            "loads": 0,
+            "load_time_s": 0.0,
+            "last_load_time_s": 0.0,
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "evictions": 0,
+        }
+
+    @property
+    def loaded(self):
+        return len(self.idle) + self.in_use
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of heavy inference models.
+
+    Models are registered with a zero-argument loader and are only built on first
+    use. Each model keeps up to `replicas` warm instances; a caller borrows one via
+    `acquire()` and returns it on exit, so an instance is never used by two threads
+    at once. When the model count or memory budget is exceeded, the least recently
+    used idle models are evicted.
+    """
+
+    def __init__(self, max_models=MAX_LOADED_MODELS, max_memory_mb=MAX_MODEL_MEMORY_MB):
+        self.max_models = max_models
+        self.max_memory_mb = max_memory_mb
+        self._entries = OrderedDict()
+        self._cond = threading.Condition()
+
+    def register(self, name, loader, size_mb=0, replicas=None):
+        """Register a model loader under `name` (does not load it)."""
+        with self._cond:
+            replicas = DEFAULT_REPLICAS if replicas is None else replicas
+            self._entries[name] = _ModelEntry(name, loader, size_mb, replicas)
+
+    def is_registered(self, name):
+        return name in self._entries
+
+    def is_loaded(self, name):
+        entry = self._entries.get(name)
+        return bool(entry and entry.loaded)
+
+    @contextmanager
+    def acquire(self, name):
+        """
+        Borrow a warm instance of `name`, loading it on first use.
+        Blocks while all replicas are busy.
+        """
+        instance = self._checkout(name)
+        try:
+            yield instance
+        finally:
+            self._checkin(name, instance)
+
+    def preload(self, name):
+        """Load one instance of `name` ahead of the first request."""
+        with self.acquire(name):
+            pass
+
+    def _checkout(self, name):
+        with self._cond:
+            entry = self._entries.get(name)
+            if entry is None:
+                raise KeyError(f"Model '{name}' is not registered")
+
+            while True:
+                if entry.idle:
+                    entry.stats["hits"] += 1
+                    entry.in_use += 1
+                    entry.last_used = time.time()
+                    self._entries.move_to_end(name)
+                    return entry.idle.pop()
+                if entry.loaded + entry.loading < entry.max_replicas:
+                    entry.stats["misses"] += 1
+                    entry.loading += 1
+                    break
+                entry.stats["waits"] += 1
+                self._cond.wait()
+
+        # Load outside the registry lock so other models stay available
+        start = time.time()
+        try:
+            print(f"[INFO] Loading model '{name}' (replica {entry.loaded + 1}/{entry.max_replicas})")
+            instance = entry.loader()
+        except Exception:
+            with self._cond:
+                entry.loading -= 1
+                self._cond.notify_all()
+            raise
+        elapsed = time.time() - start
+        print(f"[INFO] Model '{name}' loaded in {elapsed:.2f}s")
+
+        with self._cond:
+            entry.loading -= 1
+            entry.in_use += 1
+            entry.last_used = time.time()
+            entry.stats["loads"] += 1
+            entry.stats["load_time_s"] += elapsed
+            entry.stats["last_load_time_s"] = elapsed
+            if not entry.size_mb:
+                entry.size_mb = estimate_size_mb(instance) or float(entry.declared_size_mb)
+            self._entries.move_to_end(name)
+            self._enforce_limits(keep=name)
+        return instance
+
+    def _checkin(self, name, instance):
+        with self._cond:
+            entry = self._entries[name]
+            entry.in_use -= 1
+            entry.idle.append(instance)
+            entry.last_used = time.time()
+            self._enforce_limits(keep=name)
+            self._cond.notify_all()
+
+    def _memory_used_mb(self):
+        return sum(e.size_mb * e.loaded for e in self._entries.values())
+
+    def _over_limits(self):
+        loaded_models = sum(1 for e in self._entries.values() if e.loaded)
+        if self.max_models and loaded_models > self.max_models:
+            return True
+        if self.max_memory_mb and self._memory_used_mb() > self.max_memory_mb:
+            return True
+        return False
+
+    def _enforce_limits(self, keep=None):
+        """Evict idle replicas, least recently used first, until within limits."""
+        for entry in list(self._entries.values()):
+            if not self._over_limits():
+                return
+            if entry.name == keep:
+                continue
+            while entry.idle and self._over_limits():
+                self._drop_idle(entry)
+
+    def _drop_idle(self, entry):
+        entry.idle.pop()
+        entry.stats["evictions"] += 1
+        print(f"[INFO] Evicted model '{entry.name}' from registry")
+
+    def evict(self, name):
+        """Drop all idle instances of `name`; busy instances are kept."""
+        with self._cond:
+            entry = self._entries.get(name)
+            while entry and entry.idle:
+                self._drop_idle(entry)
+
+    def clear(self):
+        """Drop every idle instance of every model."""
+        for name in list(self._entries):
+            self.evict(name)
+
+    def stats(self):
+        """Return load/hit statistics for every registered model."""
+        with self._cond:
+            models = {}
+            for name, entry in self._entries.items():
+                models[name] = dict(
+                    entry.stats,
+                    loaded=entry.loaded,
+                    in_use=entry.in_use,
+                    max_replicas=entry.max_replicas,
+                    size_mb=round(entry.size_mb, 1),
+                    last_used=entry.last_used,
+                )
+            return {
+                "max_models": self.max_models,
+                "max_memory_mb": self.max_memory_mb,
+                "memory_used_mb": round(self._memory_used_mb(), 1),
+                "models": models,
+            }
+
+
+MODEL_REGISTRY = ModelRegistry()
@@ -0,0 +1,330 @@
+# ===== pipelines.py =====
+# ----------------------------------------------------
+# Request pipelines shared by the synchronous routes and the job API.
+# Each pipeline takes plain values (uploads already saved to disk), reports
+# stage changes through an optional `progress(stage, message=None)` callback
+# and returns the `generation_result` payload.
+# ----------------------------------------------------
+import os
+import zipfile
+
+from encoder import EncodingError, encode_many, encode_stems, normalize_format, output_path_for
+from lyrics_generator import generate_lyrics_with_markov
+from media import MEDIA_STORE, media_url
+from shared import (
+    reduce_noise_report,
+    reduce_noise_batch,
+    reduce_noise_buffer,
+    get_lang_abbr,
+    analyze_vocal_and_enrich_prompt,
+    generate_music_buffer,
+    synthesize_vocals,
+    tts_output_needs_denoise,
+    refine_and_mix_buffers,
+    convert_audio_format,
+    safe_join,
+    OUTPUT_DIR,
+    save_output_buffer,
+    save_temp_file
+)
+from worker_pool import WORKER_POOL
+
+VOCAL_STAGES = ["tts", "denoise", "analyze", "musicgen", "mix", "encode"]
+NOISE_REDUCTION_STAGES = ["denoise", "encode"]
+NOISE_REDUCTION_BATCH_STAGES = ["denoise", "encode", "archive"]
+LYRICS_STAGES = ["lyrics"]
+
+
+class PipelineError(Exception):
+    """Pipeline failure carrying the HTTP status code the route should return."""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _file_base(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _publish(master_path, desired_format, encoded_path):
+    """/media URL of a master, with the file already encoded for the request cached as its rendition."""
+    MEDIA_STORE.register(master_path, desired_format, encoded_path)
+    return media_url(master_path, desired_format)
+
+
+def _noop_progress(stage, message=None):
+    pass
+
+
+# ----------------------------------------------------
+# Lyrics Generation
+# ----------------------------------------------------
+def lyric_line_range(lyric_length_label):
+    """Map the (possibly localized) lyric length label to a (min, max) line count."""
+    label_lower = lyric_length_label.lower()
+    short_keywords = ['short', 'قصير', '短', 'court', 'kurz', 'corto', 'короткий', 'corto']
+    long_keywords = ['long', 'طويل', '长', 'long', 'lang', 'lungo', 'длинный', 'largo']
+
+    if any(k in label_lower for k in short_keywords):
+        return 4, 6
+    if any(k in label_lower for k in long_keywords):
+        return 16, 20
+    return 8, 12
+
+
+def run_generate_lyrics(lyrics_language, theme, lyric_length_label, bias=None, progress=None):
+    """Generate lyrics using Markov chain based on language, theme, and length."""
+    progress = progress or _noop_progress
+    min_lines, max_lines = lyric_line_range(lyric_length_label)
+
+    progress("lyrics")
+    lyrics_text = generate_lyrics_with_markov(
+        language=lyrics_language,
+        genre=theme,
+        min_lines=min_lines,
+        max_lines=max_lines,
+        bias=bias
+    )
+
+    if not lyrics_text:
+        raise PipelineError(f"Could not generate lyrics for {lyrics_language}/{theme}. Corpus may be empty.")
+
+    return {
+        "lyrics_text": lyrics_text,
+        "language": lyrics_language,
+        "theme": theme,
+        "line_count": len(lyrics_text.splitlines()),
+        "min_lines": min_lines,
+        "max_lines": max_lines
+    }
+
+
+# ----------------------------------------------------
+# Noise Reduction
+# ----------------------------------------------------
+def run_noise_reduction(original_path, file_type='wav', stage1_mode='auto', progress=None):
+    """
+    Two-stage noise reduction of a saved upload, converted to `file_type`.
+    `stage1_mode` is 'auto', 'stationary' or 'non_stationary'.
+    """
+    progress = progress or _noop_progress
+
+    progress("denoise")
+    original_path, reduced_path, report = WORKER_POOL.run(reduce_noise_report, original_path, stage1_mode)
+    if not reduced_path:
+        raise PipelineError("Noise reduction failed.")
+
+    progress("encode")
+    master_path = reduced_path
+    try:
+        reduced_path = convert_audio_format(reduced_path, file_type)
+    except (EncodingError, ValueError) as e:
+        raise PipelineError(f"Encoding to {file_type} failed: {e}")
+    return {
+        "status": "Noise reduction complete!",
+        "original_file": os.path.basename(original_path),
+        "original_audio_url": f"/static/outputs/{os.path.basename(original_path)}",
+        "noise_reduce_file": os.path.basename(reduced_path),
+        "noise_reduced_url": f"/static/outputs/{os.path.basename(reduced_path)}",
+        "noise_reduced_media_url": _publish(master_path, file_type, reduced_path),
+        "noise_reduction_report": report
+    }
+
+
+def run_noise_reduction_batch(original_paths, file_type='wav', stage1_mode='auto', make_archive=False,
+                              output_dir=None, progress=None):
+    """
+    Noise-reduce many saved uploads in one call (stage 2 batched through DNS64).
+    Returns one result entry per input plus an optional zip of the outputs.
+    """
+    progress = progress or _noop_progress
+    if not original_paths:
+        raise PipelineError("No audio files found in upload.", 400)
+
+    progress("denoise", f"{len(original_paths)} files")
+    batch = WORKER_POOL.run(reduce_noise_batch, original_paths, stage1_mode)
+
+    progress("encode")
+    try:
+        file_type = normalize_format(file_type)
+    except ValueError as e:
+        raise PipelineError(str(e), 400)
+    encoded = iter(encode_many([
+        (item["denoised_path"],
+         [(output_path_for(OUTPUT_DIR, _file_base(item["denoised_path"]), file_type), file_type)])
+        for item in batch if not item["error"]
+    ]))
+    results = []
+    for item in batch:
+        entry = {
+            "original_file": os.path.basename(item["original_path"]),
+            "original_audio_url": f"/static/outputs/{os.path.basename(item['original_path'])}",
+            "noise_reduction_report": item["report"],
+        }
+        paths = None if item["error"] else next(encoded)
+        if item["error"] or isinstance(paths, EncodingError):
+            entry.update({"status": "error", "message": item["error"] or str(paths)})
+        else:
+            reduced_path = paths[0]
+            entry.update({
+                "status": "success",
+                "noise_reduce_file": os.path.basename(reduced_path),
+                "noise_reduced_url": f"/static/outputs/{os.path.basename(reduced_path)}",
+                "noise_reduced_media_url": _publish(item["denoised_path"], file_type, reduced_path),
+                "noise_reduced_path": reduced_path,
+            })
+        results.append(entry)
+
+    response = {
+        "status": "Batch noise reduction complete!",
+        "file_count": len(results),
+        "failed_count": sum(1 for r in results if r["status"] == "error"),
+        "results": results,
+    }
+
+    if make_archive:
+        progress("archive")
+        archive_name = f"noise_reduced_{os.urandom(6).hex()}.zip"
+        archive_path = safe_join(output_dir or os.path.dirname(original_paths[0]), archive_name)
+        with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for r in results:
+                if r["status"] == "success":
+                    archive.write(r["noise_reduced_path"], arcname=r["noise_reduce_file"])
+        response["archive_file"] = archive_name
+        response["archive_url"] = f"/static/outputs/{archive_name}"
+
+    for r in results:
+        r.pop("noise_reduced_path", None)
+    return response
+
+
+# ----------------------------------------------------
+# Generate Vocals + Music + Mixing
+# ----------------------------------------------------
+def run_generate_vocals(instrument='full_music', genre='Pop', language='English', lyrics='',
+                        vocal_style='Random', selected_voice_name='', tts_engine='Bark AI',
+                        voice_upload=None, mode='full_music', file_type='wav', seed=None,
+                        analysis_quality=None, analyze_tempo=False, analyze_key=False, progress=None):
+    """
+    Generates vocals using selected TTS engine, optionally generates music,
+    and mixes them unless conditions instruct skipping MusicGen.
+    `voice_upload` may be an uploaded file or the path of an already-saved upload.
+    A `seed` makes voice choice, speed and model sampling reproducible.
+    `analysis_quality` picks the tier of the prompt's vocal analysis (refinement
+    keeps SONOSPHERE_REFINE_ANALYSIS_QUALITY); `analyze_tempo` / `analyze_key`
+    add the vocal's tempo and key to the MusicGen prompt.
+    """
+    progress = progress or _noop_progress
+    mode = mode.lower()
+
+    # Worker processes can only receive picklable arguments, so persist uploads first
+    if voice_upload and not isinstance(voice_upload, str):
+        voice_upload = save_temp_file(voice_upload)
+
+    vocal_path = final_path = None
+    music_path = None
+    music = mixed = None
+
+    # Controls if MusicGen + mixing should be skipped
+    skip_musicgen_and_mix = False
+
+    # Handle vocals if lyrics provided
+    if lyrics:
+        lang_abbr = get_lang_abbr(language)
+
+        progress("tts")
+        vocal = WORKER_POOL.run(
+            synthesize_vocals,
+            lyrics, tts_engine, vocal_style, lang_abbr, genre,
+            selected_voice_name, instrument, voice_upload, mode,
+            denoise=False, seed=seed
+        )
+
+        if vocal is not None and tts_output_needs_denoise(tts_engine, vocal_style, instrument, voice_upload):
+            progress("denoise")
+            vocal = WORKER_POOL.run(reduce_noise_buffer, vocal)
+
+        if vocal is None or vocal.is_empty:
+            raise PipelineError(f"{tts_engine} generation failed.")
+
+        # The vocal stem is a deliverable; later stages keep working on the buffer
+        vocal_path = save_output_buffer(vocal, f"generated_vocals_{tts_engine.lower().replace(' ', '_')}")
+
+        # Skip mixing when Bark AI creates full_music with Random voice
+        if (
+                tts_engine == 'Bark AI'
+                and vocal_style.lower() == "random"
+                and instrument.lower() == "full_music"
+                and not voice_upload
+                and mode == 'full_music'
+        ):
+            skip_musicgen_and_mix = True
+            final_path = vocal_path
+        elif (
+                tts_engine in ['Bark AI', 'Coqui XTTS']
+                and vocal_style.lower() in ["random", "male", "female"]
+                and mode != 'full_music'
+                and not voice_upload
+        ):
+            skip_musicgen_and_mix = True
+            final_path = vocal_path
+        elif (
+                tts_engine in ['Bark AI', 'Coqui XTTS']
+                and mode != 'full_music'
+                and voice_upload
+        ):
+            skip_musicgen_and_mix = True
+            final_path = vocal_path
+    # Music + mixing (if not skipped)
+    if vocal_path and final_path is None and not skip_musicgen_and_mix:
+        progress("analyze")
+        music_prompt = WORKER_POOL.run(analyze_vocal_and_enrich_prompt, vocal, genre, instrument, lyrics,
+                                       analysis_quality, analyze_tempo, analyze_key)
+        progress("musicgen")
+        music = WORKER_POOL.run(generate_music_buffer, prompt=music_prompt, seed=seed)
+
+        if music is None:
+            raise PipelineError("Music generation failed.")
+        music_path = save_output_buffer(music, "musicgen_output")
+
+        progress("mix")
+        mixed = WORKER_POOL.run(refine_and_mix_buffers, vocal, music)
+        final_path = save_output_buffer(mixed, "final_mix")
+
+    if not final_path:
+        raise PipelineError("Could not finalize track. Check vocal file and instrument selection.")
+
+    # Build response: the final track and both stems are encoded concurrently from memory
+    progress("encode")
+    print(f"full music file_type to be converted to: {file_type}")
+    stems = {"final": (mixed if mixed is not None else vocal, _file_base(final_path))}
+    if music_path:
+        stems["music"] = (music, _file_base(music_path))
+    stems["vocal"] = (vocal, _file_base(vocal_path))
+    try:
+        encoded = encode_stems(stems, file_type, OUTPUT_DIR)
+    except ValueError as e:
+        raise PipelineError(str(e), 400)
+    except EncodingError as e:
+        raise PipelineError(f"Encoding to {file_type} failed: {e}")
+
+    # /media URLs serve any other format on demand from the WAV masters
+    result = {
+        "status": "Song created!",
+        "file": os.path.basename(encoded["final"]),
+        "final_audio_url": f"/static/outputs/{os.path.basename(encoded['final'])}",
+        "final_media_url": _publish(final_path, file_type, encoded["final"]),
+        "source": "vocal_only" if skip_musicgen_and_mix else "mixed"
+    }
+
+    # Add raw music and raw vocal
+    if "music" in encoded:
+        result["music_file"] = os.path.basename(encoded["music"])
+        result["music_audio_url"] = f"/static/outputs/{os.path.basename(encoded['music'])}"
+        result["music_media_url"] = _publish(music_path, file_type, encoded["music"])
+    result["vocal_file"] = os.path.basename(encoded["vocal"])
+    result["vocal_audio_url"] = f"/static/outputs/{os.path.basename(encoded['vocal'])}"
+    result["vocal_media_url"] = _publish(vocal_path, file_type, encoded["vocal"])
+
+    return result
@@ -0,0 +1,129 @@
+# ===== preprocess_corpus.py =====
+# ----------------------------------------------------
+# Offline corpus preprocessing: cleans every song in `all_lyrics` once and
+# stores the surviving lines, per language/genre, in the `clean_lyrics` table
+# together with per-line attributes. The lyrics generator reads these lines
+# directly instead of cleaning the raw corpus on every request.
+#
+# Run after `setup_database.py` (and again whenever the corpus changes):
+#   python preprocess_corpus.py [--db PATH] [--batch-size N]
+# ----------------------------------------------------
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from lyrics_generator import (
+    CORPUS_CLEANING_VERSION,
+    DB_CLEAN_META_TABLE,
+    DB_CLEAN_TABLE,
+    DB_FILE_PATH,
+    DB_TABLE_NAME,
+    clean_corpus_text,
+    clean_lyric_line,
+    latin_ratio,
+)
+from profanity_filter import get_matcher
+
+BUILD_TABLE = f"{DB_CLEAN_TABLE}_build"
+
+
+def _create_tables(cursor):
+    cursor.execute(f"DROP TABLE IF EXISTS {BUILD_TABLE}")
+    cursor.execute(
+        f"CREATE TABLE {BUILD_TABLE} ("
+        "Id INTEGER PRIMARY KEY, "
+        "SongId INTEGER NOT NULL, "   # rowid in all_lyrics (joins with the FTS index)
+        "Language TEXT NOT NULL, "    # lower-cased language code
+        "Genre TEXT NOT NULL, "       # lower-cased genre
+        "Line TEXT NOT NULL, "
+        "WordCount INTEGER NOT NULL, "
+        "LatinRatio REAL NOT NULL, "
+        "IsProfane INTEGER NOT NULL)"
+    )
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {DB_CLEAN_META_TABLE} (key TEXT PRIMARY KEY, value TEXT)")
+
+
+def clean_song_lines(song_id, lyrics, language, genre):
+    """Rows for the cleaned lines of one song."""
+    lang_code = (language or '').strip().lower()
+    genre = (genre or '').strip().lower()
+    lines = [clean_lyric_line(line, lang_code) for line in clean_corpus_text(lyrics, lang_code).split('\n')]
+    lines = [line for line in lines if line is not None]
+    flags = get_matcher(lang_code).flag_lines(lines)
+    return [
+        (song_id, lang_code, genre, line, len(line.split()), round(latin_ratio(line), 4), int(profane))
+        for line, profane in zip(lines, flags)
+    ]
+
+
+def preprocess_corpus(db_path=DB_FILE_PATH, batch_size=5000):
+    """Rebuild `clean_lyrics` from `all_lyrics`; the old table stays readable until the swap."""
+    if not os.path.exists(db_path):
+        print(f"[ERROR] Corpus database not found: {db_path}")
+        return False
+
+    started = time.time()
+    conn = sqlite3.connect(db_path)
+    try:
+        read_cursor = conn.cursor()
+        write_cursor = conn.cursor()
+        _create_tables(write_cursor)
+
+        songs = lines = profane = 0
+        pending = []
+        read_cursor.execute(f"SELECT rowid, Lyrics, Language, Genre FROM {DB_TABLE_NAME} WHERE Lyrics IS NOT NULL")
+        for song_id, lyrics, language, genre in read_cursor:
+            rows = clean_song_lines(song_id, lyrics, language, genre)
+            songs += 1
+            lines += len(rows)
+            profane += sum(row[-1] for row in rows)
+            pending.extend(rows)
+            if len(pending) >= batch_size:
+                write_cursor.executemany(
+                    f"INSERT INTO {BUILD_TABLE} (SongId, Language, Genre, Line, WordCount, LatinRatio, IsProfane) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", pending
+                )
+                pending = []
+            if songs % 10000 == 0:
+                print(f"[INFO] {songs} songs → {lines} lines")
+        if pending:
+            write_cursor.executemany(
+                f"INSERT INTO {BUILD_TABLE} (SongId, Language, Genre, Line, WordCount, LatinRatio, IsProfane) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", pending
+            )
+
+        # Swap the new table in and record which cleaning rules produced it
+        write_cursor.execute(f"DROP TABLE IF EXISTS {DB_CLEAN_TABLE}")
+        write_cursor.execute(f"ALTER TABLE {BUILD_TABLE} RENAME TO {DB_CLEAN_TABLE}")
+        write_cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{DB_CLEAN_TABLE}_lang_genre "
+                             f"ON {DB_CLEAN_TABLE}(Language, Genre, IsProfane)")
+        write_cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{DB_CLEAN_TABLE}_song ON {DB_CLEAN_TABLE}(SongId)")
+        write_cursor.execute(
+            f"INSERT OR REPLACE INTO {DB_CLEAN_META_TABLE} (key, value) VALUES ('cleaning_version', ?)",
+            (str(CORPUS_CLEANING_VERSION),)
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"[ERROR] Corpus preprocessing failed: {e}")
+        return False
+    finally:
+        conn.close()
+
+    print(f"[SUCCESS] Cleaned {songs} songs into {lines} lines ({profane} flagged profane) "
+          f"in {time.time() - started:.1f}s.")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize the cleaned lyric corpus used by the generator.")
+    parser.add_argument("--db", default=DB_FILE_PATH, help="Path to lyrics_corpus.db")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per insert batch")
+    args = parser.parse_args()
+    sys.exit(0 if preprocess_corpus(args.db, args.batch_size) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# ===== profanity_filter.py =====
+import functools
+import itertools
+import os
+import re
+
+# ====================================================
+# Profanity Word Lists
+# ====================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Optional extra lists, one word/phrase per line: <dir>/<lang_code>.txt
+PROFANITY_LIST_DIR = os.getenv('SONOSPHERE_PROFANITY_DIR', os.path.join(BASE_DIR, 'profanity_lists'))
+
+# Same tokenization the generator has always used for profanity checks
+TOKEN_PATTERN = re.compile(r'\b[\w\'!@#\$%\^&*\-]+\b', flags=re.UNICODE)
+# Letter look-alikes better_profanity accepts (its digit/symbol ones never survive normalization)
+LETTER_VARIANTS = {"i": "il", "u": "uv", "v": "vu"}
+MAX_VARIANTS_PER_WORD = 64
+
+
+def normalize_word(word):
+    """Case-folded letters only: "F*ck!" → "fck", "Чёрт" → "чёрт"."""
+    return "".join(c for c in word.casefold() if c.isalpha())
+
+
+def _letter_variants(word):
+    options = [LETTER_VARIANTS.get(c, c) for c in word]
+    return {"".join(p) for p in itertools.islice(itertools.product(*options), MAX_VARIANTS_PER_WORD)}
+
+
+def _read_word_list(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def default_word_list():
+    """better_profanity's bundled list (empty if the package is not installed)."""
+    try:
+        import better_profanity
+    except ImportError:
+        print("[WARN] better_profanity not installed; profanity filtering uses custom lists only.")
+        return []
+    path = os.path.join(os.path.dirname(better_profanity.__file__), 'profanity_wordlist.txt')
+    return _read_word_list(path) if os.path.exists(path) else []
+
+
+def language_word_list(lang_code):
+    path = os.path.join(PROFANITY_LIST_DIR, f"{lang_code}.txt")
+    return _read_word_list(path) if lang_code and os.path.exists(path) else []
+
+
+# ====================================================
+# Compiled Matcher
+# ====================================================
+class ProfanityMatcher:
+    """
+    Whole-line profanity check compiled from word lists: single words become a
+    set lookup and multi-word entries an n-gram lookup, so a line is tokenized
+    and checked in one pass.
+    """
+
+    def __init__(self, words):
+        self.words = set()
+        self.phrases = set()
+        self.max_phrase_len = 1
+        for entry in words:
+            tokens = entry.casefold().split()
+            # Tokens are reduced to letters before lookup, so leetspeak entries ("4r5e") can never match
+            if not tokens or not all(t.isalpha() for t in tokens):
+                continue
+            if len(tokens) == 1:
+                # better_profanity never flags single-character words
+                if len(tokens[0]) > 1:
+                    self.words.update(_letter_variants(tokens[0]))
+            else:
+                self.phrases.add(tuple(tokens))
+                self.max_phrase_len = max(self.max_phrase_len, len(tokens))
+
+    def __len__(self):
+        return len(self.words) + len(self.phrases)
+
+    def _profane_spans(self, tokens):
+        """Index ranges [start, end) of profane words/phrases in normalized `tokens`."""
+        spans = []
+        for i, token in enumerate(tokens):
+            if token in self.words:
+                spans.append((i, i + 1))
+            for n in range(2, self.max_phrase_len + 1):
+                if i + n <= len(tokens) and tuple(tokens[i:i + n]) in self.phrases:
+                    spans.append((i, i + n))
+        return spans
+
+    def contains(self, text):
+        """True if `text` contains any listed word or phrase."""
+        if not text:
+            return False
+        tokens = [normalize_word(m.group()) for m in TOKEN_PATTERN.finditer(text)]
+        if not self.words.isdisjoint(tokens):
+            return True
+        return self.max_phrase_len > 1 and bool(self._profane_spans(tokens))
+
+    def censor(self, text):
+        """Soft-censor profane words, keeping their first letter: "damn" → "d***"."""
+        if not text:
+            return text
+        matches = list(TOKEN_PATTERN.finditer(text))
+        spans = self._profane_spans([normalize_word(m.group()) for m in matches])
+        if not spans:
+            return text
+        flagged = {i for start, end in spans for i in range(start, end)}
+        parts = []
+        last = 0
+        for i, m in enumerate(matches):
+            if i not in flagged:
+                continue
+            word = m.group()
+            parts.append(text[last:m.start()])
+            parts.append(word[0] + '*' * (len(word) - 1))
+            last = m.end()
+        parts.append(text[last:])
+        return "".join(parts)
+
+    def flag_lines(self, lines):
+        """Profanity flag for each of `lines` (bulk corpus flagging)."""
+        return [self.contains(line) for line in lines]
+
+
+@functools.lru_cache(maxsize=None)
+def get_matcher(lang_code=None):
+    """
+    Matcher for a language: the default (English) list plus `<lang_code>.txt`
+    from PROFANITY_LIST_DIR when present. English is always included since
+    lyrics in every language borrow English profanity.
+    """
+    words = default_word_list() + language_word_list(lang_code)
+    return ProfanityMatcher(words)
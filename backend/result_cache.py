@@ -0,0 +1,196 @@
+# ===== result_cache.py =====
+import hashlib
+import importlib.metadata
+import json
+import os
+import shutil
+import threading
+
+# ====================================================
+# Cache Configuration
+# ====================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_ROOT = os.getenv('SONOSPHERE_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+
+
+def cache_key(*parts):
+    """Stable SHA-256 key for any JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+_file_digests = {}
+
+
+def file_digest(path):
+    """SHA-256 of a file's bytes, memoized on (path, size, mtime)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _file_digests.get(memo_key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digest = _file_digests[memo_key] = sha.hexdigest()
+    return digest
+
+
+def package_version(name):
+    """Installed version of a distribution, used to invalidate model-dependent entries."""
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def link_or_copy(src, dst):
+    """Hard-link `src` to `dst` when possible (same filesystem), else copy it."""
+    try:
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+    return dst
+
+
+# ====================================================
+# Content-addressed Disk Cache
+# ====================================================
+class DiskCache:
+    """
+    Size-bounded on-disk cache of files addressed by a content key.
+
+    An entry is one file per (key, suffix), e.g. `<key>.wav` plus `<key>.json`
+    metadata. Reads refresh the file's mtime. The cache size is tracked in
+    memory (seeded by one scan at startup); only when a write pushes it past
+    `max_bytes` is the tree rescanned and the least recently used files
+    evicted. Other processes sharing the directory are picked up by that
+    rescan.
+    """
+
+    def __init__(self, name, max_bytes, root=None):
+        self.directory = os.path.join(root or CACHE_ROOT, name)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries()) if max_bytes else 0
+
+    def path_for(self, key, suffix):
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.directory, key[:2], f"{key}{suffix}")
+
+    def get(self, key, suffix):
+        """Return the cached file path for (key, suffix), or None."""
+        path = self.path_for(key, suffix)
+        try:
+            os.utime(path, None)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def get_json(self, key, suffix='.json'):
+        path = self.get(key, suffix)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_bytes(self, key, suffix):
+        path = self.get(key, suffix)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put_file(self, key, suffix, src_path):
+        """Store a copy of `src_path`; returns the cached path."""
+        return self._write(key, suffix, lambda tmp: shutil.copyfile(src_path, tmp))
+
+    def link_file(self, key, suffix, src_path):
+        """Store `src_path` as a hard link when possible (copy otherwise); returns the cached path."""
+        return self._write(key, suffix, lambda tmp: link_or_copy(src_path, tmp))
+
+    def put_bytes(self, key, suffix, data):
+        def write(tmp):
+            with open(tmp, 'wb') as f:
+                f.write(data)
+
+        return self._write(key, suffix, write)
+
+    def put_json(self, key, value, suffix='.json'):
+        return self.put_bytes(key, suffix, json.dumps(value, default=str).encode('utf-8'))
+
+    def _write(self, key, suffix, writer):
+        path = self.path_for(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp name first so readers never see a partial file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            writer(tmp)
+            added = os.path.getsize(tmp)
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        if self.max_bytes:
+            with self._lock:
+                self._total_bytes += added - replaced
+                over_budget = self._total_bytes > self.max_bytes
+            if over_budget:
+                self.evict()
+        return path
+
+    def _entries(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self):
+        """Remove least recently used files until the cache fits its budget."""
+        if not self.max_bytes:
+            return
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._total_bytes = total
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "directory": self.directory,
+            "files": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
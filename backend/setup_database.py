@@ -1,4 +1,5 @@
 import os
+import sqlite3
 import subprocess
 import sys
 
@@ -40,6 +41,18 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TARGET_DIR = os.path.normpath(os.path.join(BASE_DIR, "../frontend/static/lyrics_corpora"))
 TARGET_PATH = os.path.join(TARGET_DIR, TARGET_FILE_NAME)
 
+# =========================================================
+# === SCHEMA MIGRATIONS ===================================
+# =========================================================
+# Stored in PRAGMA user_version once the corresponding step has run
+SCHEMA_VERSION = 1
+LYRICS_TABLE = "all_lyrics"
+# Word index for space-delimited languages (accents folded: "corazón" ~ "corazon")
+LYRICS_FTS_TABLE = "all_lyrics_fts"
+# Substring index for Chinese, which has no spaces between words
+LYRICS_CJK_FTS_TABLE = "all_lyrics_fts_cjk"
+CJK_LANGUAGES = ("zh",)
+
 
 def setup_database():
     """Ensures the target directory exists and downloads the database using gdown."""
@@ -60,6 +73,7 @@ def setup_database():
         # Check if file is reasonably large (e.g., > 1 MB) to avoid redownloading small error files
         if file_size > 1024 * 1024:
             print(f"'{TARGET_FILE_NAME}' already exists (Size: {file_size / (1024 * 1024):.2f} MB). Skipping download.")
+            migrate_database(TARGET_PATH)
             return
 
         print(
@@ -73,6 +87,7 @@ def setup_database():
             output=TARGET_PATH,
             quiet=False  # Shows download progress
         )
+        migrate_database(TARGET_PATH)
         print("\n[SUCCESS] Database setup complete! You can now run the application.")
     except Exception as e:
         print("-" * 60)
@@ -85,5 +100,81 @@ def setup_database():
         sys.exit(1)
 
 
+def _create_fts_index(cursor, fts_table, tokenizer, where=""):
+    """External-content FTS5 index over Lyrics, kept in sync by triggers."""
+    cursor.execute(f"DROP TABLE IF EXISTS {fts_table}")
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+        f"Lyrics, content='{LYRICS_TABLE}', content_rowid='rowid', tokenize=\"{tokenizer}\")"
+    )
+    cursor.execute(
+        f"INSERT INTO {fts_table}(rowid, Lyrics) SELECT rowid, Lyrics FROM {LYRICS_TABLE} "
+        f"WHERE Lyrics IS NOT NULL {where}"
+    )
+
+    # Rows outside `where` were never indexed, so only those matching it are synced
+    new_row = f"WHEN new.Lyrics IS NOT NULL {where.replace('Language', 'new.Language')}"
+    old_row = f"WHEN old.Lyrics IS NOT NULL {where.replace('Language', 'old.Language')}"
+    delete = f"INSERT INTO {fts_table}({fts_table}, rowid, Lyrics) VALUES ('delete', old.rowid, old.Lyrics);"
+    insert = f"INSERT INTO {fts_table}(rowid, Lyrics) VALUES (new.rowid, new.Lyrics);"
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {LYRICS_TABLE} "
+                   f"{new_row} BEGIN {insert} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {LYRICS_TABLE} "
+                   f"{old_row} BEGIN {delete} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_bu BEFORE UPDATE ON {LYRICS_TABLE} "
+                   f"{old_row} BEGIN {delete} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {LYRICS_TABLE} "
+                   f"{new_row} BEGIN {insert} END")
+
+
+def migrate_database(db_path=TARGET_PATH):
+    """
+    Adds the lookup indexes the lyrics generator relies on (idempotent):
+      • B-tree indexes on LOWER(Language) / LOWER(Genre)
+      • FTS5 word index over Lyrics (unicode61, diacritics folded)
+      • FTS5 trigram index over Chinese lyrics
+    """
+    if not os.path.exists(db_path):
+        print(f"[ERROR] Database not found for migration: {db_path}")
+        return False
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            print(f"Database schema is up to date (version {version}).")
+            return True
+
+        print(f"Migrating database schema {version} → {SCHEMA_VERSION} (this can take a few minutes)...")
+        # Expression indexes match the LOWER(...) = ? lookups used by the generator
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{LYRICS_TABLE}_lang_genre "
+                       f"ON {LYRICS_TABLE}(LOWER(Language), LOWER(Genre))")
+
+        _create_fts_index(cursor, LYRICS_FTS_TABLE, "unicode61 remove_diacritics 2")
+        cjk_codes = ", ".join(f"'{code}'" for code in CJK_LANGUAGES)
+        try:
+            _create_fts_index(cursor, LYRICS_CJK_FTS_TABLE, "trigram",
+                              where=f"AND LOWER(Language) IN ({cjk_codes})")
+        except sqlite3.OperationalError as e:
+            # The trigram tokenizer needs SQLite 3.34+; Chinese bias lookups fall back to LIKE
+            print(f"[WARN] Skipping Chinese trigram index: {e}")
+
+        cursor.execute(f"INSERT INTO {LYRICS_FTS_TABLE}({LYRICS_FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        cursor.execute("ANALYZE")
+        print("[SUCCESS] Database migration complete.")
+        return True
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"[ERROR] Database migration failed: {e}")
+        return False
+    finally:
+        conn.close()
+
+
 if __name__ == "__main__":
+    if "--migrate-only" in sys.argv[1:]:
+        sys.exit(0 if migrate_database(TARGET_PATH) else 1)
     setup_database()
@@ -2,21 +2,23 @@
 import os
 import random
 import subprocess
+import threading
+import time
+from contextlib import contextmanager
 
 import librosa
-import noisereduce as nr
 import numpy as np
-import soundfile as sf
-import torch
-import torchaudio
-from TTS.api import TTS as CoquiTTS, TTS
-from denoiser import pretrained
-from denoiser.dsp import convert_audio
-from pydub import AudioSegment
-from scipy.signal import medfilt
-from transformers import AutoProcessor, MusicgenForConditionalGeneration
 from werkzeug.utils import secure_filename
 
+from audio_buffer import AudioBuffer
+from encoder import encode_file, normalize_format, output_path_for
+from mixer import VOCAL_TARGET_LUFS, mix_stems, normalize_loudness
+from model_registry import MODEL_REGISTRY
+from result_cache import DiskCache, cache_key, file_digest, link_or_copy, package_version
+from speaker_conditioning import conditioned_request
+from vocal_features import REFINE_ANALYSIS_QUALITY, get_vocal_features
+from voice_catalog import VOICE_CATALOG
+
 # ====================================================
 # Directories & Persistent Paths
 # ====================================================
@@ -27,50 +29,129 @@ TMP_DIR = os.path.normpath(os.path.join(BASE_DIR, '../frontend/static/temp'))
 os.makedirs(TMP_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+BARK_MODEL_NAME = "tts_models/multilingual/multi-dataset/bark"
+XTTS_MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
+MUSICGEN_MODEL_NAME = "facebook/musicgen-small"
+
+# DNS64 streaming window / crossfade overlap in seconds (window 0 = full-file pass)
+DNS_WINDOW_SECONDS = float(os.getenv('SONOSPHERE_DNS_WINDOW_SEC', 10.0))
+DNS_OVERLAP_SECONDS = float(os.getenv('SONOSPHERE_DNS_OVERLAP_SEC', 1.0))
+# Batched DNS64: clips per forward pass and the tolerated share of zero padding
+DNS_BATCH_SIZE = int(os.getenv('SONOSPHERE_DNS_BATCH_SIZE', 8))
+DNS_BATCH_MAX_PADDING = float(os.getenv('SONOSPHERE_DNS_BATCH_MAX_PADDING', 0.25))
+
+# Bump when the noise-reduction pipeline changes output for the same input
+NOISE_REDUCTION_VERSION = "dns64-nr2stage-v1"
+NOISE_CACHE = DiskCache("noise_reduction", int(os.getenv('SONOSPHERE_NR_CACHE_MB', 2048)) * 1024 * 1024)
+
+# Synthesized vocals of seeded (reproducible) requests
+TTS_CACHE = DiskCache("tts", int(os.getenv('SONOSPHERE_TTS_CACHE_MB', 2048)) * 1024 * 1024)
+
+# noisereduce chunking: chunk length, context padding on each side, parallel jobs (0 = auto)
+NR_CHUNK_SECONDS = float(os.getenv('SONOSPHERE_NR_CHUNK_SEC', 15.0))
+NR_PADDING_SECONDS = float(os.getenv('SONOSPHERE_NR_PADDING_SEC', 2.0))
+NR_JOBS = int(os.getenv('SONOSPHERE_NR_JOBS', 0))
+# Noise floor variation (dB) below which the stationary gate is chosen automatically
+NR_STATIONARY_MAX_STD_DB = float(os.getenv('SONOSPHERE_NR_STATIONARY_STD_DB', 1.5))
+# Stage-1 paths a caller may ask for ('auto' picks one from the noise floor)
+NOISE_MODES = ("auto", "stationary", "non_stationary")
+
 
 # ====================================================
-# General Utility Helpers
+# Shared Model Registry
 # ====================================================
-def convert_audio_format(input_path, desired_format):
-    """
-    Converts an audio file to WAV, MP3, FLAC, OPUS, or OGG.
-    Returns the output file path.
-    """
+# torch, TTS, transformers, denoiser and noisereduce are imported inside the
+# functions that use them, so routes that never touch a model (lyrics, form
+# data, health checks) don't pay for loading them.
+def _load_bark():
+    from TTS.api import TTS
+    return TTS(model_name=BARK_MODEL_NAME, progress_bar=False, gpu=False)
 
-    desired_format = desired_format.lower()
 
-    valid_formats = ["wav", "mp3", "flac", "opus", "ogg"]
-    if desired_format not in valid_formats:
-        raise ValueError(f"Unsupported output format: {desired_format}")
+def _load_xtts():
+    from TTS.api import TTS
+    return TTS(model_name=XTTS_MODEL_NAME)
 
-    # Build output path
-    base = os.path.splitext(os.path.basename(input_path))[0]
-    output_filename = f"{base}_{os.urandom(6).hex()}_converted.{desired_format}"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
-
-    # ffmpeg arguments by format
-    codec_map = {
-        "mp3": ["-acodec", "libmp3lame"],
-        "wav": ["-acodec", "pcm_s16le"],
-        "flac": ["-acodec", "flac"],
-        "opus": ["-acodec", "libopus"],
-        "ogg": ["-acodec", "libvorbis"]
-    }
 
-    codec_args = codec_map[desired_format]
+def _load_musicgen():
+    from transformers import AutoProcessor, MusicgenForConditionalGeneration
+    processor = AutoProcessor.from_pretrained(MUSICGEN_MODEL_NAME)
+    model = MusicgenForConditionalGeneration.from_pretrained(MUSICGEN_MODEL_NAME)
+    model.eval()
+    return processor, model
 
-    try:
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", input_path] + codec_args + [output_path],
-            check=True,
-            capture_output=True
-        )
-        print(f"[INFO] Converted → {desired_format}: {output_path}")
-        return output_path
 
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] Format conversion failed: {e.stderr.decode()}")
-        return input_path
+def _load_dns64():
+    from denoiser import pretrained
+    return pretrained.dns64().to('cpu').eval()
+
+
+MODEL_REGISTRY.register("bark", _load_bark, size_mb=5000)
+MODEL_REGISTRY.register("xtts", _load_xtts, size_mb=2000)
+MODEL_REGISTRY.register("musicgen", _load_musicgen, size_mb=2400)
+MODEL_REGISTRY.register("dns64", _load_dns64, size_mb=130)
+
+
+# ---------------------------
+# Warm-up Inference
+# ---------------------------
+# A tiny forward pass per model so lazy initialisation (kernels, tokenizers,
+# speaker conditioning) happens at startup rather than in the first request.
+def _warm_bark(tts_model):
+    tts_model.tts(text="Hello.")
+
+
+def _warm_xtts(tts_model):
+    voices = VOICE_CATALOG.voices("female", "en") or VOICE_CATALOG.voices("male", "en")
+    if not voices:
+        return
+    request = dict(text="Hello.", speaker_wav=voices[0].path, language="en")
+    tts_model.tts(**conditioned_request("xtts", tts_model, request))
+
+
+def _warm_musicgen(model):
+    import torch
+    processor, musicgen = model
+    inputs = processor(text=["warm up"], padding=True, return_tensors="pt")
+    with torch.no_grad():
+        musicgen.generate(**inputs, max_new_tokens=4)
+
+
+def _warm_dns64(model):
+    import torch
+    with torch.no_grad():
+        model(torch.zeros(1, model.chin, model.sample_rate // 4))
+
+
+WARMUP_INFERENCE = {"bark": _warm_bark, "xtts": _warm_xtts, "musicgen": _warm_musicgen, "dns64": _warm_dns64}
+
+
+def warm_up_model(name, inference=True):
+    """
+    Load registry model `name` (if needed) and optionally run a tiny inference
+    through it. The inference samples from the global RNGs like any request,
+    so it goes through `seeded_sampling` too.
+    """
+    start = time.time()
+    with MODEL_REGISTRY.acquire(name) as model:
+        if inference and name in WARMUP_INFERENCE:
+            with seeded_sampling():
+                WARMUP_INFERENCE[name](model)
+    return round(time.time() - start, 3)
+
+
+# ====================================================
+# General Utility Helpers
+# ====================================================
+def convert_audio_format(input_path, desired_format):
+    """
+    Converts an audio file to WAV, MP3, FLAC, OPUS, or OGG.
+    Returns the output file path; raises encoder.EncodingError on failure
+    and ValueError for an unsupported format.
+    """
+    desired_format = normalize_format(desired_format)
+    base = os.path.splitext(os.path.basename(input_path))[0]
+    return encode_file(input_path, [(output_path_for(OUTPUT_DIR, base, desired_format), desired_format)])[0]
 
 
 def safe_join(*paths):
@@ -78,6 +159,12 @@ def safe_join(*paths):
     return os.path.abspath(os.path.join(*paths))
 
 
+def save_output_buffer(audio, prefix):
+    """Write a final deliverable AudioBuffer as WAV into the outputs folder."""
+    output_path = safe_join(OUTPUT_DIR, f"{prefix}_{os.urandom(6).hex()}.wav")
+    return audio.to_file(output_path)
+
+
 def save_temp_file(uploaded_file):
     """
     Converts uploaded voice files (e.g., webm, wav) to mp3.
@@ -134,6 +221,79 @@ def get_language_abbreviation(language):
     return lang_codes.get(language, "en")
 
 
+def make_rng(seed=None):
+    """Private random generator for a seeded request, else the module-level one."""
+    return random.Random(seed) if seed is not None else random
+
+
+class _SamplingGate:
+    """
+    Torch and numpy sample from process-global generators, so a seeded block
+    is only reproducible if nothing else draws from them meanwhile. Unseeded
+    sampling runs shared (concurrently with other unseeded blocks); seeded
+    sampling runs exclusively, and waiting seeded blocks hold off new
+    unseeded ones.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting_exclusive = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._exclusive and not self._waiting_exclusive)
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._waiting_exclusive += 1
+            self._cond.wait_for(lambda: not self._exclusive and not self._shared)
+            self._waiting_exclusive -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+
+SAMPLING_GATE = _SamplingGate()
+
+
+@contextmanager
+def seeded_sampling(seed=None):
+    """
+    Make torch/numpy sampling inside the block reproducible for `seed`.
+    Every model sampling call goes through this, seeded or not, so a seeded
+    block never interleaves draws with another request (see _SamplingGate).
+    """
+    if seed is None:
+        with SAMPLING_GATE.shared():
+            yield
+        return
+    import torch
+    with SAMPLING_GATE.exclusive():
+        torch.manual_seed(seed)
+        np.random.seed(seed % 2 ** 32)
+        try:
+            yield
+        finally:
+            # Reseed from OS entropy so later unseeded draws don't follow this seed
+            torch.seed()
+            np.random.seed()
+
+
 # ====================================================
 # Noise Reduction Pipeline (Two-stage)
 # ====================================================
@@ -143,79 +303,389 @@ def reduce_noise_return(input_path):
     Full noise-reduction pipeline:
       • Stage 1: Spectral gating using noisereduce
       • Stage 2: Deep learning denoiser (FB DNS model)
+    Both stages run on in-memory buffers; only the final result is written.
     Returns:
       (original_path, final_denoised_path)
     """
+    original_file_path, final_denoised_path, _ = reduce_noise_report(input_path)
+    return original_file_path, final_denoised_path
+
+
+def normalize_noise_mode(mode):
+    """Validated stage-1 mode; None or empty selects 'auto'."""
+    mode = (mode or "auto").strip().lower()
+    if mode not in NOISE_MODES:
+        raise ValueError(f"Unknown noise mode '{mode}' (expected {', '.join(NOISE_MODES)})")
+    return mode
+
+
+def _noise_cache_key(audio, noise_duration, prop_decrease, stage1_mode):
+    return cache_key("noise_reduction", NOISE_REDUCTION_VERSION, package_version("noisereduce"), audio.content_hash(),
+                     noise_duration, prop_decrease, stage1_mode)
+
+
+def _noise_cache_fetch(key, output_path):
+    """Materialize a cached result at output_path; returns its report or None on a miss."""
+    cached_path = NOISE_CACHE.get(key, ".wav")
+    if cached_path is None:
+        return None
+    link_or_copy(cached_path, output_path)
+    report = NOISE_CACHE.get_json(key) or {}
+    report["cache"] = "hit"
+    print(f"[INFO] Noise reduction served from cache: {output_path}")
+    return report
+
+
+def _noise_cache_store(key, output_path, report):
+    NOISE_CACHE.put_file(key, ".wav", output_path)
+    NOISE_CACHE.put_json(key, report)
+    report["cache"] = "miss"
+
+
+def reduce_noise_report(input_path, stage1_mode='auto', noise_duration=0.5, prop_decrease=0.9):
+    """
+    Same as `reduce_noise_return`, additionally returning a report dict with
+    the chosen stage-1 path and per-stage timings. Results are cached by the
+    decoded audio content and parameters, so repeat uploads skip both stages.
+    Returns:
+      (original_path, final_denoised_path, report)
+    """
     original_file_path = input_path
-    base, ext = os.path.splitext(input_path)
+    base, _ = os.path.splitext(input_path)
+    final_output_path = base + "_denoised.wav"
+    report = {}
+
+    try:
+        audio = AudioBuffer.from_file(original_file_path)
+    except Exception as e:
+        print(f"[ERROR] Could not decode {original_file_path}: {e}")
+        return original_file_path, None, report
+
+    key = _noise_cache_key(audio, noise_duration, prop_decrease, stage1_mode)
+    cached_report = _noise_cache_fetch(key, final_output_path)
+    if cached_report is not None:
+        return original_file_path, final_output_path, cached_report
+
+    denoised = reduce_noise_buffer(audio, noise_duration, prop_decrease, stage1_mode=stage1_mode, report=report)
+    if denoised is None:
+        return original_file_path, None, report
+
+    denoised.to_file(final_output_path)
+    print(f"[INFO] Denoised audio saved to: {final_output_path}")
+    _noise_cache_store(key, final_output_path, report)
+    return original_file_path, final_output_path, report
 
-    intermediate_path = base + "_nr_temp" + ext
-    final_output_path = base + "_denoised" + ext
+
+def reduce_noise_buffer(audio, noise_duration=0.5, prop_decrease=0.9, stage1_mode='auto', report=None):
+    """
+    Two-stage noise reduction on an AudioBuffer.
+    Returns the denoised AudioBuffer, or None if a stage failed.
+    Stage timings are recorded in `report` when a dict is passed.
+    """
+    report = report if report is not None else {}
 
     # Stage 1 - classical noise reduction
-    y_out, sr = reduce_noise(original_file_path, noise_duration=0.5, prop_decrease=0.9)
-    if y_out.size > 0:
-        sf.write(intermediate_path, y_out, sr)
+    start = time.time()
+    y_out, sr = reduce_noise(audio, noise_duration=noise_duration, prop_decrease=prop_decrease,
+                             mode=stage1_mode, report=report)
+    report["stage1_seconds"] = round(time.time() - start, 3)
+    if y_out.size == 0:
+        return None
 
     # Stage 2 - deep learning denoiser
-    final_denoised_path = reduce_noise_with_denoiser(intermediate_path, final_output_path)
+    start = time.time()
+    denoised = denoise_buffer(AudioBuffer(y_out, sr))
+    report["stage2_seconds"] = round(time.time() - start, 3)
+    return denoised
 
-    return original_file_path, final_denoised_path
 
+def _denoise_overlap_add(model, wav, window, overlap):
+    """
+    Streaming DNS64 pass: run the model over fixed windows of `window` samples
+    that overlap by `overlap` samples, and blend neighbours with linear
+    crossfades. Model activations are bounded by the window size, independent
+    of the recording length.
+    """
+    import torch
+    total = wav.shape[-1]
+    hop = window - overlap
+    output = torch.zeros_like(wav)
+    fade_in = torch.linspace(0.0, 1.0, overlap + 2)[1:-1] if overlap > 0 else None
+
+    start = 0
+    while start < total:
+        end = min(start + window, total)
+        with torch.no_grad():
+            chunk = model(wav[None, :, start:end])[0][..., :end - start]
 
-def reduce_noise_with_denoiser(audio_path, output_path):
+        weights = torch.ones(end - start)
+        if fade_in is not None:
+            if start > 0:
+                ramp = min(overlap, end - start)
+                weights[:ramp] = fade_in[:ramp]
+            if end < total:
+                weights[-overlap:] = torch.minimum(weights[-overlap:], fade_in.flip(0))
+        output[:, start:end] += chunk * weights
+
+        if end == total:
+            break
+        start += hop
+    return output
+
+
+def denoise_buffer(audio, window_seconds=None, overlap_seconds=None):
     """
     Deep-learning noise reduction using Facebook DNS64 pretrained model.
-    Always uses CPU for stability.
+    Always uses CPU for stability. Returns an AudioBuffer at the model rate.
+
+    Recordings longer than the streaming window are processed in overlapping
+    windows (see SONOSPHERE_DNS_WINDOW_SEC / SONOSPHERE_DNS_OVERLAP_SEC);
+    a window of 0 forces a single full-file pass.
     """
+    window_seconds = DNS_WINDOW_SECONDS if window_seconds is None else window_seconds
+    overlap_seconds = DNS_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
     print(f"[INFO] Beginning noise reduction with FB Denoiser model on CPU.")
     try:
+        import torch
+        from denoiser.dsp import convert_audio
         device = 'cpu'
-        model = pretrained.dns64().to(device)
+        wav = torch.from_numpy(audio.samples)
 
-        wav, sr = torchaudio.load(audio_path)
-        channels = wav.shape[0]
+        with MODEL_REGISTRY.acquire("dns64") as model:
+            # Resample & convert for model
+            wav = convert_audio(wav.to(device), audio.sample_rate, model.sample_rate, model.chin)
 
-        # Resample & convert for model
-        wav = convert_audio(wav.to(device), sr, model.sample_rate, channels)
+            window = int(window_seconds * model.sample_rate)
+            overlap = min(int(overlap_seconds * model.sample_rate), window // 2)
+            if 0 < window < wav.shape[-1]:
+                print(f"[INFO] Streaming denoiser: {window_seconds}s windows, {overlap_seconds}s overlap")
+                denoised_wav = _denoise_overlap_add(model, wav, window, overlap)
+            else:
+                with torch.no_grad():
+                    denoised_wav = model(wav[None])[0]
+            model_sample_rate = model.sample_rate
 
-        with torch.no_grad():
-            denoised_wav = model(wav[None])[0]
+        return AudioBuffer(denoised_wav.cpu().numpy(), model_sample_rate)
+
+    except Exception as e:
+        print(f"[ERROR] Deep Learning Denoiser failed: {e}")
+        return None
 
-        torchaudio.save(output_path, denoised_wav.cpu(), model.sample_rate)
-        print(f"[INFO] Denoised audio saved to: {output_path}")
 
-        return output_path
+def _batch_groups(lengths, max_batch, max_padding_ratio):
+    """
+    Group clip indices (sorted by length) into batches whose zero-padding
+    stays below `max_padding_ratio` of the padded batch.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    groups, current = [], []
+    for i in order:
+        if current:
+            longest = lengths[i]
+            padding = sum(longest - lengths[j] for j in current + [i])
+            if len(current) >= max_batch or padding > max_padding_ratio * longest * (len(current) + 1):
+                groups.append(current)
+                current = []
+        current.append(i)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def denoise_buffers_batch(buffers, max_batch=None):
+    """
+    DNS64 over many clips, batching clips of similar length into one padded
+    forward pass. Clips longer than the streaming window fall back to
+    `denoise_buffer`. Returns a list aligned with `buffers` (None on failure).
+    """
+    max_batch = max_batch or DNS_BATCH_SIZE
+    results = [None] * len(buffers)
+    try:
+        import torch
+        from denoiser.dsp import convert_audio
+        with MODEL_REGISTRY.acquire("dns64") as model:
+            model_sample_rate = model.sample_rate
+            window = int(DNS_WINDOW_SECONDS * model_sample_rate)
+            wavs = [convert_audio(torch.from_numpy(b.samples), b.sample_rate, model_sample_rate, model.chin)
+                    for b in buffers]
+    except Exception as e:
+        print(f"[ERROR] Deep Learning Denoiser failed: {e}")
+        return results
+
+    batchable = [i for i, w in enumerate(wavs) if not (0 < window < w.shape[-1])]
+    for i in set(range(len(buffers))) - set(batchable):
+        results[i] = denoise_buffer(buffers[i])
+
+    lengths = [wavs[i].shape[-1] for i in batchable]
+    for group in _batch_groups(lengths, max_batch, DNS_BATCH_MAX_PADDING):
+        indices = [batchable[g] for g in group]
+        longest = max(wavs[i].shape[-1] for i in indices)
+        batch = torch.stack([torch.nn.functional.pad(wavs[i], (0, longest - wavs[i].shape[-1]))
+                             for i in indices])
+        print(f"[INFO] DNS64 batch of {len(indices)} clips ({longest / model_sample_rate:.1f}s padded)")
+        try:
+            with MODEL_REGISTRY.acquire("dns64") as model:
+                with torch.no_grad():
+                    denoised = model(batch)
+        except Exception as e:
+            print(f"[ERROR] Deep Learning Denoiser batch failed: {e}")
+            continue
+        for row, i in enumerate(indices):
+            results[i] = AudioBuffer(denoised[row, :, :wavs[i].shape[-1]].cpu().numpy(), model_sample_rate)
+    return results
+
+
+def reduce_noise_batch(input_paths, stage1_mode='auto', noise_duration=0.5, prop_decrease=0.9):
+    """
+    Two-stage noise reduction for many files. Stage 1 runs per file; stage 2
+    batches the clips through DNS64. Cached results are reused per file.
+    Returns one dict per input: original_path, denoised_path, report, error.
+    """
+    results = [{"original_path": p, "denoised_path": None, "report": {}, "error": None} for p in input_paths]
+    stage1 = {}
+    keys = {}
+    for i, path in enumerate(input_paths):
+        try:
+            audio = AudioBuffer.from_file(path)
+        except Exception as e:
+            results[i]["error"] = f"Could not decode audio: {e}"
+            continue
+
+        base, _ = os.path.splitext(path)
+        keys[i] = _noise_cache_key(audio, noise_duration, prop_decrease, stage1_mode)
+        cached_report = _noise_cache_fetch(keys[i], base + "_denoised.wav")
+        if cached_report is not None:
+            results[i].update(denoised_path=base + "_denoised.wav", report=cached_report)
+            continue
+
+        start = time.time()
+        y_out, sr = reduce_noise(audio, noise_duration, prop_decrease, mode=stage1_mode,
+                                 report=results[i]["report"])
+        results[i]["report"]["stage1_seconds"] = round(time.time() - start, 3)
+        if y_out.size == 0:
+            results[i]["error"] = "Spectral gating failed."
+            continue
+        stage1[i] = AudioBuffer(y_out, sr)
+
+    indices = list(stage1)
+    start = time.time()
+    denoised = denoise_buffers_batch([stage1[i] for i in indices])
+    stage2_seconds = round(time.time() - start, 3)
+
+    for i, audio in zip(indices, denoised):
+        results[i]["report"]["stage2_batch_seconds"] = stage2_seconds
+        if audio is None:
+            results[i]["error"] = "Deep learning denoiser failed."
+            continue
+        base, _ = os.path.splitext(input_paths[i])
+        results[i]["denoised_path"] = audio.to_file(base + "_denoised.wav")
+        _noise_cache_store(keys[i], results[i]["denoised_path"], results[i]["report"])
+    return results
+
 
+def reduce_noise_with_denoiser(audio_path, output_path):
+    """
+    File-based wrapper around `denoise_buffer`.
+    Returns output_path, or None on failure.
+    """
+    try:
+        audio = AudioBuffer.from_file(audio_path, mono=False)
     except Exception as e:
         print(f"[ERROR] Deep Learning Denoiser failed: {e}")
         return None
 
+    denoised = denoise_buffer(audio)
+    if denoised is None:
+        return None
+    denoised.to_file(output_path)
+    print(f"[INFO] Denoised audio saved to: {output_path}")
+    return output_path
+
+
+def _noise_parallelism():
+    """Cores available to noisereduce: the worker's thread share, else all cores."""
+    if NR_JOBS > 0:
+        return NR_JOBS
+    try:
+        return max(1, int(os.environ["OMP_NUM_THREADS"]))
+    except (KeyError, ValueError):
+        return os.cpu_count() or 1
+
+
+def measure_noise_floor_variation(y, sr, frame_seconds=0.05, segment_seconds=2.0, percentile=5):
+    """
+    Estimate how much the noise floor moves over time.
+    Each segment's floor is a low percentile of its frame RMS levels (dB). Only
+    the quieter half of the segments is compared, since segments without any
+    pause in the signal report the signal level rather than the noise.
+    Returns the standard deviation of those floors in dB, or None for short clips.
+    """
+    frame = max(1, int(frame_seconds * sr))
+    frames_per_segment = max(1, int(segment_seconds / frame_seconds))
+    n_segments = len(y) // (frame * frames_per_segment)
+    if n_segments < 3:
+        return None
+
+    frames = y[:n_segments * frames_per_segment * frame].reshape(n_segments, frames_per_segment, frame)
+    rms_db = 20 * np.log10(np.sqrt(np.mean(frames ** 2, axis=2)) + 1e-10)
+    floors = np.sort(np.percentile(rms_db, percentile, axis=1))
+    quiet_floors = floors[:max(3, n_segments // 2)]
+    return float(np.std(quiet_floors))
 
-def reduce_noise(audio_path, noise_duration=0.5, prop_decrease=0.9):
+
+def reduce_noise(audio, noise_duration=0.5, prop_decrease=0.9, mode='auto', report=None):
     """
     Stage-1 noise reduction using spectral gating (noisereduce library).
+    `audio` is an AudioBuffer or a file path.
+
+    The signal is processed in padded chunks across cores. With mode='auto'
+    the much cheaper stationary gate is used when the measured noise floor is
+    stable; 'stationary' / 'non_stationary' force a path.
     Returns (audio_array, sample_rate).
     """
     print(f"[INFO] Beginning noise reduction with noisereduce (prop_decrease={prop_decrease})")
+    report = report if report is not None else {}
     try:
-        y, sr = librosa.load(audio_path, sr=None)
+        import noisereduce as nr
+        if not isinstance(audio, AudioBuffer):
+            audio = AudioBuffer.from_file(audio)
+        y, sr = audio.mono(), audio.sample_rate
 
         noise_len = int(noise_duration * sr)
         noise_clip = y[:noise_len]
 
+        floor_std_db = measure_noise_floor_variation(y, sr)
+        if mode == 'auto':
+            stationary = floor_std_db is not None and floor_std_db <= NR_STATIONARY_MAX_STD_DB
+        else:
+            stationary = mode == 'stationary'
+
+        n_jobs = _noise_parallelism()
+        chunk_size = max(int(NR_CHUNK_SECONDS * sr), 1)
+        report.update({
+            "stage1_mode": "stationary" if stationary else "non_stationary",
+            "noise_floor_std_db": None if floor_std_db is None else round(floor_std_db, 2),
+            "stage1_jobs": n_jobs,
+            "stage1_chunks": int(np.ceil(len(y) / chunk_size)),
+        })
+        print(f"[INFO] noisereduce path: {report['stage1_mode']} "
+              f"(floor std={report['noise_floor_std_db']} dB, jobs={n_jobs})")
+
         y_reduced_noise = nr.reduce_noise(
             y=y,
             sr=sr,
             y_noise=noise_clip,
-            stationary=False,
-            prop_decrease=prop_decrease
+            stationary=stationary,
+            prop_decrease=prop_decrease,
+            chunk_size=chunk_size,
+            padding=int(NR_PADDING_SECONDS * sr),
+            n_jobs=n_jobs
         )
         print(f"[INFO] End of noisereduce processing.")
         return y_reduced_noise, sr
 
     except Exception as e:
-        print(f"[ERROR] Noise reduction failed for {audio_path}: {e}")
+        print(f"[ERROR] Noise reduction failed for {audio}: {e}")
         return np.array([]), None
 
 
@@ -234,45 +704,49 @@ def get_lang_abbr(language):
 # Music Generation (MusicGen)
 # ====================================================
 
-def analyze_vocal_and_enrich_prompt(vocal_path, genre, instrument, lyrics):
+def vocal_prompt_tags(features):
+    """(pitch_tag, loudness_tag) describing a vocal's VocalFeatures for the MusicGen prompt."""
+    # Loudness / dynamics
+    avg_rms_db = features.avg_rms_db
+
+    if avg_rms_db > -20:
+        loudness_tag = "powerful and aggressive dynamics"
+    elif avg_rms_db > -35:
+        loudness_tag = "medium dynamics, bright sound"
+    else:
+        loudness_tag = "subtle and atmospheric feel"
+
+    # Pitch features
+    avg_pitch_hz = features.mean_pitch_hz
+
+    pitch_tag = ""
+    if avg_pitch_hz is not None:
+        if avg_pitch_hz > 300:
+            pitch_tag = "high-register melody"
+        elif avg_pitch_hz < 150:
+            pitch_tag = "deep, low-register harmony"
+        else:
+            pitch_tag = "mid-range vocal pitch"
+    return pitch_tag, loudness_tag
+
+
+def analyze_vocal_and_enrich_prompt(vocal, genre, instrument, lyrics, quality=None,
+                                    detect_tempo=False, detect_key=False):
     """
     Analyze vocal track (pitch, loudness, dynamics) and produce an enriched
     MusicGen prompt for more controlled final sound.
+    `vocal` is an AudioBuffer or a file path.
 
     The function now accepts 'lyrics' and appends them to the prompt to condition
     the music generation on the specific lyrical content.
+    `quality` ('fast' / 'accurate') picks the pitch tracker; `detect_tempo` and
+    `detect_key` add the vocal's estimated BPM and key to the prompt.
     """
     try:
-        y, sr = librosa.load(vocal_path, sr=None)
-
-        # Loudness / dynamics
-        rms = librosa.feature.rms(y=y)[0]
-        avg_rms_db = 20 * np.log10(np.mean(rms) + 1e-8)
-
-        if avg_rms_db > -20:
-            loudness_tag = "powerful and aggressive dynamics"
-        elif avg_rms_db > -35:
-            loudness_tag = "medium dynamics, bright sound"
-        else:
-            loudness_tag = "subtle and atmospheric feel"
-
-        # Pitch features
-        f0, _, _ = librosa.pyin(
-            y, fmin=librosa.note_to_hz('C2'),
-            fmax=librosa.note_to_hz('C7')
-        )
-        f0 = np.nan_to_num(f0, nan=0)
-        valid_f0 = f0[f0 > 0]
-
-        pitch_tag = ""
-        if valid_f0.size > 0:
-            avg_pitch_hz = np.mean(valid_f0)
-            if avg_pitch_hz > 300:
-                pitch_tag = "high-register melody"
-            elif avg_pitch_hz < 150:
-                pitch_tag = "deep, low-register harmony"
-            else:
-                pitch_tag = "mid-range vocal pitch"
+        audio = vocal if isinstance(vocal, AudioBuffer) else AudioBuffer.from_file(vocal)
+        # f0/RMS are computed once per vocal and shared with refine_vocal_buffer
+        features = get_vocal_features(audio, quality, tempo=detect_tempo, key=detect_key)
+        pitch_tag, loudness_tag = vocal_prompt_tags(features)
 
         # Genre-based tempo interpretation
         if genre.lower() in ['hip-hop', 'electronic']:
@@ -291,6 +765,10 @@ def analyze_vocal_and_enrich_prompt(vocal_path, genre, instrument, lyrics):
             f"{base_prompt}, featuring a **{speed_tag}**, with **{pitch_tag}**, "
             f"and **{loudness_tag}**."
         )
+        if features.tempo_bpm:
+            rich_prompt += f" Around {round(features.tempo_bpm)} BPM."
+        if features.key:
+            rich_prompt += f" In {features.key}."
 
         # NEW LOGIC: Append formatted lyrics to the music prompt
         if lyrics and lyrics.strip():
@@ -306,48 +784,96 @@ def analyze_vocal_and_enrich_prompt(vocal_path, genre, instrument, lyrics):
         return f"{instrument} {genre} instrumental"
 
 
-def generate_full_music_with_musicgen(prompt="A calm piano melody"):
+def generate_music_buffer(prompt="A calm piano melody", seed=None):
     """
     Generate instrumental music using MusicGen (small model).
+    A `seed` makes the sampling reproducible. Returns an AudioBuffer, or None on failure.
     """
     print(f"[INFO] Beginning of the generating music....")
     print(f"[DEBUG] Generating Full Music using MusicGen: {prompt}")
     try:
-        processor = AutoProcessor.from_pretrained("facebook/musicgen-small")
-        model = MusicgenForConditionalGeneration.from_pretrained("facebook/musicgen-small")
-
-        inputs = processor(text=[prompt], padding=True, return_tensors="pt")
-        with torch.no_grad():
-            audio_values = model.generate(**inputs, max_new_tokens=512)
-
-        audio_array = audio_values[0, 0].cpu().numpy()
-        output_path = safe_join(OUTPUT_DIR, f"musicgen_output_{os.urandom(6).hex()}.wav")
+        import torch
+        with MODEL_REGISTRY.acquire("musicgen") as (processor, model):
+            inputs = processor(text=[prompt], padding=True, return_tensors="pt")
+            with torch.no_grad(), seeded_sampling(seed):
+                audio_values = model.generate(**inputs, max_new_tokens=512)
+            sample_rate = model.config.audio_encoder.sampling_rate
 
-        sf.write(output_path, audio_array, 32000)
-
-        print(f"[INFO] End of the generating music, returned path: {output_path}")
-        return output_path
+        print(f"[INFO] End of the generating music.")
+        return AudioBuffer(audio_values[0, 0].cpu().numpy(), sample_rate)
 
     except Exception as e:
         print(f"[ERROR] MusicGen failed: {e}")
         return None
 
 
+def generate_full_music_with_musicgen(prompt="A calm piano melody"):
+    """
+    Generate instrumental music using MusicGen and save it to the outputs folder.
+    """
+    music = generate_music_buffer(prompt)
+    if music is None:
+        return None
+    output_path = save_output_buffer(music, "musicgen_output")
+    print(f"[INFO] Generated music saved to: {output_path}")
+    return output_path
+
+
 # ====================================================
 # TTS Engines: Bark AI + Coqui XTTS
 # ====================================================
 
+TTS_MODEL_NAMES = {"bark": BARK_MODEL_NAME, "xtts": XTTS_MODEL_NAME}
+
+
+def _tts_cache_key(model, request, seed):
+    """Key on engine, model version, speaker file contents, language, text, speed and seed."""
+    speaker_wav = request.get("speaker_wav")
+    # Uploaded voices get random file names, so identify the speaker by content
+    speaker = file_digest(speaker_wav) if speaker_wav else request.get("speaker")
+    return cache_key(
+        "tts", TTS_MODEL_NAMES[model], package_version("coqui-tts"), speaker,
+        request.get("language"), request["text"], request.get("speed"), seed,
+    )
+
+
+def _synthesize(model, request, seed=None):
+    """
+    Run a registry TTS model ("bark" / "xtts") with `tts()` keyword arguments and
+    wrap the waveform in an AudioBuffer. Seeded requests run exclusively of all
+    other model sampling in this process (seeded_sampling), so their output
+    is deterministic, cached, and repeat requests skip the model entirely.
+    """
+    key = None
+    if seed is not None:
+        key = _tts_cache_key(model, request, seed)
+        data = TTS_CACHE.get_bytes(key, '.wav')
+        if data is not None:
+            print(f"[INFO] TTS cache hit ({model}, seed={seed})")
+            return AudioBuffer.from_wav_bytes(data)
+
+    with MODEL_REGISTRY.acquire(model) as tts_model, seeded_sampling(seed):
+        wav = tts_model.tts(**conditioned_request(model, tts_model, request))
+        vocal = AudioBuffer(np.asarray(wav, dtype=np.float32), tts_model.synthesizer.output_sample_rate)
+
+    if key is not None:
+        try:
+            TTS_CACHE.put_bytes(key, '.wav', vocal.to_wav_bytes())
+        except OSError as e:
+            print(f"[WARN] Could not cache TTS output: {e}")
+    return vocal
+
+
 def _execute_tts_generation(engine, lyrics, vocal_style, lang_abbr,
                             genre, selected_voice_name, instrument,
-                            speed, voice_upload, mode):
+                            speed, voice_upload, mode, seed=None):
     """
     Internal method selecting correct voice file, preparing TTS prompt,
     and generating a vocal track with either Bark AI or Coqui XTTS.
+    Returns the synthesized vocal as an AudioBuffer. With a `seed`, voice choice
+    and model sampling are deterministic.
     """
-    output_path = safe_join(
-        OUTPUT_DIR,
-        f"generated_vocals_{engine.lower().replace(' ', '_')}_{os.urandom(6).hex()}.wav"
-    )
+    rng = make_rng(seed)
 
     action_tag = "singing"
     if genre.lower() in ['hip-hop', 'reggae']:
@@ -357,56 +883,39 @@ def _execute_tts_generation(engine, lyrics, vocal_style, lang_abbr,
 
     speaker_wave = None
     speaker_id = None
-    voice_file = None
+    voice = None
 
     # -----------------------------------------
     # Voice selection logic (random / specific)
     # -----------------------------------------
     if vocal_style.lower() == 'random' and not voice_upload:
-        # Random male/female default folder
-        voice_style_folder = random.choice(['male', 'female'])
-        voice_dir = os.path.normpath(
-            os.path.join(
-                BASE_DIR,
-                f"../frontend/static/voices/{voice_style_folder}/{lang_abbr}"
-            )
-        )
-        try:
-            random_name = random.choice(os.listdir(voice_dir))
-            voice_file = random_name
-        except IndexError:
-            print(f"[ERROR] Voice directory is empty: {voice_dir}")
-            voice_file = None
-
-    elif vocal_style.lower() == 'random' and voice_upload and voice_upload.filename:
-        voice_dir_temp = save_temp_file(voice_upload)
-        voice_dir, file_name = os.path.split(voice_dir_temp)
-        voice_file = os.path.basename(voice_dir_temp)
+        # Random male/female bundled voice
+        voice_style_folder = rng.choice(['male', 'female'])
+        voice = VOICE_CATALOG.choose(voice_style_folder, lang_abbr, rng)
+        if voice is None:
+            print(f"[ERROR] No bundled {voice_style_folder} voices for language: {lang_abbr}")
+
+    elif vocal_style.lower() == 'random' and voice_upload:
+        # Uploads may arrive already saved (background jobs) or as a request file
+        upload_path = voice_upload if isinstance(voice_upload, str) else save_temp_file(voice_upload)
+        if os.path.exists(upload_path):
+            speaker_wave = upload_path
+            speaker_id = os.path.splitext(os.path.basename(upload_path))[0]
 
     elif vocal_style.lower() in ['male', 'female'] and not voice_upload:
         voice_style_folder = vocal_style.lower()
         print(f"[INFO] voice style folder: {voice_style_folder}")
-        voice_dir = os.path.normpath(
-            os.path.join(
-                BASE_DIR,
-                f"../frontend/static/voices/{voice_style_folder}/{lang_abbr}"
-            )
-        )
 
         if selected_voice_name:
             print(f"[INFO] Selected voice: {selected_voice_name}")
-            voice_file = f"{lang_abbr}_speaker_{selected_voice_name.lower()}.mp3"
-            print(f"[INFO] Voice directory path: {voice_dir}")
-            if not os.path.exists(os.path.join(voice_dir, voice_file)):
-                # fallback filename structure
-                voice_file = f"{lang_abbr}_speaker_{selected_voice_name.lower()}.mp3"
+            voice = VOICE_CATALOG.get(voice_style_folder, lang_abbr, selected_voice_name)
+            if voice is None:
+                print(f"[WARN] No {voice_style_folder} voice '{selected_voice_name}' for language: {lang_abbr}")
 
     # Resolve speaker_wav
-    if voice_file:
-        path = os.path.join(voice_dir, voice_file)
-        if os.path.exists(path):
-            speaker_wave = path
-            speaker_id = voice_file.replace('.mp3', '')
+    if voice is not None:
+        speaker_wave = voice.path
+        speaker_id = voice.speaker_id
 
     print(f"[INFO] User uploaded a voice file: {speaker_id}")
     print(f"[INFO] Voice directory path: {speaker_wave}")
@@ -414,26 +923,18 @@ def _execute_tts_generation(engine, lyrics, vocal_style, lang_abbr,
     # Ensure Coqui has a voice file
     if engine == 'Coqui XTTS' and not speaker_wave:
         print("[WARN] Coqui XTTS requires a speaker_wav, choosing random fallback.")
-        style_fallback = random.choice(['male', 'female'])
-        voice_dir = os.path.normpath(
-            os.path.join(BASE_DIR, f"../frontend/static/voices/{style_fallback}/{lang_abbr}")
-        )
-        try:
-            voice_file = random.choice(os.listdir(voice_dir))
-            speaker_wave = os.path.join(voice_dir, voice_file)
-            speaker_id = voice_file.replace(".mp3", "")
-        except IndexError:
+        voice = VOICE_CATALOG.choose(rng.choice(['male', 'female']), lang_abbr, rng)
+        if voice is None:
             raise ValueError(
                 "Coqui XTTS requires at least one voice file; none found."
             )
+        speaker_wave = voice.path
+        speaker_id = voice.speaker_id
 
     # -----------------------------------------
     # Bark AI
     # -----------------------------------------
     if engine == 'Bark AI':
-        tts = TTS(model_name="tts_models/multilingual/multi-dataset/bark",
-                  progress_bar=False, gpu=False)
-
         prompt = f"[{action_tag} {genre.lower()}] ♪{lyrics}♪"
         if genre.lower() == 'hip-hop':
             prompt = f"[{action_tag}] ♪{lyrics}♪"
@@ -442,93 +943,90 @@ def _execute_tts_generation(engine, lyrics, vocal_style, lang_abbr,
         if instrument.lower() == 'full_music' and vocal_style.lower() == 'random' and not voice_upload:
             print(f"[INFO] Using Bark AI built-in Random voice")
             print(f"[INFO] prompt: {prompt}")
-            tts.tts_to_file(text=prompt, file_path=output_path, speaker_wav=None, speed=speed)
-            return output_path
+            return _synthesize("bark", dict(text=prompt, speaker_wav=None, speed=speed), seed)
         elif mode != 'full_music' and vocal_style.lower() == 'random' and not voice_upload:
             print(f"[INFO] Using Bark AI built-in Random voice for Text to Speech")
             prompt_text = f"{lyrics}"
             print(f"[INFO] prompt: {prompt_text}")
-            tts.tts_to_file(text=prompt_text, file_path=output_path, speaker_wav=None, speed=1.0)
-            return output_path
+            return _synthesize("bark", dict(text=prompt_text, speaker_wav=None, speed=1.0), seed)
         elif mode != 'full_music' and vocal_style.lower() != 'random' and not voice_upload:
             prompt_text = f"{lyrics}"
             print(f"[INFO] prompt: {prompt_text}")
             print(f"[INFO] Using Bark AI text to speech ({vocal_style}) voice: {speaker_id or 'Random'}")
             print(f"[INFO] prompt: {prompt_text}")
-            tts.tts_to_file(
+            return _synthesize("bark", dict(
                 text=prompt_text,
-                file_path=output_path,
                 speaker=speaker_id,
                 speaker_wav=speaker_wave,
                 speed=speed,
-            )
-            return output_path
+            ), seed)
         elif mode != 'full_music' and voice_upload:
             prompt_text = f"{lyrics}"
             print(f"[INFO] prompt: {prompt_text}")
             print(f"[INFO] Using Bark AI text to speech ({vocal_style}) voice: {speaker_id or 'Random'}")
             print(f"[INFO] prompt: {prompt_text}")
-            tts.tts_to_file(
+            return _synthesize("bark", dict(
                 text=prompt_text,
-                file_path=output_path,
                 speaker=speaker_id,
                 speaker_wav=speaker_wave,
                 speed=speed,
-            )
-            return output_path
+            ), seed)
         print(f"[INFO] Using Bark AI ({vocal_style}) voice: {speaker_id or 'Random'}")
         print(f"[INFO] prompt: {prompt}")
-        tts.tts_to_file(
+        return _synthesize("bark", dict(
             text=prompt,
-            file_path=output_path,
             speaker=speaker_id,
             speaker_wav=speaker_wave,
             speed=speed,
-        )
-        return output_path
+        ), seed)
 
     # -----------------------------------------
     # Coqui XTTS
     # -----------------------------------------
     elif engine == 'Coqui XTTS':
-        coqui_tts = CoquiTTS(model_name="tts_models/multilingual/multi-dataset/xtts_v2")
-
         if not speaker_wave:
             raise ValueError("Coqui XTTS requires a valid male or female selection.")
+
         if mode != 'full_music':
             prompt = f"{lyrics}"
             print(f"[INFO] Using Coqui XTTS text to speech voice: {speaker_id or 'Random'}")
             print(f"[INFO] prompt: {prompt}")
 
-            coqui_tts.tts_to_file(
+            return _synthesize("xtts", dict(
                 text=prompt,
-                file_path=output_path,
                 speaker_wav=speaker_wave,
                 speaker_id=speaker_id,
                 language=lang_abbr,
                 speed=speed,
-            )
-            return output_path
+            ), seed)
 
         prompt = f"♪{lyrics}♪"
         print(f"[INFO] Using Coqui XTTS voice: {speaker_id or 'Random'}")
         print(f"[INFO] prompt: {prompt}")
 
-        coqui_tts.tts_to_file(
+        return _synthesize("xtts", dict(
             text=prompt,
-            file_path=output_path,
             speaker_wav=speaker_wave,
             speaker_id=speaker_id,
             language=lang_abbr,
             speed=speed,
-        )
-        return output_path
+        ), seed)
 
     # Should not occur
     raise EnvironmentError(f"Unsupported TTS engine: {engine}")
 
 
-def generate_vocals_with_tts(
+def tts_output_needs_denoise(tts_engine, vocal_style, instrument, voice_upload):
+    """Bark full-music with its built-in random voice is kept as generated."""
+    return not (
+            vocal_style.lower() == "random"
+            and instrument.lower() == "full_music"
+            and tts_engine == "Bark AI"
+            and not voice_upload
+    )
+
+
+def synthesize_vocals(
         lyrics,
         tts_engine,
         vocal_style='Random',
@@ -537,57 +1035,79 @@ def generate_vocals_with_tts(
         selected_voice_name='',
         instrument='full_music',
         voice_upload=None,
-        mode='full_music'):
+        mode='full_music',
+        denoise=True,
+        seed=None):
     """
-    Generate vocals with selected TTS engine. Applies noise reduction post-generation
-    unless Bark full-music random mode is used.
+    Generate vocals with selected TTS engine as an AudioBuffer. Applies noise
+    reduction post-generation unless Bark full-music random mode is used or
+    `denoise` is False. A `seed` makes voice, speed and sampling reproducible.
+    Returns None if noise reduction failed.
     """
+    rng = make_rng(seed)
+
     # Speed selection based on genre
     speed = 1.0
     if genre.lower() in ['hip-hop', 'reggae']:
-        speed = round(random.uniform(1.05, 1.15), 2)
+        speed = round(rng.uniform(1.05, 1.15), 2)
     elif genre.lower() in ['pop', 'r&b', 'country', 'rock', 'metal']:
-        speed = round(random.uniform(0.9, 1.05), 2)
+        speed = round(rng.uniform(0.9, 1.05), 2)
     elif genre.lower() == 'electronic':
-        speed = round(random.uniform(1.05, 1.20), 2)
+        speed = round(rng.uniform(1.05, 1.20), 2)
 
     try:
-        vocal_path = _execute_tts_generation(
+        vocal = _execute_tts_generation(
             tts_engine, lyrics, vocal_style, lang_abbr,
             genre, selected_voice_name, instrument,
-            speed, voice_upload, mode
+            speed, voice_upload, mode, seed
         )
 
         # Bark full-music skip condition
-        if (
-                vocal_style.lower() == "random"
-                and instrument.lower() == "full_music"
-                and tts_engine == "Bark AI"
-                and not voice_upload
-        ):
-            return vocal_path
+        if not denoise or not tts_output_needs_denoise(tts_engine, vocal_style, instrument, voice_upload):
+            return vocal
 
         # Apply 2-stage noise reduction
-        original_path, vocal_path = reduce_noise_return(vocal_path)
-        return vocal_path
+        return reduce_noise_buffer(vocal)
 
     except Exception as e:
         print(f"[ERROR] TTS Generation failed for {tts_engine}: {e}")
         raise e
 
 
+def generate_vocals_with_tts(
+        lyrics,
+        tts_engine,
+        vocal_style='Random',
+        lang_abbr='en',
+        genre='Pop',
+        selected_voice_name='',
+        instrument='full_music',
+        voice_upload=None,
+        mode='full_music',
+        denoise=True,
+        seed=None):
+    """
+    Generate vocals with selected TTS engine and save them to the outputs folder.
+    Returns the vocal file path, or None if noise reduction failed.
+    """
+    vocal = synthesize_vocals(lyrics, tts_engine, vocal_style, lang_abbr, genre,
+                              selected_voice_name, instrument, voice_upload, mode, denoise, seed)
+    if vocal is None:
+        return None
+    return save_output_buffer(vocal, f"generated_vocals_{tts_engine.lower().replace(' ', '_')}")
+
+
 # ====================================================
 # Vocal Refinement + Mixing
 # ====================================================
 
-def refine_and_mix_vocal(vocal_path, music_path, humanize_params=None):
+def refine_vocal_buffer(vocal, humanize_params=None, quality=None):
     """
-    Combine refined vocals with generated instrumental track.
-    Handles pitch-smoothing, vibrato simulation, and final mixdown.
-    (Code truncated naturally at file boundary in original.)
+    Loudness-normalize the vocal and apply pitch-smoothing correction.
+    `quality` selects the pitch-analysis tier (see vocal_features.py);
+    None uses SONOSPHERE_REFINE_ANALYSIS_QUALITY (pyin by default).
+    Returns the refined AudioBuffer (the normalized input if refinement fails).
     """
-    print(f"[INFO] Beginning the refinement and mix process....")
-
     if humanize_params is None:
         humanize_params = {
             'f0_medfilt': 5,
@@ -596,62 +1116,73 @@ def refine_and_mix_vocal(vocal_path, music_path, humanize_params=None):
             'vibrato_rate_hz': 5
         }
 
-    clean_path = vocal_path.replace(".mp3", "_clean.wav").replace(".wav", "_clean.wav")
-    # Using ffmpeg for loudness normalization
-    subprocess.run(["ffmpeg", "-y", "-i", vocal_path, "-af", "loudnorm", clean_path],
-                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    rvconv_path = clean_path.replace("_clean.wav", "_rvconv.wav")
-    AudioSegment.from_file(clean_path).export(rvconv_path, format="wav")
+    # EBU R128 loudness normalization (in-process, replaces ffmpeg loudnorm)
+    normalized = normalize_loudness(vocal.to_mono(), VOCAL_TARGET_LUFS)
 
     try:
-        y, sr = librosa.load(rvconv_path, sr=None)
+        from scipy.signal import medfilt
+        y, sr = normalized.mono(), normalized.sample_rate
 
         # --- Pitch Extraction and Correction ---
-        f0, _, _ = librosa.pyin(y, fmin=librosa.note_to_hz('C2'), fmax=librosa.note_to_hz('C7'))
+        # Loudness normalization doesn't move the pitch, so reuse the features of the
+        # original vocal (usually already extracted for the MusicGen prompt)
+        f0 = get_vocal_features(vocal, quality or REFINE_ANALYSIS_QUALITY).f0
 
         # Handle None or invalid output from pyin
         if f0 is None or len(f0) == 0 or np.all(np.isnan(f0)):
             print("[WARN] pyin failed to extract pitch — skipping pitch refinement.")
-            out_refined = rvconv_path  # Use the raw file
-        else:
-            # Replace NaNs and negatives
-            f0 = np.nan_to_num(f0, nan=librosa.note_to_hz('A4'))
-            f0_smooth = medfilt(f0, kernel_size=humanize_params['f0_medfilt'])
-            min_freq = librosa.note_to_hz('C2')
-            f0_safe = np.where(f0_smooth <= 0, min_freq, f0_smooth)
-            # Safe conversion
-            try:
-                midi = librosa.hz_to_midi(f0_safe)
-            except Exception as e:
-                print(f"[ERROR] Failed to convert to MIDI: {e}")
-                midi = np.zeros_like(f0_safe)
-
-            midi_quant = np.round(midi)
-            f0_quant = librosa.midi_to_hz(midi_quant)
-            # Calculate average pitch shift needed for correction
-            avg_semitone = float(np.nanmean(librosa.hz_to_midi(f0_quant) - librosa.hz_to_midi(f0_smooth)))
-            if not np.isfinite(avg_semitone):
-                avg_semitone = 0.0
-
-            y2 = librosa.effects.pitch_shift(y, sr=sr, n_steps=avg_semitone)
-            out_refined = rvconv_path.replace("_rvconv.wav", "_refined.wav")
-            sf.write(out_refined, y2, sr)
-            print("Min freq:", np.min(f0_safe), "Max freq:", np.max(f0_safe))
+            return normalized
+
+        # Replace NaNs and negatives
+        f0 = np.nan_to_num(f0, nan=librosa.note_to_hz('A4'))
+        f0_smooth = medfilt(f0, kernel_size=humanize_params['f0_medfilt'])
+        min_freq = librosa.note_to_hz('C2')
+        f0_safe = np.where(f0_smooth <= 0, min_freq, f0_smooth)
+        # Safe conversion
+        try:
+            midi = librosa.hz_to_midi(f0_safe)
+        except Exception as e:
+            print(f"[ERROR] Failed to convert to MIDI: {e}")
+            midi = np.zeros_like(f0_safe)
+
+        midi_quant = np.round(midi)
+        f0_quant = librosa.midi_to_hz(midi_quant)
+        # Calculate average pitch shift needed for correction
+        avg_semitone = float(np.nanmean(librosa.hz_to_midi(f0_quant) - librosa.hz_to_midi(f0_smooth)))
+        if not np.isfinite(avg_semitone):
+            avg_semitone = 0.0
+
+        y2 = librosa.effects.pitch_shift(y, sr=sr, n_steps=avg_semitone)
+        print("Min freq:", np.min(f0_safe), "Max freq:", np.max(f0_safe))
+        return normalized.copy_with(y2)
 
     except Exception as e:
         print(f"[ERROR] Refinement failed: {e}")
-        out_refined = rvconv_path
-
-    # --- Mixing ---
-    combined_path = safe_join(OUTPUT_DIR, f"final_mix_{os.urandom(6).hex()}.wav")
-    subprocess.run(["ffmpeg", "-y", "-i", out_refined, "-i", music_path,
-                    "-filter_complex",
-                    "[0:a]volume=1.0[vocal];[1:a]volume=0.6[music];[vocal][music]amix=inputs=2:duration=longest",
-                    combined_path],
-                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    # Stage 2: remove this as it was removing music out
-    # original_path, combined_path = reduce_noise_return(combined_path)
-    print(f"[INFO] End the refinement and mix process with combined path: {combined_path}")
+        return normalized
+
+
+def refine_and_mix_buffers(vocal, music, humanize_params=None, quality=None, mix_params=None):
+    """
+    In-memory refinement + mixdown of a vocal and an instrumental AudioBuffer.
+    `mix_params` overrides mixer.DEFAULT_MIX_PARAMS (stem gains, ducking, master target).
+    """
+    print(f"[INFO] Beginning the refinement and mix process....")
+    refined = refine_vocal_buffer(vocal, humanize_params, quality)
+    mixed = mix_stems(refined, music, mix_params)
+    print(f"[INFO] End the refinement and mix process.")
+    return mixed
+
+
+def refine_and_mix_vocal(vocal_path, music_path, humanize_params=None, mix_params=None):
+    """
+    Combine refined vocals with generated instrumental track.
+    Handles pitch-smoothing, vibrato simulation, and final mixdown.
+    Accepts file paths or AudioBuffers and returns the saved mix path.
+    """
+    vocal = vocal_path if isinstance(vocal_path, AudioBuffer) else AudioBuffer.from_file(vocal_path)
+    music = music_path if isinstance(music_path, AudioBuffer) else AudioBuffer.from_file(music_path, mono=False)
+
+    combined_path = save_output_buffer(refine_and_mix_buffers(vocal, music, humanize_params, mix_params=mix_params),
+                                       "final_mix")
+    print(f"[INFO] Final mix saved to: {combined_path}")
     return combined_path
@@ -0,0 +1,236 @@
+# ===== speaker_conditioning.py =====
+# ----------------------------------------------------
+# Cached speaker conditioning for voice cloning.
+#   • Coqui XTTS: GPT conditioning latents + speaker embedding (torch.save)
+#   • Bark AI:    semantic/coarse/fine history prompt (.npz voice)
+# Entries are keyed by the reference audio's content hash, so bundled voices
+# and uploads share one cache and each reference is only analysed once.
+#
+# Precompute every bundled voice:
+#   python speaker_conditioning.py [--models xtts,bark] [--voices-dir DIR]
+# ----------------------------------------------------
+import argparse
+import io
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from result_cache import CACHE_ROOT, DiskCache, cache_key, file_digest, package_version
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VOICES_DIR = os.path.normpath(os.path.join(BASE_DIR, '../frontend/static/voices'))
+VOICE_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg')
+
+XTTS_CONDITIONING_CACHE = DiskCache(
+    "xtts_conditioning", int(os.getenv('SONOSPHERE_XTTS_COND_CACHE_MB', 256)) * 1024 * 1024
+)
+# Bark looks voices up as <voice_dir>/<speaker>/<speaker>.npz, so this is a plain directory
+BARK_VOICE_DIR = os.getenv('SONOSPHERE_BARK_VOICE_DIR', os.path.join(CACHE_ROOT, 'bark_voices'))
+os.makedirs(BARK_VOICE_DIR, exist_ok=True)
+
+# Upload-derived XTTS speakers kept registered per model replica; bundled voices stay resident
+XTTS_UPLOAD_SPEAKERS = int(os.getenv('SONOSPHERE_XTTS_UPLOAD_SPEAKERS', 8))
+
+_bark_lock = threading.Lock()
+# tts_model → OrderedDict of the upload speaker names it holds, oldest first
+_upload_speakers = weakref.WeakKeyDictionary()
+_upload_speakers_lock = threading.Lock()
+
+
+def conditioning_key(tts_model, speaker_wav):
+    """Speaker name for a reference file under a given model and library version."""
+    key = cache_key(
+        "speaker", getattr(tts_model, "model_name", None), package_version("coqui-tts"), file_digest(speaker_wav)
+    )
+    return f"spk_{key[:24]}"
+
+
+# ====================================================
+# Coqui XTTS
+# ====================================================
+def _xtts_speakers(tts_model):
+    """The XTTS speaker table (name → latents), or None if the model has none."""
+    speaker_manager = getattr(tts_model.synthesizer.tts_model, "speaker_manager", None)
+    return getattr(speaker_manager, "speakers", None)
+
+
+def is_bundled_voice(speaker_wav, voices_dir=VOICES_DIR):
+    path = os.path.realpath(speaker_wav)
+    return os.path.commonpath([path, os.path.realpath(voices_dir)]) == os.path.realpath(voices_dir)
+
+
+def _track_upload_speaker(tts_model, speakers, name):
+    """Mark `name` as recently used and drop the oldest upload speakers past XTTS_UPLOAD_SPEAKERS."""
+    with _upload_speakers_lock:
+        resident = _upload_speakers.setdefault(tts_model, OrderedDict())
+        resident[name] = True
+        resident.move_to_end(name)
+        while len(resident) > XTTS_UPLOAD_SPEAKERS:
+            evicted, _ = resident.popitem(last=False)
+            speakers.pop(evicted, None)
+
+
+def xtts_speaker(tts_model, speaker_wav):
+    """
+    Register cached conditioning latents for `speaker_wav` with the XTTS model and
+    return the speaker name to synthesize with, or None if unsupported.
+    Bundled voices stay registered; at most XTTS_UPLOAD_SPEAKERS upload
+    speakers are kept per model replica.
+    """
+    import torch
+
+    speakers = _xtts_speakers(tts_model)
+    if speakers is None:
+        return None
+
+    name = conditioning_key(tts_model, speaker_wav)
+    upload = not is_bundled_voice(speaker_wav)
+    if name in speakers:
+        if upload:
+            _track_upload_speaker(tts_model, speakers, name)
+        return name
+
+    data = XTTS_CONDITIONING_CACHE.get_bytes(name, '.pt')
+    if data is not None:
+        latents = torch.load(io.BytesIO(data), map_location="cpu")
+    else:
+        xtts = tts_model.synthesizer.tts_model
+        config = xtts.config
+        # Same settings XTTS uses when it computes conditioning per request
+        gpt_cond_latent, speaker_embedding = xtts.get_conditioning_latents(
+            audio_path=[speaker_wav],
+            gpt_cond_len=config.gpt_cond_len,
+            gpt_cond_chunk_len=config.gpt_cond_chunk_len,
+            max_ref_length=config.max_ref_len,
+            sound_norm_refs=config.sound_norm_refs,
+        )
+        latents = {"gpt_cond_latent": gpt_cond_latent.cpu(), "speaker_embedding": speaker_embedding.cpu()}
+        buffer = io.BytesIO()
+        torch.save(latents, buffer)
+        XTTS_CONDITIONING_CACHE.put_bytes(name, '.pt', buffer.getvalue())
+        print(f"[INFO] Cached XTTS conditioning for {os.path.basename(speaker_wav)} → {name}")
+
+    # XTTS unpacks the entry positionally: (gpt_cond_latent, speaker_embedding)
+    speakers[name] = {"gpt_cond_latent": latents["gpt_cond_latent"],
+                      "speaker_embedding": latents["speaker_embedding"]}
+    # Uploads are one-off voices: keep only the most recent few in memory (the disk cache keeps the rest)
+    if upload:
+        _track_upload_speaker(tts_model, speakers, name)
+    return name
+
+
+# ====================================================
+# Bark AI
+# ====================================================
+def bark_speaker(tts_model, speaker_wav):
+    """Ensure a Bark .npz voice exists for `speaker_wav` and return its speaker name."""
+    name = conditioning_key(tts_model, speaker_wav)
+    voice_path = os.path.join(BARK_VOICE_DIR, name, f"{name}.npz")
+    if os.path.exists(voice_path):
+        return name
+
+    from TTS.tts.layers.bark.inference_funcs import generate_voice
+
+    with _bark_lock:
+        if os.path.exists(voice_path):
+            return name
+        # Build outside the voice directory: Bark rejects speakers with several .npz files
+        tmp_path = os.path.join(BARK_VOICE_DIR, f".{name}.{os.getpid()}.npz")
+        try:
+            generate_voice(audio=speaker_wav, model=tts_model.synthesizer.tts_model, output_path=tmp_path)
+            os.makedirs(os.path.dirname(voice_path), exist_ok=True)
+            os.replace(tmp_path, voice_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    print(f"[INFO] Cached Bark voice for {os.path.basename(speaker_wav)} → {name}")
+    return name
+
+
+# ====================================================
+# Request Rewriting
+# ====================================================
+def conditioned_request(model, tts_model, request):
+    """
+    Swap `speaker_wav` in a `tts()` request for a cached speaker so the engine
+    skips decoding the reference and recomputing its conditioning.
+    Falls back to the original request if the conditioning can't be prepared.
+    """
+    speaker_wav = request.get("speaker_wav")
+    if not speaker_wav or not os.path.exists(speaker_wav):
+        return request
+
+    try:
+        if model == "xtts":
+            name = xtts_speaker(tts_model, speaker_wav)
+            if name is None:
+                return request
+            conditioned = {k: v for k, v in request.items() if k not in ("speaker_wav", "speaker_id")}
+            conditioned["speaker"] = name
+            return conditioned
+
+        if model == "bark":
+            name = bark_speaker(tts_model, speaker_wav)
+            conditioned = {k: v for k, v in request.items() if k != "speaker_wav"}
+            conditioned.update(speaker=name, voice_dir=BARK_VOICE_DIR)
+            return conditioned
+
+    except Exception as e:
+        print(f"[WARN] Speaker conditioning cache unavailable for {speaker_wav}: {e}")
+    return request
+
+
+# ====================================================
+# Precompute CLI
+# ====================================================
+def bundled_voices(voices_dir=VOICES_DIR):
+    """All reference files under voices/<gender>/<lang>/."""
+    paths = []
+    for dirpath, _, filenames in os.walk(voices_dir):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(VOICE_EXTENSIONS):
+                paths.append(os.path.join(dirpath, filename))
+    return sorted(paths)
+
+
+def precompute(models=("xtts", "bark"), voices_dir=VOICES_DIR):
+    """Compute and store the conditioning of every bundled voice for `models`."""
+    # Importing shared registers the model loaders
+    import shared  # noqa: F401
+    from model_registry import MODEL_REGISTRY
+
+    builders = {"xtts": xtts_speaker, "bark": bark_speaker}
+    voices = bundled_voices(voices_dir)
+    print(f"[INFO] Found {len(voices)} bundled voices in {voices_dir}")
+
+    failures = 0
+    for model in models:
+        with MODEL_REGISTRY.acquire(model) as tts_model:
+            for i, path in enumerate(voices, 1):
+                try:
+                    name = builders[model](tts_model, path)
+                    print(f"[INFO] [{model} {i}/{len(voices)}] {os.path.relpath(path, voices_dir)} → {name}")
+                except Exception as e:
+                    failures += 1
+                    print(f"[ERROR] [{model}] {path}: {e}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute speaker conditioning for bundled voices.")
+    parser.add_argument("--models", default="xtts,bark", help="Comma-separated engines: xtts, bark")
+    parser.add_argument("--voices-dir", default=VOICES_DIR, help="Root of <gender>/<lang>/ voice files")
+    args = parser.parse_args()
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    unknown = [m for m in models if m not in ("xtts", "bark")]
+    if unknown:
+        parser.error(f"Unknown models: {', '.join(unknown)}")
+
+    failures = precompute(models, args.voices_dir)
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
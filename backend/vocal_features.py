@@ -0,0 +1,254 @@
+# ===== vocal_features.py =====
+# ----------------------------------------------------
+# Frame-level vocal descriptors computed once per track.
+# Prompt enrichment and pitch refinement both read them from here, so pitch
+# tracking runs at most once per vocal and tier instead of once per stage
+# (they share one extraction when both use the same tier). Entries are keyed
+# by the decoded audio's content hash and the quality tier, and kept in
+# a small in-memory LRU plus an optional disk cache, which also serves
+# worker processes.
+#
+# One STFT per track feeds RMS, onset strength (tempo) and chroma (key).
+# Pitch comes from one of two quality tiers:
+#   • fast:     YIN on audio downsampled to 11025 Hz, voicing gated by RMS
+#   • accurate: pyin at the native rate (voicing probabilities included)
+# ----------------------------------------------------
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import librosa
+import numpy as np
+
+from result_cache import DiskCache, cache_key, package_version
+
+# ====================================================
+# Analysis Configuration
+# ====================================================
+# Bump when the extraction settings change the stored features
+FEATURE_VERSION = 2
+PITCH_FMIN_NOTE = 'C2'
+PITCH_FMAX_NOTE = 'C7'
+
+# Per tier: analysis sample rate (None = native) and STFT/pitch framing
+ANALYSIS_TIERS = {
+    "fast": {"sample_rate": 11025, "frame_length": 1024, "hop_length": 256},
+    "accurate": {"sample_rate": None, "frame_length": 2048, "hop_length": 512},
+}
+# Prompt analysis only needs the mean pitch bucket; refinement corrects
+# pitch from the f0 itself, so it keeps pyin unless configured otherwise
+DEFAULT_ANALYSIS_QUALITY = os.getenv('SONOSPHERE_ANALYSIS_QUALITY', 'fast')
+REFINE_ANALYSIS_QUALITY = os.getenv('SONOSPHERE_REFINE_ANALYSIS_QUALITY', 'accurate')
+# Fast tier: frames quieter than this (dB below the loudest frame) count as unvoiced
+FAST_VOICING_FLOOR_DB = 35.0
+
+FEATURE_MEMORY_CACHE_SIZE = int(os.getenv('SONOSPHERE_FEATURE_CACHE_SIZE', 16))
+# 0 disables the disk cache
+FEATURE_DISK_CACHE_MB = int(os.getenv('SONOSPHERE_FEATURE_CACHE_MB', 256))
+FEATURE_DISK_CACHE = (DiskCache("vocal_features", FEATURE_DISK_CACHE_MB * 1024 * 1024)
+                      if FEATURE_DISK_CACHE_MB > 0 else None)
+
+# Krumhansl–Schmuckler key profiles (C major / C minor)
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+PITCH_CLASSES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+
+def normalize_quality(quality):
+    """Validated tier name; None selects SONOSPHERE_ANALYSIS_QUALITY."""
+    quality = (quality or DEFAULT_ANALYSIS_QUALITY).strip().lower()
+    if quality not in ANALYSIS_TIERS:
+        raise ValueError(f"Unknown analysis quality '{quality}' (expected {', '.join(ANALYSIS_TIERS)})")
+    return quality
+
+
+class VocalFeatures:
+    """
+    Per-frame descriptors of a mono vocal (hop of `hop_length` samples at
+    `sample_rate`): `f0` in Hz (NaN where unvoiced), `voiced_flag`,
+    `voiced_prob` and `rms`, plus optional track-level `tempo_bpm` and `key`.
+    """
+
+    def __init__(self, sample_rate, f0, voiced_flag, voiced_prob, rms, hop_length, quality,
+                 tempo_bpm=None, key=None):
+        self.sample_rate = int(sample_rate)
+        self.hop_length = int(hop_length)
+        self.quality = quality
+        self.f0 = np.asarray(f0, dtype=np.float64)
+        self.voiced_flag = np.asarray(voiced_flag, dtype=bool)
+        self.voiced_prob = np.asarray(voiced_prob, dtype=np.float64)
+        self.rms = np.asarray(rms, dtype=np.float64)
+        self.tempo_bpm = tempo_bpm
+        self.key = key
+
+    def __repr__(self):
+        return f"VocalFeatures({self.quality}, {len(self.f0)} frames, {self.voiced_ratio:.0%} voiced)"
+
+    # ---------------------------
+    # Summary Descriptors
+    # ---------------------------
+    @property
+    def voiced_f0(self):
+        f0 = np.nan_to_num(self.f0, nan=0)
+        return f0[f0 > 0]
+
+    @property
+    def voiced_ratio(self):
+        return float(np.mean(self.voiced_flag)) if self.voiced_flag.size else 0.0
+
+    @property
+    def mean_pitch_hz(self):
+        """Mean f0 over voiced frames, or None if nothing is voiced."""
+        voiced = self.voiced_f0
+        return float(np.mean(voiced)) if voiced.size else None
+
+    @property
+    def avg_rms_db(self):
+        return float(20 * np.log10(np.mean(self.rms) + 1e-8))
+
+    # ---------------------------
+    # Serialization
+    # ---------------------------
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez(buffer, sample_rate=self.sample_rate, hop_length=self.hop_length, quality=self.quality,
+                 f0=self.f0, voiced_flag=self.voiced_flag, voiced_prob=self.voiced_prob, rms=self.rms,
+                 tempo_bpm=np.nan if self.tempo_bpm is None else self.tempo_bpm, key=self.key or "")
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            tempo_bpm = float(arrays["tempo_bpm"])
+            return cls(int(arrays["sample_rate"]), arrays["f0"], arrays["voiced_flag"], arrays["voiced_prob"],
+                       arrays["rms"], int(arrays["hop_length"]), str(arrays["quality"]),
+                       tempo_bpm=None if np.isnan(tempo_bpm) else tempo_bpm, key=str(arrays["key"]) or None)
+
+
+# ====================================================
+# Extraction
+# ====================================================
+def _spectral_rms(S, frame_length):
+    """Frame RMS from a Hann-windowed magnitude STFT, matching time-domain `librosa.feature.rms`."""
+    rms = librosa.feature.rms(S=S, frame_length=frame_length)[0]
+    window_power = np.mean(librosa.filters.get_window('hann', frame_length, fftbins=True) ** 2)
+    return rms / np.sqrt(window_power)
+
+
+def estimate_key(chroma):
+    """'A minor'-style key from a chromagram (Krumhansl–Schmuckler profile correlation)."""
+    profile = chroma.mean(axis=1)
+    if not np.any(profile):
+        return None
+    best, best_score = None, -np.inf
+    for mode, template in (("major", MAJOR_PROFILE), ("minor", MINOR_PROFILE)):
+        for tonic in range(12):
+            score = np.corrcoef(profile, np.roll(template, tonic))[0, 1]
+            if score > best_score:
+                best, best_score = f"{PITCH_CLASSES[tonic]} {mode}", score
+    return best
+
+
+def _track_pitch(y, sr, quality, frame_length, hop_length, rms):
+    """(f0, voiced_flag, voiced_prob) framed like the STFT."""
+    fmin, fmax = librosa.note_to_hz(PITCH_FMIN_NOTE), librosa.note_to_hz(PITCH_FMAX_NOTE)
+    if quality == "accurate":
+        return librosa.pyin(y, fmin=fmin, fmax=fmax, sr=sr, frame_length=frame_length, hop_length=hop_length)
+
+    f0 = librosa.yin(y, fmin=fmin, fmax=fmax, sr=sr, frame_length=frame_length, hop_length=hop_length)
+    n = min(len(f0), len(rms))
+    f0, rms = f0[:n], rms[:n]
+    floor = np.max(rms) * 10 ** (-FAST_VOICING_FLOOR_DB / 20) if rms.size else 0.0
+    voiced_flag = rms > floor
+    f0 = np.where(voiced_flag, f0, np.nan)
+    return f0, voiced_flag, voiced_flag.astype(np.float64)
+
+
+def extract_features(y, sr, quality=None, tempo=False, key=False):
+    """Analyze a mono signal: one STFT for RMS/tempo/key, plus pitch at the chosen quality tier."""
+    quality = normalize_quality(quality)
+    tier = ANALYSIS_TIERS[quality]
+    if tier["sample_rate"] and tier["sample_rate"] < sr:
+        y = librosa.resample(y, orig_sr=sr, target_sr=tier["sample_rate"])
+        sr = tier["sample_rate"]
+    frame_length, hop_length = tier["frame_length"], tier["hop_length"]
+
+    S = np.abs(librosa.stft(y, n_fft=frame_length, hop_length=hop_length))
+    rms = _spectral_rms(S, frame_length)
+
+    tempo_bpm = key_name = None
+    if tempo:
+        onset_env = librosa.onset.onset_strength(S=librosa.amplitude_to_db(S, ref=np.max), sr=sr,
+                                                 hop_length=hop_length)
+        tempo_bpm = float(librosa.feature.tempo(onset_envelope=onset_env, sr=sr, hop_length=hop_length)[0])
+    if key:
+        key_name = estimate_key(librosa.feature.chroma_stft(S=S ** 2, sr=sr, n_fft=frame_length))
+
+    f0, voiced_flag, voiced_prob = _track_pitch(y, sr, quality, frame_length, hop_length, rms)
+    return VocalFeatures(sr, f0, voiced_flag, voiced_prob, rms, hop_length, quality, tempo_bpm, key_name)
+
+
+# ====================================================
+# Feature Cache
+# ====================================================
+_features = OrderedDict()
+_features_lock = threading.Lock()
+
+
+def _remember(cache_id, features):
+    with _features_lock:
+        _features[cache_id] = features
+        _features.move_to_end(cache_id)
+        while len(_features) > FEATURE_MEMORY_CACHE_SIZE:
+            _features.popitem(last=False)
+
+
+def feature_cache_key(audio, quality):
+    return cache_key("vocal_features", FEATURE_VERSION, package_version("librosa"), audio.content_hash(), quality)
+
+
+def _covers(features, tempo, key):
+    """True if `features` already holds the optional estimates that were asked for."""
+    return (not tempo or features.tempo_bpm is not None) and (not key or features.key is not None)
+
+
+def get_vocal_features(audio, quality=None, tempo=False, key=False):
+    """
+    Features of an AudioBuffer (down-mixed to mono), from memory, disk or a
+    fresh extraction. `quality` picks the pitch tier; `tempo` / `key` add the
+    optional track-level estimates. One entry per vocal and tier: a request
+    for an estimate the entry lacks re-extracts with both sets of options, so
+    prompt analysis and refinement keep sharing it.
+    """
+    quality = normalize_quality(quality)
+    mono = audio.to_mono()
+    cache_id = feature_cache_key(mono, quality)
+    with _features_lock:
+        features = _features.get(cache_id)
+        if features is not None:
+            _features.move_to_end(cache_id)
+    if features is not None and _covers(features, tempo, key):
+        return features
+
+    data = FEATURE_DISK_CACHE.get_bytes(cache_id, '.npz') if FEATURE_DISK_CACHE and features is None else None
+    if data is not None:
+        try:
+            features = VocalFeatures.from_bytes(data)
+            print("[INFO] Vocal features loaded from cache")
+        except (ValueError, KeyError, OSError) as e:
+            print(f"[WARN] Discarding unreadable cached vocal features: {e}")
+
+    if features is None or not _covers(features, tempo, key):
+        if features is not None:
+            tempo, key = tempo or features.tempo_bpm is not None, key or features.key is not None
+        features = extract_features(mono.mono(), mono.sample_rate, quality, tempo, key)
+        print(f"[INFO] Extracted vocal features: {features}")
+        if FEATURE_DISK_CACHE:
+            try:
+                FEATURE_DISK_CACHE.put_bytes(cache_id, '.npz', features.to_bytes())
+            except OSError as e:
+                print(f"[WARN] Could not cache vocal features: {e}")
+
+    _remember(cache_id, features)
+    return features
@@ -0,0 +1,176 @@
+# ===== voice_catalog.py =====
+import os
+import threading
+import time
+import unicodedata
+
+import librosa
+import soundfile as sf
+
+from utilities import LANGUAGE_CODE_MAP
+
+# ====================================================
+# Voice Catalog Configuration
+# ====================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VOICES_DIR = os.path.normpath(os.path.join(BASE_DIR, '../frontend/static/voices'))
+VOICE_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg')
+GENDERS = ("male", "female")
+# Seconds between checks for added/removed voice files (0 = only explicit reloads)
+CATALOG_REFRESH_SECONDS = float(os.getenv('SONOSPHERE_VOICE_CATALOG_REFRESH_SEC', 30))
+
+# Display order of languages (matches the language picker)
+_LANGUAGE_ORDER = {code: i for i, code in enumerate(LANGUAGE_CODE_MAP.values())}
+
+
+def voice_key(name):
+    """Lookup key for a voice name: 'Ha Neul', 'ha_neul' and 'HA-NEUL' are the same voice."""
+    name = unicodedata.normalize('NFC', name or '').strip().casefold()
+    return "_".join(name.replace('-', ' ').replace('_', ' ').split())
+
+
+def display_name(stem):
+    """'ha_neul' → 'Ha Neul' (keeps existing capitals such as 'Inês')."""
+    return " ".join(part[:1].upper() + part[1:] for part in stem.split('_') if part)
+
+
+class VoiceEntry:
+    """A bundled reference voice: voices/<gender>/<lang>/<lang>_speaker_<name>.<ext>."""
+
+    def __init__(self, gender, language, path):
+        self.gender = gender
+        self.language = language
+        self.path = path
+        self.speaker_id = os.path.splitext(os.path.basename(path))[0]
+        stem = self.speaker_id
+        prefix = f"{language}_speaker_"
+        if stem.lower().startswith(prefix):
+            stem = stem[len(prefix):]
+        self.name = display_name(unicodedata.normalize('NFC', stem))
+        self.key = voice_key(self.name)
+        self.duration, self.sample_rate = _probe(path)
+
+    def to_dict(self):
+        return {
+            "gender": self.gender,
+            "language": self.language,
+            "name": self.name,
+            "speaker_id": self.speaker_id,
+            "duration": round(self.duration, 2),
+            "sample_rate": self.sample_rate,
+            "url": "/static/voices/" + os.path.relpath(self.path, VOICES_DIR).replace(os.sep, '/'),
+        }
+
+
+def _probe(path):
+    """(duration seconds, native sample rate) without decoding the whole file."""
+    try:
+        info = sf.info(path)
+        return info.duration, info.samplerate
+    except Exception:
+        return librosa.get_duration(path=path), librosa.get_samplerate(path)
+
+
+# ====================================================
+# Voice Catalog
+# ====================================================
+class VoiceCatalog:
+    """
+    In-memory index of the bundled voices, built once and swapped atomically on
+    reload. Lookups by (gender, language, name) and per-group listings are dict
+    reads; the directory is only re-scanned when its contents change.
+    """
+
+    def __init__(self, root=VOICES_DIR, refresh_seconds=CATALOG_REFRESH_SECONDS):
+        self.root = root
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._by_group = {}
+        self._entries = []
+        self._signature = None
+        self._checked_at = 0.0
+        self.reload()
+
+    # ---------------------------
+    # Building
+    # ---------------------------
+    def _scan_signature(self):
+        """Directory mtimes change whenever a voice file is added, removed or renamed."""
+        signature = []
+        for gender in GENDERS:
+            gender_dir = os.path.join(self.root, gender)
+            if not os.path.isdir(gender_dir):
+                continue
+            signature.append((gender_dir, os.stat(gender_dir).st_mtime_ns))
+            for lang in sorted(os.listdir(gender_dir)):
+                lang_dir = os.path.join(gender_dir, lang)
+                if os.path.isdir(lang_dir):
+                    signature.append((lang_dir, os.stat(lang_dir).st_mtime_ns))
+        return tuple(signature)
+
+    def reload(self):
+        """Re-scan the voices directory and replace the index."""
+        signature = self._scan_signature()
+        entries = []
+        for directory, _ in signature:
+            parts = os.path.relpath(directory, self.root).split(os.sep)
+            if len(parts) != 2:
+                continue
+            gender, lang = parts
+            for filename in sorted(os.listdir(directory)):
+                if not filename.lower().endswith(VOICE_EXTENSIONS):
+                    continue
+                try:
+                    entries.append(VoiceEntry(gender, lang, os.path.join(directory, filename)))
+                except Exception as e:
+                    print(f"[WARN] Skipping unreadable voice {filename}: {e}")
+
+        entries.sort(key=lambda e: (_LANGUAGE_ORDER.get(e.language, len(_LANGUAGE_ORDER)), e.language, e.key))
+        by_key = {(e.gender, e.language, e.key): e for e in entries}
+        by_group = {}
+        for e in entries:
+            by_group.setdefault((e.gender, e.language), []).append(e)
+
+        with self._lock:
+            self._entries, self._by_key, self._by_group = entries, by_key, by_group
+            self._signature = signature
+            self._checked_at = time.monotonic()
+        print(f"[INFO] Voice catalog loaded: {len(entries)} voices from {self.root}")
+        return len(entries)
+
+    def _maybe_reload(self):
+        if not self.refresh_seconds or time.monotonic() - self._checked_at < self.refresh_seconds:
+            return
+        self._checked_at = time.monotonic()
+        if self._scan_signature() != self._signature:
+            self.reload()
+
+    # ---------------------------
+    # Lookups
+    # ---------------------------
+    def get(self, gender, language, name):
+        """The voice named `name` for (gender, language), or None."""
+        self._maybe_reload()
+        return self._by_key.get((gender.lower(), language, voice_key(name)))
+
+    def voices(self, gender, language):
+        self._maybe_reload()
+        return self._by_group.get((gender.lower(), language), [])
+
+    def choose(self, gender, language, rng):
+        """Random voice for (gender, language) using `rng`, or None if there are none."""
+        candidates = self.voices(gender, language)
+        return rng.choice(candidates) if candidates else None
+
+    def names(self, gender):
+        """Display names for one gender, in language-picker order."""
+        self._maybe_reload()
+        return [e.name for e in self._entries if e.gender == gender]
+
+    def to_list(self):
+        self._maybe_reload()
+        return [e.to_dict() for e in self._entries]
+
+
+VOICE_CATALOG = VoiceCatalog()
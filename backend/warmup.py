@@ -0,0 +1,233 @@
+# ===== warmup.py =====
+# ----------------------------------------------------
+# Startup warm-up and readiness tracking.
+#
+# The app imports no model libraries at startup; each subsystem loads its
+# dependencies on first use. SONOSPHERE_WARMUP lists what to prepare in the
+# background right after startup (subsystem or model names, or "all"):
+#   SONOSPHERE_WARMUP=lyrics,xtts,dns64
+# /healthz reports liveness and what is warm; /readyz turns 200 once every
+# requested warm-up target has finished. With inference workers
+# (SONOSPHERE_WORKERS > 0) the models live in the workers: each worker warms
+# the model targets while it starts, and a model counts as ready once every
+# worker has reported it warm.
+# ----------------------------------------------------
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from model_registry import MODEL_REGISTRY
+from worker_pool import WORKER_POOL
+
+# Subsystem → (module whose import marks it as loaded, registry models it serves)
+SUBSYSTEMS = OrderedDict([
+    ("lyrics", ("lyrics_generator", ())),
+    ("voices", ("voice_catalog", ())),
+    ("tts", ("TTS", ("bark", "xtts"))),
+    ("music", ("transformers", ("musicgen",))),
+    ("denoise", ("denoiser", ("dns64",))),
+])
+MODEL_NAMES = [m for _, models in SUBSYSTEMS.values() for m in models]
+
+WARMUP_TARGETS = os.getenv('SONOSPHERE_WARMUP', '')
+# Run a tiny inference after loading each warmed model (0 = load only)
+WARMUP_INFERENCE = os.getenv('SONOSPHERE_WARMUP_INFERENCE', '1') not in ('0', 'false', 'no')
+
+
+def resolve_targets(spec):
+    """'tts,lyrics' → ['bark', 'xtts', 'lyrics']; unknown names are reported and skipped."""
+    targets = []
+    for name in (n.strip().lower() for n in spec.split(',')):
+        if not name or name == "none":
+            continue
+        if name == "all":
+            expanded = list(SUBSYSTEMS)
+        else:
+            expanded = [name]
+        for item in expanded:
+            if item in SUBSYSTEMS and SUBSYSTEMS[item][1]:
+                new = list(SUBSYSTEMS[item][1])
+            elif item in SUBSYSTEMS or item in MODEL_NAMES:
+                new = [item]
+            else:
+                print(f"[WARN] Unknown warm-up target '{item}' ignored.")
+                continue
+            targets.extend(t for t in new if t not in targets)
+    return targets
+
+
+# ---------------------------
+# Warm-up Steps
+# ---------------------------
+def _warm_lyrics():
+    from lyrics_generator import lookup_synonyms
+    from profanity_filter import get_matcher
+    get_matcher()
+    lookup_synonyms("love")
+
+
+def _warm_voices():
+    from voice_catalog import VOICE_CATALOG
+    VOICE_CATALOG.to_list()
+
+
+def _warm_model(name, inference):
+    from shared import warm_up_model
+    return warm_up_model(name, inference)
+
+
+SUBSYSTEM_WARMERS = {"lyrics": _warm_lyrics, "voices": _warm_voices}
+
+
+# ====================================================
+# Readiness
+# ====================================================
+class Readiness:
+    """Warm-up progress per target: pending → warming → ready | failed."""
+
+    def __init__(self, targets=(), inference=WARMUP_INFERENCE, pool=WORKER_POOL):
+        self.inference = inference
+        self.started_at = time.time()
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._thread = None
+        self._worker_reports = None
+        self._targets = OrderedDict((t, {"state": "pending"}) for t in targets)
+
+    def _set(self, target, **fields):
+        with self._lock:
+            self._targets[target] = fields
+
+    def _model_targets(self):
+        return [t for t in self._targets if t not in SUBSYSTEM_WARMERS]
+
+    def _run(self):
+        for target in list(self._targets):
+            if self._worker_reports is not None and target not in SUBSYSTEM_WARMERS:
+                continue
+            self._set(target, state="warming")
+            start = time.time()
+            try:
+                if target in SUBSYSTEM_WARMERS:
+                    SUBSYSTEM_WARMERS[target]()
+                else:
+                    _warm_model(target, self.inference)
+                self._set(target, state="ready", seconds=round(time.time() - start, 3))
+                print(f"[INFO] Warm-up of '{target}' finished in {time.time() - start:.2f}s")
+            except Exception as e:
+                self._set(target, state="failed", seconds=round(time.time() - start, 3), error=str(e))
+                print(f"[ERROR] Warm-up of '{target}' failed: {e}")
+        if self._worker_reports is not None:
+            self._collect_worker_reports()
+
+    def _collect_worker_reports(self):
+        """Start the workers and track their warm-up reports until every model target is settled."""
+        workers = self.pool.workers
+        ready = {t: {} for t in self._model_targets()}
+        for target in ready:
+            self._set(target, state="warming", workers_ready=0, workers=workers)
+        started = self.pool.start()
+        while any(self._targets[t]["state"] == "warming" for t in ready):
+            try:
+                pid, target, state, seconds, error = self._worker_reports.get(timeout=1.0)
+            except queue.Empty:
+                broken = next((f.exception() for f in started if f.done() and f.exception()), None)
+                if broken is not None:
+                    for target in ready:
+                        if self._targets[target]["state"] == "warming":
+                            self._set(target, state="failed", error=f"inference workers failed to start: {broken}",
+                                      workers=workers)
+                    print(f"[ERROR] Inference workers failed to start: {broken}")
+                continue
+            if target not in ready:
+                continue
+            if state == "failed":
+                self._set(target, state="failed", seconds=seconds, error=f"worker {pid}: {error}", workers=workers)
+                print(f"[ERROR] Warm-up of '{target}' failed in worker {pid}: {error}")
+                continue
+            ready[target][pid] = seconds
+            if self._targets[target]["state"] != "warming":
+                continue
+            if len(ready[target]) >= workers:
+                self._set(target, state="ready", seconds=max(ready[target].values()), workers_ready=workers,
+                          workers=workers)
+                print(f"[INFO] Warm-up of '{target}' finished in all {workers} workers")
+            else:
+                self._set(target, state="warming", workers_ready=len(ready[target]), workers=workers)
+
+    def start(self):
+        """
+        Warm the targets in a background thread (no-op when there are none).
+        Skipped in child processes: spawned inference workers re-import app.py
+        and warm the model targets in their own initializer instead.
+        """
+        if multiprocessing.parent_process() is not None:
+            return self
+        if self._targets and self._thread is None:
+            if self.pool.enabled and self._model_targets():
+                # Configured before any request can start the pool, so every worker warms up
+                self._worker_reports = self.pool.enable_warmup(self._model_targets(), self.inference)
+            print(f"[INFO] Warming up: {', '.join(self._targets)}")
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    @property
+    def ready(self):
+        with self._lock:
+            return all(t["state"] == "ready" for t in self._targets.values())
+
+    @property
+    def failed(self):
+        with self._lock:
+            return any(t["state"] == "failed" for t in self._targets.values())
+
+    def warmup_status(self):
+        with self._lock:
+            return {name: dict(status) for name, status in self._targets.items()}
+
+    def model_status_source(self):
+        """Where the per-model `loaded` flags of `subsystem_status` come from."""
+        if not self.pool.enabled:
+            return "this process"
+        return (f"warm-up reports of {self.pool.workers} inference workers "
+                "(models loaded on demand are not tracked; unknown is null)")
+
+    def _model_loaded(self, name):
+        if not self.pool.enabled:
+            return MODEL_REGISTRY.is_loaded(name)
+        with self._lock:
+            status = self._targets.get(name)
+        if status is None or self._worker_reports is None:
+            return None
+        return status["state"] == "ready"
+
+    def subsystem_status(self):
+        """
+        Which subsystems have their libraries imported in this process, and
+        which models are loaded (see `model_status_source`).
+        """
+        status = {}
+        for name, (module, models) in SUBSYSTEMS.items():
+            loaded = {m: self._model_loaded(m) for m in models}
+            if models and self.pool.enabled:
+                # The libraries are imported in the workers, not here
+                warm = all(v is True for v in loaded.values())
+            else:
+                warm = module in sys.modules and all(loaded.values())
+            status[name] = {
+                "imported": module in sys.modules,
+                "models": loaded,
+                "warm": warm,
+            }
+        return status
+
+    def uptime(self):
+        return round(time.time() - self.started_at, 1)
+
+
+READINESS = Readiness(resolve_targets(WARMUP_TARGETS))
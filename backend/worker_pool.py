@@ -0,0 +1,156 @@
+# ===== worker_pool.py =====
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# ====================================================
+# Worker Pool Configuration
+# ====================================================
+# Number of inference worker processes (0 = run stages in the calling thread)
+WORKER_COUNT = int(os.getenv('SONOSPHERE_WORKERS', 0))
+# torch intra-op threads per worker (0 = split the machine's cores evenly)
+TORCH_THREADS = int(os.getenv('SONOSPHERE_TORCH_THREADS', 0))
+# Registry models each worker loads before accepting work
+PRELOAD_MODELS = [m.strip() for m in os.getenv('SONOSPHERE_PRELOAD_MODELS', 'dns64').split(',') if m.strip()]
+
+
+def _noop():
+    pass
+
+
+def _threads_per_worker(workers, torch_threads):
+    if torch_threads > 0:
+        return torch_threads
+    return max(1, (os.cpu_count() or 1) // max(workers, 1))
+
+
+def _warm_worker(models, inference, reports):
+    """Warm-up of one worker; each model is reported as (pid, model, state, seconds, error) on `reports`."""
+    from shared import warm_up_model
+    for name in models:
+        start = time.time()
+        try:
+            warm_up_model(name, inference)
+            reports.put((os.getpid(), name, "ready", round(time.time() - start, 3), None))
+        except Exception as e:
+            print(f"[ERROR] Worker {os.getpid()} failed to warm up '{name}': {e}")
+            reports.put((os.getpid(), name, "failed", round(time.time() - start, 3), str(e)))
+
+
+def _init_worker(torch_threads, preload_models, warmup=None):
+    """Runs once in every worker process: pin thread counts and warm the models."""
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+
+    import torch
+    torch.set_num_threads(torch_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed once any parallel work has run in this process
+        pass
+
+    # Importing shared registers the model loaders in this process
+    import shared  # noqa: F401
+    from model_registry import MODEL_REGISTRY
+
+    for name in preload_models:
+        try:
+            MODEL_REGISTRY.preload(name)
+        except Exception as e:
+            print(f"[ERROR] Worker {os.getpid()} failed to preload '{name}': {e}")
+    if warmup:
+        _warm_worker(*warmup)
+    print(f"[INFO] Worker {os.getpid()} ready (torch threads={torch_threads}, models={preload_models})")
+
+
+# ====================================================
+# Worker Pool
+# ====================================================
+class WorkerPool:
+    """
+    Dispatches CPU-bound pipeline stages to worker processes, each holding its own
+    warm models and a fixed share of the CPU cores. With zero workers the stage
+    simply runs in the calling thread.
+
+    Dispatched callables must be module-level functions and their arguments and
+    return values picklable (paths, strings, numbers, arrays).
+    """
+
+    def __init__(self, workers=WORKER_COUNT, torch_threads=TORCH_THREADS, preload_models=None):
+        self.workers = workers
+        self.torch_threads = _threads_per_worker(workers, torch_threads)
+        self.preload_models = PRELOAD_MODELS if preload_models is None else preload_models
+        self._context = multiprocessing.get_context("spawn")
+        self._warmup = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                print(f"[INFO] Starting {self.workers} inference workers "
+                      f"({self.torch_threads} torch threads each)")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=self._context,
+                    initializer=_init_worker,
+                    initargs=(self.torch_threads, self.preload_models, self._warmup),
+                )
+            return self._executor
+
+    def enable_warmup(self, models, inference=True):
+        """
+        Have every worker, including ones restarted later, warm `models` before
+        taking work. Returns the queue their (pid, model, state, seconds, error)
+        reports arrive on.
+        """
+        with self._lock:
+            if self._executor is not None:
+                print("[WARN] Inference workers already running; only workers started later will warm up.")
+            reports = self._context.Queue()
+            self._warmup = (list(models), inference, reports)
+        return reports
+
+    def start(self):
+        """
+        Start every worker now instead of on the first dispatches. Returns the
+        futures of the start-up calls (they fail if a worker cannot start).
+        """
+        if not self.enabled:
+            return []
+        executor = self._get_executor()
+        # A spawn-context pool starts one more worker per submit while none is idle
+        return [executor.submit(_noop) for _ in range(self.workers)]
+
+    def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on a worker and block until it returns."""
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        executor = self._get_executor()
+        try:
+            return executor.submit(fn, *args, **kwargs).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool for the next call
+            print("[ERROR] Inference worker crashed; restarting worker pool.")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+WORKER_POOL = WorkerPool()
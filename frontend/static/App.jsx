@@ -165,9 +165,9 @@ const App = () => {
             let vocalUrl = null;
             if (data.status === 'success') {
                 const gen = data.generation_result || {};
-                audioUrl = gen.final_audio_url || gen.audio_url || null;
-                musicUrl = gen.music_audio_url || null;
-                vocalUrl = gen.vocal_audio_url || null;
+                audioUrl = gen.final_media_url || gen.final_audio_url || gen.audio_url || null;
+                musicUrl = gen.music_media_url || gen.music_audio_url || null;
+                vocalUrl = gen.vocal_media_url || gen.vocal_audio_url || null;
                 newStatus = gen.status || 'Song created!';
             }
             setStatus(newStatus);
@@ -126,7 +126,9 @@ window.NoiseReduction =
             const result = await handleFileUpload("noise_reduction")(e);
             if (result) {
                 if (result.original_audio_url) setOriginalAudioUrl(result.original_audio_url);
-                if (result.noise_reduced_url) setProcessedAudioUrl(result.noise_reduced_url);
+                if (result.noise_reduced_media_url || result.noise_reduced_url) {
+                    setProcessedAudioUrl(result.noise_reduced_media_url || result.noise_reduced_url);
+                }
             }
             setIsProcessing(false);
         };